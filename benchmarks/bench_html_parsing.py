@@ -0,0 +1,160 @@
+"""
+bench_html_parsing.py
+
+Benchmark of the services' page parsing: full html.parser trees against the
+configured backend with each page type's SoupStrainer.
+Pages come from the HTTP cache (temp/http_cache, filled by earlier runs), from
+--pages DIR holding files named <site>-<page>-*.html (e.g.
+wallhaven.cc-search-1.html), or are generated when neither has any.
+
+Usage:
+    python benchmarks/bench_html_parsing.py [--pages DIR] [--cache DIR] [--rounds 5]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import CONFIG  # noqa: E402
+from src.html_parser import parser_name  # noqa: E402
+from src.services.wallhaven_service import WallhavenService  # noqa: E402
+from src.services.wallpaperbat_service import WallpaperBatService  # noqa: E402
+from src.services.wallpaperswide_service import WallpapersWideService  # noqa: E402
+
+SERVICES = {cls.SITE_NAME: cls for cls in (WallhavenService, WallpaperBatService, WallpapersWideService)}
+LISTING_METHODS = {'search': '_parse_search_page', 'theme': '_parse_theme_page', 'detail': '_detail_options'}
+
+
+def classify(url):
+    """Return (site, page type) for a cached URL, or None for pages the services do not parse."""
+    parsed = urlparse(url)
+    site = parsed.netloc.removeprefix('www.')
+    path = parsed.path
+    if site == 'wallhaven.cc':
+        return site, 'search' if path.startswith('/search') else 'detail'
+    if site == 'wallpaperbat.com':
+        return site, 'search' if path.startswith('/search') or 'ultrawide' in path else 'detail'
+    if site == 'wallpaperswide.com':
+        return site, 'theme' if path.endswith(('-desktop-wallpapers.html', '-wallpapers-r.html')) else 'detail'
+    return None
+
+
+def load_cache(directory):
+    path = os.path.join(directory, 'pages.sqlite3')
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT url, body, encoding FROM pages").fetchall()
+    finally:
+        conn.close()
+    pages = []
+    for url, body, encoding in rows:
+        kind = classify(url)
+        if kind:
+            pages.append((*kind, body.decode(encoding or 'utf-8', errors='replace')))
+    return pages
+
+
+def load_folder(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        site, _, rest = name.partition('-')
+        page = rest.partition('-')[0].removesuffix('.html')
+        if site in SERVICES and page in LISTING_METHODS:
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as f:
+                pages.append((site, page, f.read()))
+    return pages
+
+
+def make_pages(items=24):
+    """Generate pages shaped like each site's listings and detail pages, chrome included."""
+    chrome = ''.join(
+        f'<li class="nav-item"><a class="nav-link" href="/c{i}">Category {i}</a>'
+        f'<div class="dropdown"><span>Sub {i}</span><p>{"text " * 20}</p></div></li>' for i in range(60))
+    script = '<script>var data = {' + ','.join(f'"k{i}": {i}' for i in range(300)) + '};</script>'
+
+    def page(body):
+        return (f'<!DOCTYPE html><html><head><title>t</title>{script}</head><body>'
+                f'<header><ul class="nav">{chrome}</ul></header><main>{body}</main>'
+                f'<footer><ul>{chrome}</ul></footer></body></html>')
+
+    thumbs = ''.join(
+        f'<figure class="thumb thumb-{i} thumb-sfw" data-wallpaper-id="{i}">'
+        f'<img data-src="https://th.wallhaven.cc/small/{i}.jpg"><a class="preview" href="https://wallhaven.cc/w/{i}"></a>'
+        f'<div class="thumb-info"><span class="wall-res">5120 x 1440</span></div></figure>' for i in range(items))
+    grid = ''.join(
+        f'<a href="/wallpaper/{i}"><img src="/t/{i}.jpg" alt="w{i}"></a>' for i in range(items))
+    wide_items = ''.join(
+        f'<div class="wallpaper"><a href="/w{i}-wallpapers.html"><img src="/thumbs/w{i}.jpg"></a></div>'
+        for i in range(items))
+    downloads = ''.join(
+        f'<a href="/download/w-wallpaper-{w}x{h}.jpg">{w}x{h}</a>'
+        for w, h in [(1920, 1080), (2560, 1440), (3440, 1440), (3840, 2160), (5120, 1440), (7680, 2160)] * 4)
+    return [
+        ('wallhaven.cc', 'search', page(f'<section class="thumb-listing-page"><ul>{thumbs}</ul></section>')),
+        ('wallhaven.cc', 'detail', page(
+            '<img id="wallpaper" src="https://w.wallhaven.cc/full/1.jpg" '
+            'data-wallpaper-width="5120" data-wallpaper-height="1440">')),
+        ('wallpaperbat.com', 'search', page(f'<div class="wallpapers">{grid}</div>')),
+        ('wallpaperbat.com', 'detail', page(
+            '<img class="img-wallpaper" src="/img/5120x1440-1.jpg">'
+            '<a class="download-button" href="/dl/1.jpg">Download 5120 x 1440</a>' + grid)),
+        ('wallpaperswide.com', 'theme', page(wide_items)),
+        ('wallpaperswide.com', 'detail', page(f'<div class="wallpaper-resolutions">{downloads}</div>')),
+    ]
+
+
+def run(pages, services, strained):
+    results = []
+    for site, page, html in pages:
+        service = services[site]
+        service.PAGE_STRAINERS = type(service).PAGE_STRAINERS if strained else {}
+        results.append(getattr(service, LISTING_METHODS[page])(html))
+    return results
+
+
+def bench(pages, services, strained, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = run(pages, services, strained)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument('--pages', help='Folder of saved pages named <site>-<page>-*.html')
+    parser.add_argument('--cache', default=os.path.join(CONFIG['TEMP_FOLDER'], 'http_cache'),
+                        help='HTTP cache folder to read saved pages from')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds; the best is reported')
+    args = parser.parse_args()
+
+    pages = load_folder(args.pages) if args.pages else load_cache(args.cache)
+    source = args.pages or args.cache
+    if not pages:
+        pages, source = make_pages(), 'generated pages'
+
+    services = {site: cls('5120x1440', ['nature']) for site, cls in SERVICES.items()}
+    backend = parser_name()
+    CONFIG['HTML_PARSER'] = 'html.parser'
+    full_time, full = bench(pages, services, False, args.rounds)
+    CONFIG['HTML_PARSER'] = backend
+    strained_time, strained = bench(pages, services, True, args.rounds)
+    mismatches = sum(a != b for a, b in zip(full, strained))
+
+    size = sum(len(html) for _, _, html in pages) / 1024
+    print(f"{len(pages)} pages ({size:.0f} KiB) from {source}, best of {args.rounds} rounds")
+    print(f"  html.parser, full tree:    {full_time * 1000:8.1f} ms")
+    print(f"  {backend}, strained:{' ' * (16 - len(backend))}{strained_time * 1000:8.1f} ms")
+    print(f"  speedup: {full_time / strained_time:.1f}x, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+bench_image_dimensions.py
+
+Microbenchmark of the header-only dimension reader against PIL.Image.open.
+Generates a folder of PNG, JPEG and WebP wallpapers (or uses --folder) and
+times reading every file's dimensions both ways.
+
+Usage:
+    python benchmarks/bench_image_dimensions.py [--files 300] [--rounds 5] [--folder DIR]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image  # noqa: E402
+
+from src.image_header import read_file_size  # noqa: E402
+from src.library_index import is_library_image  # noqa: E402
+
+
+def make_library(folder, count):
+    """Write count small-bodied but large-dimension images in rotating formats."""
+    formats = [("png", "PNG", {}), ("jpg", "JPEG", {"icc_profile": b"\0" * 20000}), ("webp", "WEBP", {})]
+    image = Image.new("RGB", (5120, 1440))
+    samples = {}
+    for ext, fmt, kwargs in formats:
+        path = os.path.join(folder, f"sample.{ext}")
+        image.save(path, format=fmt, **kwargs)
+        with open(path, 'rb') as f:
+            samples[ext] = f.read()
+        os.remove(path)
+    for i in range(count):
+        ext = formats[i % len(formats)][0]
+        with open(os.path.join(folder, f"wallpaper-{i}.{ext}"), 'wb') as f:
+            f.write(samples[ext])
+
+
+def read_with_pil(path):
+    with Image.open(path) as img:
+        return img.size
+
+
+def bench(reader, paths, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for path in paths:
+            reader(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument('--files', type=int, default=300, help='Images to generate')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds; the best is reported')
+    parser.add_argument('--folder', type=str, help='Benchmark an existing wallpaper folder instead')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.folder
+        if not folder:
+            folder = tmp
+            make_library(folder, args.files)
+        paths = [entry.path for entry in os.scandir(folder) if is_library_image(entry.name)]
+
+        mismatches = [p for p in paths if (read_file_size(p) or read_with_pil(p)) != read_with_pil(p)]
+        header = bench(lambda p: read_file_size(p) or read_with_pil(p), paths, args.rounds)
+        pil = bench(read_with_pil, paths, args.rounds)
+
+    print(f"{len(paths)} files, best of {args.rounds} rounds")
+    print(f"  header reader: {header * 1000:8.1f} ms ({len(paths) / header:10.0f} files/s)")
+    print(f"  PIL.Image.open: {pil * 1000:7.1f} ms ({len(paths) / pil:10.0f} files/s)")
+    print(f"  speedup: {pil / header:.1f}x, mismatches: {len(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+bench_resolution_match.py
+
+Microbenchmark of the vectorized batch resolution matcher against the scalar path.
+Generates random candidate dimensions and scores them against several monitor
+resolutions, once with evaluate_batch() and once with a Python loop over
+evaluate_resolution_match() plus a sort per target.
+
+Usage:
+    python benchmarks/bench_resolution_match.py [--candidates 100000] [--rounds 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import resolution_match  # noqa: E402
+from src.resolution_match import evaluate_batch, evaluate_resolution_match  # noqa: E402
+
+TARGETS = [(5120, 1440), (3840, 2160), (3440, 1440), (2560, 1440), (1920, 1080)]
+COMMON_SIZES = [(1920, 1080), (2560, 1440), (3440, 1440), (3840, 1080), (3840, 2160),
+                (5120, 1440), (5120, 2880), (7680, 2160), (1366, 768), (1080, 1920)]
+
+
+def make_candidates(count, seed=1):
+    """Mix common wallpaper sizes with arbitrary ones, as a real library does."""
+    rng = random.Random(seed)
+    sizes = [rng.choice(COMMON_SIZES) if rng.random() < 0.7
+             else (rng.randrange(640, 8000), rng.randrange(480, 4400)) for _ in range(count)]
+    return [w for w, _ in sizes], [h for _, h in sizes]
+
+
+def scalar(widths, heights, targets):
+    evaluate_resolution_match.cache_clear()
+    areas = [w * h for w, h in zip(widths, heights)]
+    codes, ranking = [], []
+    for tw, th in targets:
+        row = [evaluate_resolution_match(w, h, tw, th) for w, h in zip(widths, heights)]
+        codes.append(row)
+        ranking.append(sorted(range(len(row)), key=lambda i: (-row[i], areas[i])))
+    return codes, ranking
+
+
+def bench(func, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument('--candidates', type=int, default=100000, help='Candidate images to score')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds; the best is reported')
+    args = parser.parse_args()
+
+    if resolution_match.np is None:
+        print("NumPy is not installed; evaluate_batch() would use the scalar fallback")
+        return
+
+    widths, heights = make_candidates(args.candidates)
+    batch_time, batch = bench(lambda: evaluate_batch(widths, heights, TARGETS), args.rounds)
+    scalar_time, (codes, ranking) = bench(lambda: scalar(widths, heights, TARGETS), args.rounds)
+    mismatches = int((batch.codes != codes).sum()) + int((batch.ranking != ranking).sum())
+
+    pairs = args.candidates * len(TARGETS)
+    print(f"{args.candidates} candidates x {len(TARGETS)} targets, best of {args.rounds} rounds")
+    print(f"  evaluate_batch: {batch_time * 1000:8.1f} ms ({pairs / batch_time:12.0f} pairs/s)")
+    print(f"  scalar loop:    {scalar_time * 1000:8.1f} ms ({pairs / scalar_time:12.0f} pairs/s)")
+    print(f"  speedup: {scalar_time / batch_time:.1f}x, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ Examples:
   python main.py --scrape --theme nature abstract
   python main.py --scout  # Explore available themes
   python main.py --theme "new york" --resolution 3840x2160
+  python main.py --theme nature --resolution 5120x1440 3440x1440 3840x2160
   python main.py --scrape --max-downloads 20 --output ./my_wallpapers
         """
     )
@@ -47,6 +48,18 @@ Examples:
         action='store_true',
         help='Explore wallpaper sites for available themes and categories')
     
+    action_group.add_argument(
+        '--rescan-library',
+        action='store_true',
+        help='Rescan the output folder, refresh the cached image dimensions and report timing')
+    
+    action_group.add_argument(
+        '--evaluate-library',
+        type=str,
+        nargs='+',
+        metavar='RESOLUTION',
+        help='Score the wallpapers in the output folder against one or more resolutions (e.g., 3840x2160 5120x1440)')
+    
     action_group.add_argument(
         '--investigate',
         type=str,
@@ -64,7 +77,9 @@ Examples:
     scrape_group.add_argument(
         '--resolution',
         type=str,
-        help='Desired wallpaper resolution (e.g., 5120x1440, 3840x1080)')
+        nargs='+',
+        help='One or more desired wallpaper resolutions (e.g., 5120x1440, or 5120x1440 3440x1440 3840x2160 '
+             'to fill one subfolder per resolution from a single crawl)')
     
     scrape_group.add_argument(
         '--sites',
@@ -93,12 +108,23 @@ Examples:
         metavar='N',
         help='Number of parallel download workers')
     
+    perf_group.add_argument(
+        '--engine',
+        type=str,
+        choices=['threads', 'async'],
+        help='Execution engine: thread pools (default) or a single asyncio event loop (requires aiohttp)')
+    
     perf_group.add_argument(
         '--timeout',
         type=int,
         metavar='SEC',
         help='Request timeout in seconds')
     
+    perf_group.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always refetch and reparse search and detail pages instead of using the on-disk caches')
+    
     # Logging and debug options
     debug_group = parser.add_argument_group('debugging options')
     debug_group.add_argument(
@@ -126,7 +152,7 @@ Examples:
     from pathlib import Path
     
     # Setup logging
-    log_file = Path("temp/wallpaper_scraper.log") if not args.dry_run else None
+    log_file = Path(os.getenv("TEMP_FOLDER", "temp"), "wallpaper_scraper.log") if not args.dry_run else None
     setup_enhanced_logging(
         log_level=args.log_level,
         log_file=log_file,
@@ -139,6 +165,14 @@ Examples:
         from src.wallpaper_scout import main as scout_main
         scout_main()
         
+    elif args.rescan_library:
+        from src.wallpaper_scraper import rescan_library
+        rescan_library(output_dir=args.output, workers=args.workers)
+        
+    elif args.evaluate_library:
+        from src.wallpaper_scraper import evaluate_library
+        evaluate_library(args.evaluate_library, output_dir=args.output, workers=args.workers)
+        
     elif args.investigate:
         logging.info(f"Investigating site: {args.investigate}")
         if args.investigate == 'wallpaperswide.com':
@@ -172,6 +206,8 @@ Examples:
             'output_dir': args.output,
             'workers': args.workers,
             'timeout': args.timeout,
+            'engine': args.engine,
+            'use_cache': False if args.no_cache else None,
             'dry_run': args.dry_run,
         }
         
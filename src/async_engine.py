@@ -0,0 +1,494 @@
+"""
+async_engine.py
+
+Asyncio execution engine for the Wallpaper Scraper application (--engine async).
+Runs page discovery for every service and all image downloads on a single event
+loop, bounding concurrency with one semaphore per host instead of blocking one
+thread per request. Requires the optional aiohttp dependency.
+"""
+
+import asyncio
+import codecs
+import logging
+import os
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, only needed for --engine async
+    aiohttp = None
+
+from src.config import CONFIG
+from src.download_writer import RESUMABLE_STATUSES, PartFileWriter
+from src.http_cache import HttpCache
+from src.pipeline import ThemeBudget
+from src.rate_limiter import HostRateLimiter, parse_retry_after
+from src.utils import (
+    ConfigurationError, DownloadTooLargeError, NetworkError, UndersizedImageError, to_thread)
+from src.wallpaper_scraper import (
+    check_image_resolution, create_scrape_progress_bars, existing_download_ok,
+    finish_download_target, header_size_check, image_path_for_url, record_download)
+
+
+class AsyncHttpClient:
+    """
+    aiohttp session wrapper that bounds in-flight requests with one semaphore per host.
+    Must be used as an async context manager inside a running event loop.
+    """
+
+    def __init__(
+            self,
+            per_host_limit: Optional[int] = None,
+            total_limit: Optional[int] = None,
+            timeout: Optional[int] = None,
+            rate_limiter: Optional[HostRateLimiter] = None,
+            cache: Optional[HttpCache] = None):
+        """
+        Initialize the client.
+
+        Args:
+            per_host_limit: Maximum concurrent requests per host
+                (defaults to CONFIG['ASYNC_CONNECTIONS_PER_HOST'])
+            total_limit: Maximum open connections overall
+                (defaults to CONFIG['ASYNC_MAX_CONNECTIONS'])
+            timeout: Request timeout in seconds (defaults to CONFIG['REQUEST_TIMEOUT'])
+            rate_limiter: Optional per-host limiter pacing page requests
+                (defaults to one built from CONFIG)
+            cache: Optional page cache consulted by fetch_text()
+
+        Raises:
+            ConfigurationError: If aiohttp is not installed
+        """
+        if aiohttp is None:
+            raise ConfigurationError(
+                "The async engine requires aiohttp. Install it with: pip install aiohttp")
+        self.per_host_limit = max(1, per_host_limit or CONFIG.get('ASYNC_CONNECTIONS_PER_HOST', 8))
+        self.total_limit = max(1, total_limit or CONFIG.get('ASYNC_MAX_CONNECTIONS', 100))
+        self.timeout = timeout or CONFIG.get('REQUEST_TIMEOUT', 30)
+        self.max_retries = CONFIG.get('MAX_RETRIES', 3)
+        self.retry_delay = CONFIG.get('RETRY_DELAY', 1)
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.cache = cache
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session = None
+
+    async def __aenter__(self) -> 'AsyncHttpClient':
+        connector = aiohttp.TCPConnector(limit=self.total_limit)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self._session.close()
+
+    def _semaphore_for(self, url: str) -> asyncio.Semaphore:
+        """Return the semaphore bounding concurrent requests to the URL's host."""
+        host = urlparse(url).netloc.lower()
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def fetch_text(
+            self, url: str, headers: Optional[dict] = None, cache_key: Optional[str] = None) -> Optional[str]:
+        """
+        Fetch a page as text, with retry logic and exponential backoff.
+        Page requests are paced by the per-host rate limiter and, when a cache is
+        attached, served from it while fresh or revalidated with ETag/Last-Modified.
+
+        Args:
+            url: The URL to fetch
+            headers: Optional request headers
+            cache_key: Key of the response in the cache (defaults to the URL), see HttpClient.get()
+
+        Returns:
+            The decoded body if successful, None otherwise
+        """
+        if self.cache is None:
+            return await self._fetch(url, headers, lambda response: response.text(), rate_limit=True)
+
+        # SQLite work stays off the event loop
+        key = cache_key or url
+        entry = await to_thread(self.cache.lookup, key)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                return entry.text
+            headers = {**(headers or {}), **self.cache.conditional_headers(entry)}
+
+        async def read_page(response):
+            if response.status == 304:
+                await to_thread(self.cache.refresh, key)
+                return entry.text
+            body = await response.read()
+            encoding = response.get_encoding()
+            await to_thread(
+                self.cache.store, key, body, encoding,
+                response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return body.decode(encoding, errors='replace')
+
+        return await self._fetch(url, headers, read_page, rate_limit=True)
+
+    async def stream_page(self, url: str, new_reader: Callable, headers: Optional[dict] = None):
+        """
+        Fetch a page in chunks and feed its decoded text to a reader while it downloads,
+        with the retry, pacing and cache handling of fetch_text().
+        The connection is released without reading the rest once reader.done turns
+        true; only pages read to the end are stored in the cache.
+
+        Args:
+            url: The URL to fetch
+            new_reader: Callable returning a fresh reader (feed(text), close(), done),
+                such as a ListingExtractor; called once per attempt
+            headers: Optional request headers
+
+        Returns:
+            The reader of the successful attempt, or None if the page could not be fetched
+        """
+        chunk_size = CONFIG.get('LISTING_CHUNK_SIZE', 16384)
+        entry = None
+        if self.cache is not None:
+            entry = await to_thread(self.cache.lookup, url)
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    return self._feed_cached(entry, new_reader())
+                headers = {**(headers or {}), **self.cache.conditional_headers(entry)}
+
+        async def read_page(response):
+            reader = new_reader()
+            if response.status == 304:
+                await to_thread(self.cache.refresh, url)
+                return self._feed_cached(entry, reader)
+            # Without a charset, sniffing would need the whole body
+            encoding = response.charset or 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            body = []
+            async for chunk in response.content.iter_chunked(chunk_size):
+                body.append(chunk)
+                reader.feed(decoder.decode(chunk))
+                if reader.done:
+                    logging.debug(f"Stopped reading {url} after {sum(map(len, body))} bytes")
+                    return reader
+            reader.feed(decoder.decode(b'', final=True))
+            reader.close()
+            if self.cache is not None:
+                await to_thread(
+                    self.cache.store, url, b''.join(body), encoding,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return reader
+
+        return await self._fetch(url, headers, read_page, rate_limit=True)
+
+    @staticmethod
+    def _feed_cached(entry, reader):
+        """Feed a cached page to a reader in one piece."""
+        reader.feed(entry.text)
+        reader.close()
+        return reader
+
+    async def head(self, url: str, headers: Optional[dict] = None) -> Optional[Tuple[int, str]]:
+        """
+        Issue a single HEAD request, paced like a page request and following redirects.
+
+        Args:
+            url: The URL to check
+            headers: Optional request headers
+
+        Returns:
+            (status, Content-Type) of the final response, or None if the request failed
+        """
+        await self.rate_limiter.acquire_async(url)
+        try:
+            async with self._semaphore_for(url):
+                async with self._session.head(url, headers=headers, allow_redirects=True) as response:
+                    if response.status == 429:
+                        self.rate_limiter.penalize(url, parse_retry_after(response.headers.get('Retry-After')))
+                    return response.status, response.headers.get('Content-Type', '')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.debug(f"HEAD {url} failed: {e}")
+            return None
+
+    async def fetch_bytes(self, url: str, headers: Optional[dict] = None) -> Optional[bytes]:
+        """
+        Fetch a resource as bytes, with retry logic and exponential backoff.
+
+        Args:
+            url: The URL to fetch
+            headers: Optional request headers
+
+        Returns:
+            The raw body if successful, None otherwise
+        """
+        return await self._fetch(url, headers, lambda response: response.read(), rate_limit=False)
+
+    async def fetch_to_file(
+            self,
+            url: str,
+            filepath: str,
+            headers: Optional[dict] = None,
+            max_bytes: Optional[int] = None,
+            accept_size: Optional[Callable[[int, int], bool]] = None) -> Optional[PartFileWriter]:
+        """
+        Stream a resource in chunks to a '.part' file and move it over filepath once complete.
+        A broken transfer keeps its '.part' file and the retry asks only for the missing
+        bytes when the server supports ranges.
+
+        Args:
+            url: The URL to fetch
+            filepath: Final path of the file
+            headers: Optional request headers
+            max_bytes: Abort once the body grows past this many bytes
+                (defaults to CONFIG['MAX_IMAGE_MB']; 0 = unlimited)
+            accept_size: Optional check of the (width, height) read from the image header
+
+        Returns:
+            The committed PartFileWriter (with the file's sha256), or None if the file was not written
+
+        Raises:
+            DownloadTooLargeError: If the body is over max_bytes (not retried)
+            UndersizedImageError: If accept_size rejects the header (not retried)
+        """
+        chunk_size = CONFIG.get('DOWNLOAD_CHUNK_SIZE', 65536)
+        attempt = {}
+
+        async def prepare():
+            # A fresh writer per attempt picks up what earlier attempts left on disk
+            # and asks for the rest with a Range request; file work stays off the event loop
+            attempt['writer'] = await to_thread(PartFileWriter, filepath, max_bytes, accept_size)
+            return attempt['writer'].request_headers()
+
+        async def write_body(response):
+            writer = attempt['writer']
+            error = None
+            try:
+                await to_thread(writer.begin, response.status, response.headers)
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    await to_thread(writer.write, chunk)
+                await to_thread(writer.commit)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                await to_thread(writer.close, error)
+            return writer
+
+        return await self._fetch(
+            url, headers, write_body, rate_limit=False,
+            ok_statuses=RESUMABLE_STATUSES, prepare=prepare)
+
+    async def _fetch(self, url, headers, read_body, rate_limit, ok_statuses=(200, 304), prepare=None):
+        for attempt in range(self.max_retries):
+            wait_time = self.retry_delay * (2 ** attempt)
+            try:
+                request_headers = headers
+                if prepare is not None:
+                    # Per-attempt headers, e.g. a Range request resuming a partial download
+                    request_headers = {**(headers or {}), **await prepare()}
+                if rate_limit:
+                    await self.rate_limiter.acquire_async(url)
+                async with self._semaphore_for(url):
+                    async with self._session.get(url, headers=request_headers) as response:
+                        # 304 only comes back for conditional requests built from a cache entry
+                        if response.status in ok_statuses:
+                            return await read_body(response)
+                        if response.status == 429:
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            self.rate_limiter.penalize(url, retry_after)
+                            if rate_limit and self.rate_limiter.pauses(url):
+                                # The next attempt waits in the rate limiter
+                                wait_time = 0
+                            elif retry_after is not None:
+                                # Unlimited hosts cannot be paused, so wait for Retry-After here
+                                wait_time = retry_after
+                        logging.warning(f"HTTP {response.status} fetching {url} on attempt {attempt + 1}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, NetworkError) as e:
+                logging.warning(f"Error fetching {url} on attempt {attempt + 1}: {e}")
+
+            # Apply exponential backoff if this is not the last attempt
+            if attempt < self.max_retries - 1 and wait_time > 0:
+                logging.debug(f"Retrying in {wait_time} seconds")
+                await asyncio.sleep(wait_time)
+
+        logging.error(f"Failed to fetch {url} after {self.max_retries} attempts")
+        return None
+
+
+async def download_image_async(
+        url, output_folder, client, headers, min_width=0, min_height=0, manifest=None, site=None):
+    """
+    Download a single image on the event loop and verify its resolution.
+    The body is streamed in chunks to a '.part' file that replaces the final
+    path only once it is complete; an image whose header shows it is too small
+    is aborted before anything is written, and a broken transfer is resumed
+    from where it stopped when the server supports ranges.
+
+    Args:
+        url (str): URL of the image to download
+        output_folder (str): Folder to save the image
+        client (AsyncHttpClient): Client used for the request
+        headers (dict): HTTP headers to use for the request
+        min_width (int): Minimum required width in pixels
+        min_height (int): Minimum required height in pixels
+        manifest (DownloadManifest): Optional manifest updated once the download is verified
+        site (str): Site the wallpaper was found on, recorded in the manifest
+
+    Returns:
+        bool: True if the download was successful, False otherwise
+    """
+    filepath = image_path_for_url(url, output_folder)
+    filename = os.path.basename(filepath)
+
+    accept_size = header_size_check(min_width, min_height)
+
+    try:
+        writer = await client.fetch_to_file(
+            url, filepath, headers=headers, accept_size=accept_size)
+    except DownloadTooLargeError as e:
+        logging.warning(f"Skipping {url}: {e}")
+        return False
+    except UndersizedImageError as e:
+        logging.info(
+            f"Aborted {filename}: {e}, expected at least {min_width}x{min_height}")
+        return False
+    if writer is None:
+        logging.warning(f"Failed to download {url}")
+        return False
+
+    if min_width > 0 and min_height > 0:
+        # PIL work stays off the event loop
+        meets_req, width, height, match_code = await to_thread(
+            check_image_resolution, filepath, min_width, min_height)
+        if not meets_req:
+            logging.warning(
+                f"Downloaded image {filename} has insufficient resolution: {width}x{height}, expected at least {min_width}x{min_height}")
+            try:
+                os.remove(filepath)
+                logging.info(f"Removed {filename} due to insufficient resolution")
+            except Exception as e:
+                logging.error(f"Failed to remove {filename}: {e}")
+            return False
+        await to_thread(
+            record_download, manifest, url, filepath, width, height, match_code, min_width, min_height,
+            site, writer.sha256)
+
+    logging.debug(f"Successfully downloaded {url} to {filepath}")
+    return True
+
+
+async def _scrape_and_download(
+        themes, targets, available_sites, service_classes,
+        timeout, headers, dry_run, page_cache=None, resolution_cache=None):
+    targets_by_resolution = {target.resolution: target for target in targets}
+    download_queue = asyncio.Queue(maxsize=max(1, CONFIG.get('PIPELINE_QUEUE_SIZE', 50)))
+    # Services walk result pages until every target has enough wallpapers of a theme
+    budget = ThemeBudget(target.selector for target in targets)
+
+    async def on_wallpaper(candidate):
+        # Dedup and the per-theme limit apply as candidates stream in; a full queue
+        # holds discovery back until the download workers catch up. Listed
+        # dimensions that cannot meet the target are dropped without a request.
+        target = targets_by_resolution.get(candidate.resolution)
+        if target is None or not candidate.may_fit(target.min_width, target.min_height):
+            return
+        if target.selector.admit(candidate.theme, candidate.download_url) and not dry_run:
+            await download_queue.put((candidate, target))
+
+    async with AsyncHttpClient(timeout=timeout, cache=page_cache) as client:
+        scrape_bars = create_scrape_progress_bars(available_sites, themes, targets[0].resolution)
+        download_bar = None
+        if not dry_run:
+            download_bar = tqdm(desc="Downloading", position=len(scrape_bars))
+            logging.info(
+                f"Downloading wallpapers as they are found on the event loop "
+                f"({client.per_host_limit} concurrent requests per host)")
+
+        async def download_worker():
+            while True:
+                item = await download_queue.get()
+                if item is None:
+                    return
+                candidate, target = item
+                url, site = candidate.download_url, candidate.site
+                try:
+                    if await to_thread(
+                            existing_download_ok, url, target.output_folder,
+                            target.min_width, target.min_height, target.manifest, site):
+                        target.stats.record(already_downloaded=True)
+                    else:
+                        target.stats.record(
+                            success=await download_image_async(
+                                url, target.output_folder, client, headers,
+                                target.min_width, target.min_height, target.manifest, site),
+                            path=image_path_for_url(url, target.output_folder))
+                except Exception as e:
+                    logging.error(f"Error downloading {url}: {e}")
+                    target.stats.record(success=False)
+                download_bar.update(1)
+
+        def make_progress_callback(site):
+            def progress_cb():
+                scrape_bars[site].update(1)
+            return progress_cb
+
+        workers = [] if dry_run else [
+            asyncio.create_task(download_worker()) for _ in range(client.total_limit)]
+        services = {
+            site: service_classes[site](
+                resolution=[target.resolution for target in targets], themes=themes,
+                resolution_cache=resolution_cache, wallpaper_callback=on_wallpaper,
+                budget=budget)
+            for site in available_sites
+        }
+        try:
+            results = await asyncio.gather(
+                *(service.fetch_wallpapers_async(client, progress_callback=make_progress_callback(site))
+                  for site, service in services.items()),
+                return_exceptions=True)
+            for bar in scrape_bars.values():
+                bar.close()
+
+            for site, site_urls in zip(services, results):
+                if isinstance(site_urls, Exception):
+                    logging.error(f"Error processing site {site}: {site_urls}")
+                    continue
+                logging.info(f"Found {len(site_urls)} wallpapers from {site}")
+        finally:
+            # Discovery is over: let each worker finish the queue and stop
+            for _ in workers:
+                await download_queue.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+        if download_bar is not None:
+            download_bar.close()
+
+    for target in targets:
+        await to_thread(
+            finish_download_target, target, dry_run, multiple=len(targets) > 1)
+
+
+def run_async_engine(
+        themes, targets, available_sites, service_classes,
+        timeout, headers, dry_run, page_cache=None, resolution_cache=None):
+    """
+    Run discovery and downloads for all services on one event loop.
+
+    Args:
+        themes: List of themes to search for
+        targets: DownloadTarget per resolution; each has its own folder, per-theme limit and manifest
+        available_sites: Sites to scrape, already validated against service_classes
+        service_classes: Mapping of site name to service class
+        timeout: Request timeout in seconds
+        headers: HTTP headers used for image downloads
+        dry_run: If True, show what would be downloaded without downloading
+        page_cache: Optional HttpCache for search and detail pages
+        resolution_cache: Optional ResolutionCache of earlier detail-page results
+    """
+    try:
+        asyncio.run(_scrape_and_download(
+            themes, targets, available_sites, service_classes,
+            timeout, headers, dry_run, page_cache, resolution_cache))
+    except ConfigurationError as e:
+        logging.error(str(e))
@@ -64,7 +64,7 @@ AVAILABLE_SERVICES = [
 CONFIG = {
     # Wallpaper Settings
     'VERSION': '1.0.2',  # Project version (updated for enhancements)
-    'RESOLUTION': os.getenv('DEFAULT_RESOLUTION', '5120x1440'),  # Desired wallpaper resolution
+    'RESOLUTION': os.getenv('DEFAULT_RESOLUTION', '5120x1440'),  # Desired wallpaper resolution; comma-separate several to fill one subfolder each
     'SITES': get_env_list('ENABLED_SITES', [
         'wallpaperswide.com',
         'wallhaven.cc',
@@ -73,25 +73,60 @@ CONFIG = {
     
     # Storage Folders
     'OUTPUT_FOLDER': os.path.join(default_data_dir, 'wallpapers'),  # Where wallpapers are saved
-    'TEMP_FOLDER': os.path.join(PROJECT_ROOT, 'temp'),  # For logs and temp files
+    'TEMP_FOLDER': os.getenv('TEMP_FOLDER', os.path.join(PROJECT_ROOT, 'temp')),  # For logs, caches and indexes
 
     # HTTP Settings
     'REQUEST_TIMEOUT': get_env_int('REQUEST_TIMEOUT', 30),  # Increased from env or default
     'MAX_RETRIES': get_env_int('MAX_RETRIES', 3),       # Number of retry attempts
     'RETRY_DELAY': get_env_float('RETRY_DELAY', 1.0),     # Delay between retries (seconds)
-    'REQUEST_DELAY': get_env_float('REQUEST_DELAY', 2.0),   # Delay between requests to the same site
+    'REQUEST_DELAY': get_env_float('REQUEST_DELAY', 2.0),   # Delay between requests to the same site (sets the default rate limit)
+    'RATE_LIMIT': get_env_float('RATE_LIMIT', 0.0),         # Page requests per second per host (0 = 1 / REQUEST_DELAY)
+    'RATE_LIMIT_BURST': get_env_int('RATE_LIMIT_BURST', 2),  # Requests a host may receive back-to-back
+    'RATE_LIMIT_COOLDOWN': get_env_float('RATE_LIMIT_COOLDOWN', 5.0),  # Pause after a 429 without Retry-After (seconds)
+    'HOST_RATE_LIMITS': {},  # Per-host overrides, e.g. {'wallhaven.cc': (0.75, 3)} as (rate, burst)
+    'HTTP_CACHE_ENABLED': get_env_bool('HTTP_CACHE_ENABLED', True),  # Cache search/detail pages under TEMP_FOLDER
+    'HTTP_CACHE_TTL': get_env_int('HTTP_CACHE_TTL', 21600),  # Seconds a cached page is used before revalidating
+    'HTTP_CACHE_MAX_MB': get_env_int('HTTP_CACHE_MAX_MB', 100),  # Size limit; least recently used pages are evicted
+    'DETAIL_CACHE_TTL': get_env_int('DETAIL_CACHE_TTL', 2592000),  # Seconds before a cached download URL is checked again on its detail page
+    'DETAIL_CACHE_NEGATIVE_TTL': get_env_int('DETAIL_CACHE_NEGATIVE_TTL', 604800),  # Seconds before a page with no suitable resolution is checked again
+    'DOWNLOAD_CHUNK_SIZE': get_env_int('DOWNLOAD_CHUNK_SIZE', 65536),  # Bytes read and written at a time per image download
+    'MAX_IMAGE_MB': get_env_int('MAX_IMAGE_MB', 0),  # Abort image downloads larger than this (0 = no limit)
+    'RESUME_DOWNLOADS': get_env_bool('RESUME_DOWNLOADS', True),  # Keep broken downloads and resume them with Range requests
+    'DOWNLOAD_MANIFEST': get_env_bool('DOWNLOAD_MANIFEST', True),  # Record downloads in a SQLite manifest in the output folder
+    'DOWNLOAD_MANIFEST_NAME': os.getenv('DOWNLOAD_MANIFEST_NAME', '.wallpapers.sqlite3'),  # Manifest file name inside the output folder
+    'DUPLICATE_ACTION': os.getenv('DUPLICATE_ACTION', 'hardlink'),  # Same content from another URL: 'hardlink', 'skip' or 'keep'
+    'NEAR_DUPLICATES': get_env_bool('NEAR_DUPLICATES', False),  # Delete all but the best version of visually similar downloads (opt-in)
+    'PHASH_MAX_DISTANCE': get_env_int('PHASH_MAX_DISTANCE', 4),  # dHash bits two images may differ by and still count as the same
+    'PHASH_INDEX_NAME': os.getenv('PHASH_INDEX_NAME', '.phash.sqlite3'),  # Perceptual-hash index file inside the output folder
+    'LIBRARY_INDEX_ENABLED': get_env_bool('LIBRARY_INDEX_ENABLED', True),  # Keep image dimensions under TEMP_FOLDER between runs
+    'LIBRARY_SCAN_ON_START': get_env_bool('LIBRARY_SCAN_ON_START', True),  # Scan the output folder in parallel before scraping
+    'HEADER_PROBE_BYTES': get_env_int('HEADER_PROBE_BYTES', 262144),  # Bytes held in memory while reading an image header
     'USER_AGENT': os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'),
     'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO').upper(),    # Logging level from env
     'MAX_ITEMS_PER_THEME': get_env_int('MAX_ITEMS_PER_THEME', 10),  # Max wallpapers to process per theme
+    'MAX_PAGES_PER_THEME': get_env_int('MAX_PAGES_PER_THEME', 5),  # Result pages a theme's listing may be walked to fill its --max-downloads
+    'HTML_PARSER': os.getenv('HTML_PARSER', 'auto'),  # 'auto' (lxml when installed), 'lxml' or 'html.parser'
+    'STREAM_LISTINGS': get_env_bool('STREAM_LISTINGS', True),  # Extract links from search/theme pages while they download and stop at MAX_ITEMS_PER_THEME
+    'LISTING_CHUNK_SIZE': get_env_int('LISTING_CHUNK_SIZE', 16384),  # Bytes of a streamed listing page parsed at a time
 
     # Parallelism
     'MAX_WORKERS': get_env_int('MAX_CONCURRENT_DOWNLOADS', 4),        # From env or default
+    'ENGINE': os.getenv('SCRAPER_ENGINE', 'threads'),                  # 'threads' or 'async'
+    'DETAIL_CONCURRENCY': get_env_int('DETAIL_CONCURRENCY', 4),        # Detail pages processed at once per service
+    'SITE_CONCURRENCY': {},  # Per-site overrides, e.g. {'wallhaven.cc': 8}
+    'PIPELINE_QUEUE_SIZE': get_env_int('PIPELINE_QUEUE_SIZE', 50),     # Found URLs waiting for a download worker before discovery is held back
+    'ASYNC_CONNECTIONS_PER_HOST': get_env_int('ASYNC_CONNECTIONS_PER_HOST', 8),  # Semaphore size per host (async engine)
+    'ASYNC_MAX_CONNECTIONS': get_env_int('ASYNC_MAX_CONNECTIONS', 100),  # Total open connections (async engine)
     
     # Debug and Development
     'DEBUG': get_env_bool('DEBUG', False),  # Debug mode flag
     
     # Site-specific configurations
-    'WALLHAVEN_API_KEY': os.getenv('WALLHAVEN_API_KEY', ''),  # Optional API key for enhanced access
+    'WALLHAVEN_API_KEY': os.getenv('WALLHAVEN_API_KEY', ''),  # Optional API key, sent as X-API-Key with wallhaven.cc API searches only
+    'WALLHAVEN_USE_API': get_env_bool('WALLHAVEN_USE_API', True),  # Search wallhaven.cc through its JSON API instead of search and detail pages
+    'WALLHAVEN_LISTING_METADATA': get_env_bool('WALLHAVEN_LISTING_METADATA', True),  # Build wallhaven.cc image URLs from search thumbnails instead of detail pages
+    'WALLPAPERSWIDE_PROBE_DOWNLOADS': get_env_bool('WALLPAPERSWIDE_PROBE_DOWNLOADS', True),  # Check derived wallpaperswide.com download URLs with HEAD before fetching detail pages
+    'WALLPAPERBAT_ULTRAWIDE_ITEMS': get_env_int('WALLPAPERBAT_ULTRAWIDE_ITEMS', 30),  # Detail pages of wallpaperbat.com's ultrawide listing visited once per run and matched against every theme
     'WALLPAPERBAT_USER_AGENT': os.getenv('WALLPAPERBAT_USER_AGENT', 'WallpaperScraper/1.0'),
 }
 
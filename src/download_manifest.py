@@ -0,0 +1,237 @@
+"""
+download_manifest.py
+
+Persistent manifest of downloaded wallpapers, stored in the output folder.
+Each row records the source URL, local path, file size and mtime, the image
+dimensions with their match code, and the site it came from. Skip decisions
+for existing files come from an indexed lookup; the image is only opened again
+when its size or mtime no longer match the recorded values.
+
+Downloads also record the SHA-256 computed while they streamed in. When a new
+download has the same content as a file already in the folder (the same
+wallpaper mirrored on another site), it is replaced by a hardlink to that file
+or dropped, depending on CONFIG['DUPLICATE_ACTION'].
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from src.config import CONFIG
+
+
+class ManifestEntry(NamedTuple):
+    """A downloaded wallpaper as recorded in the manifest."""
+    url: str
+    path: str
+    size: int
+    mtime_ns: int
+    width: int
+    height: int
+    match_code: int
+    resolution: str
+    site: Optional[str]
+    recorded_at: float
+    sha256: Optional[str] = None
+
+
+class DownloadManifest:
+    """
+    Thread-safe SQLite manifest of the wallpapers in one output folder.
+    """
+
+    def __init__(self, output_folder: str, path: Optional[str] = None):
+        """
+        Initialize the manifest, creating its database on first use.
+
+        Args:
+            output_folder: Folder the wallpapers are saved to
+            path: Database file (defaults to CONFIG['DOWNLOAD_MANIFEST_NAME'] in output_folder)
+        """
+        self.path = path or os.path.join(
+            output_folder, CONFIG.get('DOWNLOAD_MANIFEST_NAME', '.wallpapers.sqlite3'))
+        self.hits = 0
+        self.revalidated = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " url TEXT PRIMARY KEY, path TEXT NOT NULL,"
+            " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " width INTEGER NOT NULL, height INTEGER NOT NULL,"
+            " match_code INTEGER NOT NULL, resolution TEXT NOT NULL,"
+            " site TEXT, recorded_at REAL NOT NULL, sha256 TEXT)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(downloads)")}
+        if 'sha256' not in columns:
+            # Manifests written before content hashing
+            self._conn.execute("ALTER TABLE downloads ADD COLUMN sha256 TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS downloads_path ON downloads (path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS downloads_sha256 ON downloads (sha256)")
+        self._conn.commit()
+
+    def lookup(self, url: str) -> Optional[ManifestEntry]:
+        """
+        Return the recorded entry for a URL if the file on disk is unchanged.
+        The entry's path is where the content lives, which for a dropped
+        duplicate is the file of the URL it duplicates.
+
+        Args:
+            url: Source URL of the wallpaper
+
+        Returns:
+            The ManifestEntry, or None if the URL is unknown, the file is missing,
+            or its size or mtime changed since it was recorded
+        """
+        entry = self._select("url = ?", url)
+        if entry is None:
+            return None
+        if not self._unchanged(entry):
+            self.revalidated += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def _select(self, where, value):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, path, size, mtime_ns, width, height, match_code, resolution,"
+                f" site, recorded_at, sha256 FROM downloads WHERE {where} LIMIT 1", (value,)).fetchone()
+        return ManifestEntry(*row) if row is not None else None
+
+    @staticmethod
+    def _unchanged(entry: ManifestEntry) -> bool:
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            return False
+        return stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns
+
+    def deduplicate(self, url: str, filepath: str, sha256: str) -> str:
+        """
+        Collapse a new download onto an existing file with the same content.
+
+        Args:
+            url: Source URL of the new download
+            filepath: Where the new download was written
+            sha256: Hex SHA-256 of the new download
+
+        Returns:
+            The path that now holds the content: filepath, or the existing file
+            when the duplicate was dropped (DUPLICATE_ACTION 'skip')
+        """
+        action = CONFIG.get('DUPLICATE_ACTION', 'hardlink')
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, path, size, mtime_ns, width, height, match_code, resolution,"
+                " site, recorded_at, sha256 FROM downloads WHERE sha256 = ? AND url != ?",
+                (sha256, url)).fetchall()
+        original = next(
+            (entry for entry in map(ManifestEntry._make, rows)
+             if os.path.abspath(entry.path) != os.path.abspath(filepath) and self._unchanged(entry)),
+            None)
+        if original is None or action == 'keep':
+            return filepath
+
+        name = os.path.basename(filepath)
+        try:
+            if action == 'skip':
+                os.remove(filepath)
+                kept = original.path
+            else:
+                link_path = filepath + '.link'
+                os.link(original.path, link_path)
+                os.replace(link_path, filepath)
+                kept = filepath
+        except OSError as e:
+            logging.debug(f"Keeping duplicate {name}: {e}")
+            return filepath
+        logging.info(f"{name} duplicates {os.path.basename(original.path)} ({action})")
+        with self._lock:
+            self.duplicates += 1
+            self.bytes_saved += original.size
+        return kept
+
+    def repoint(self, old_path: str, new_path: str) -> None:
+        """
+        Point every URL recorded for old_path at new_path, after old_path was
+        removed as a near-duplicate, so those URLs are not downloaded again.
+
+        Args:
+            old_path: File that was removed
+            new_path: Recorded file that was kept in its place
+        """
+        kept = self._select("path = ?", new_path)
+        with self._lock:
+            if kept is None:
+                self._conn.execute("DELETE FROM downloads WHERE path = ?", (old_path,))
+            else:
+                self._conn.execute(
+                    "UPDATE downloads SET path = ?, size = ?, mtime_ns = ?, width = ?, height = ?,"
+                    " match_code = ?, resolution = ? WHERE path = ?",
+                    (kept.path, kept.size, kept.mtime_ns, kept.width, kept.height,
+                     kept.match_code, kept.resolution, old_path))
+            self._conn.commit()
+
+    def record(
+            self,
+            url: str,
+            filepath: str,
+            width: int,
+            height: int,
+            match_code: int,
+            resolution: str,
+            site: Optional[str] = None,
+            sha256: Optional[str] = None) -> None:
+        """
+        Record a file on disk together with its dimensions.
+
+        Args:
+            url: Source URL of the wallpaper
+            filepath: Local path the URL is saved to
+            width: Image width in pixels
+            height: Image height in pixels
+            match_code: evaluate_resolution_match() result for the target resolution
+            resolution: Target resolution the match code was computed for (e.g., '5120x1440')
+            site: Site the wallpaper was found on
+            sha256: Hex SHA-256 of the file, when it was computed during the download
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError as e:
+            logging.debug(f"Not recording {filepath} in the manifest: {e}")
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads"
+                " (url, path, size, mtime_ns, width, height, match_code, resolution, site,"
+                " recorded_at, sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, filepath, stat.st_size, stat.st_mtime_ns, width, height, match_code,
+                 resolution.lower(), site, time.time(), sha256))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def log_stats(self) -> None:
+        """Log how many existing files were answered from the manifest during this run."""
+        if self.hits or self.revalidated:
+            logging.info(
+                f"Download manifest: {self.hits} existing files skipped without opening them, "
+                f"{self.revalidated} changed files rechecked")
+        if self.duplicates:
+            logging.info(
+                f"Content dedup: {self.duplicates} duplicate downloads collapsed, "
+                f"{self.bytes_saved / (1024 * 1024):.1f} MB of storage saved")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,337 @@
+"""
+download_writer.py
+
+Crash-safe file writer for image downloads.
+Chunks are streamed into '<filename>.part', flushed and fsynced, and only then
+moved over the final path with os.replace, so an interrupted run never leaves a
+truncated image behind and memory per download stays at one chunk. When a size
+check is given, the first chunks are held in memory until the image header shows
+the dimensions, and undersized images are aborted before anything touches disk.
+A transfer that breaks off keeps its '.part' file together with the server's
+ETag/Last-Modified and length, so the next attempt asks for the missing bytes
+only with a Range request. A SHA-256 of the body is computed as it streams in,
+for content-addressed deduplication.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Callable, Optional
+
+from src.config import CONFIG
+from src.image_header import ImageSizeProbe, read_file_size
+from src.utils import (
+    DownloadTooLargeError, NetworkError, ResolutionError, UndersizedImageError)
+
+PART_SUFFIX = '.part'
+META_SUFFIX = '.json'  # Resume validators, stored next to the '.part' file
+
+# Responses a PartFileWriter can handle: full body, resumed body, and an unusable Range
+RESUMABLE_STATUSES = (200, 206, 416)
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-\d+/(\d+|\*)')
+
+
+def max_image_bytes() -> int:
+    """Return the configured per-image size cap in bytes (0 = unlimited)."""
+    return max(0, CONFIG.get('MAX_IMAGE_MB', 0)) * 1024 * 1024
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class PartFileWriter:
+    """
+    Writes one download to a '.part' file and atomically renames it when complete.
+
+    Create one writer per request: send request_headers(), pass the response
+    status and headers to begin(), then write() the body and commit(). The '.part'
+    file is created on the first write that is not held back for the header check.
+    Use as a context manager; when the block exits without a commit, the '.part'
+    file is kept for resuming if the transfer broke off and the server supports
+    ranges, and removed otherwise. Every method is blocking, so the async engine
+    calls them through src.utils.to_thread.
+    """
+
+    def __init__(
+            self,
+            filepath: str,
+            max_bytes: Optional[int] = None,
+            accept_size: Optional[Callable[[int, int], bool]] = None,
+            resume: Optional[bool] = None):
+        """
+        Initialize the writer.
+
+        Args:
+            filepath: Final path of the image
+            max_bytes: Abort once the body grows past this many bytes
+                (defaults to CONFIG['MAX_IMAGE_MB']; 0 = unlimited)
+            accept_size: Optional check of (width, height) read from the image header;
+                the download is aborted when it returns False
+            resume: Continue an earlier partial download with a Range request
+                (defaults to CONFIG['RESUME_DOWNLOADS'])
+        """
+        self.filepath = filepath
+        self.part_path = filepath + PART_SUFFIX
+        self.meta_path = self.part_path + META_SUFFIX
+        self.max_bytes = max_image_bytes() if max_bytes is None else max_bytes
+        self.accept_size = accept_size
+        self.resume = CONFIG.get('RESUME_DOWNLOADS', True) if resume is None else resume
+        self.bytes_written = 0
+        self.resumed_from = 0
+        self.expected_length = None
+        self.resumable = False
+        self.size = None
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._probe = ImageSizeProbe() if accept_size else None
+        self._held = []
+        self._file = None
+        self._pending_meta = None
+        self._partial = self._load_partial() if self.resume else None
+
+    def _load_partial(self):
+        """Return the validators and offset of an earlier partial download, if usable."""
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            offset = os.path.getsize(self.part_path)
+        except (OSError, ValueError):
+            return None
+        length = meta.get('length')
+        if not offset or not (meta.get('etag') or meta.get('last_modified') or length):
+            return None
+        if length and offset >= length:
+            return None
+        meta['offset'] = offset
+        return meta
+
+    def request_headers(self) -> dict:
+        """
+        Return the Range/If-Range headers that resume an earlier partial download.
+
+        Returns:
+            The headers to add to the request, or an empty dict to fetch the whole body
+        """
+        if not self._partial:
+            return {}
+        headers = {'Range': f"bytes={self._partial['offset']}-"}
+        validator = self._partial.get('etag') or self._partial.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+        return headers
+
+    def begin(self, status: int, headers) -> None:
+        """
+        Prepare for the response body: append on a valid 206, otherwise start from byte zero.
+
+        Args:
+            status: HTTP status of the response (one of RESUMABLE_STATUSES)
+            headers: Response headers
+
+        Raises:
+            NetworkError: If the server rejected the resume (the next attempt starts over)
+            DownloadTooLargeError: If the announced size exceeds max_bytes
+            UndersizedImageError: If the part already on disk shows rejected dimensions
+        """
+        name = os.path.basename(self.filepath)
+        if status == 416:
+            self.reset()
+            raise NetworkError(f"Range not satisfiable for {name}, restarting download")
+        if status == 206:
+            self._begin_resume(name, headers)
+            return
+
+        # Full body: anything left from an earlier attempt is stale
+        self.reset()
+        self.check_length(headers.get('Content-Length'))
+        self.expected_length = _to_int(headers.get('Content-Length'))
+        meta = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'length': self.expected_length,
+        }
+        if self.resume and headers.get('Accept-Ranges', '').lower() == 'bytes' and any(meta.values()):
+            # Written together with the '.part' file, so rejected images leave nothing behind
+            self._pending_meta = meta
+            self.resumable = True
+
+    def _begin_resume(self, name, headers):
+        partial = self._partial
+        match = _CONTENT_RANGE.match(headers.get('Content-Range', ''))
+        etag = headers.get('ETag')
+        total = None
+        if match and match.group(2) != '*':
+            total = int(match.group(2))
+        if (partial is None or match is None or int(match.group(1)) != partial['offset']
+                or (partial.get('length') and total != partial['length'])
+                or (etag and partial.get('etag') and etag != partial['etag'])):
+            self.reset()
+            raise NetworkError(f"Server rejected the resume of {name}, restarting download")
+
+        self.check_length(str(total) if total else None)
+        self.expected_length = total or partial.get('length')
+        self.bytes_written = self.resumed_from = partial['offset']
+        self.resumable = True
+        # The digest covers the whole file, so hash what the earlier attempt wrote
+        chunk_size = CONFIG.get('DOWNLOAD_CHUNK_SIZE', 65536)
+        with open(self.part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                self._hash.update(chunk)
+        if self._probe is not None:
+            # The header of the earlier attempt is already on disk
+            self.size = read_file_size(self.part_path)
+            self._probe = None
+            if self.size is not None and not self.accept_size(*self.size):
+                raise UndersizedImageError(f"{name} is {self.size[0]}x{self.size[1]}")
+        self._file = open(self.part_path, 'ab')
+        logging.debug(f"Resuming {name} at byte {self.resumed_from}")
+
+    def open(self) -> 'PartFileWriter':
+        """Create (or truncate) the '.part' file."""
+        self._file = open(self.part_path, 'wb')
+        if self._pending_meta is not None:
+            with open(self.meta_path, 'w', encoding='utf-8') as f:
+                json.dump(self._pending_meta, f)
+            self._pending_meta = None
+        return self
+
+    def check_length(self, content_length: Optional[str]) -> None:
+        """
+        Reject a download up front when its Content-Length is over the cap.
+
+        Raises:
+            DownloadTooLargeError: If the announced size exceeds max_bytes
+        """
+        if not self.max_bytes or not content_length:
+            return
+        length = _to_int(content_length)
+        if length is not None and length > self.max_bytes:
+            raise DownloadTooLargeError(
+                f"{os.path.basename(self.filepath)} is {length} bytes, over the {self.max_bytes} byte limit")
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append a chunk to the '.part' file.
+
+        Raises:
+            DownloadTooLargeError: If the body grows past max_bytes
+            UndersizedImageError: If the header shows dimensions accept_size rejects
+        """
+        self.bytes_written += len(chunk)
+        if self.max_bytes and self.bytes_written > self.max_bytes:
+            raise DownloadTooLargeError(
+                f"{os.path.basename(self.filepath)} exceeded the {self.max_bytes} byte limit")
+        self._hash.update(chunk)
+        if self._probe is not None and not self._probe.done:
+            # Hold chunks back until the header decides whether the image is worth keeping
+            self._held.append(chunk)
+            self.size = self._probe.feed(chunk)
+            if not self._probe.done:
+                return
+            if self.size is not None and not self.accept_size(*self.size):
+                self._held = []
+                raise UndersizedImageError(
+                    f"{os.path.basename(self.filepath)} is {self.size[0]}x{self.size[1]}")
+            self._flush_held()
+            return
+        if self._file is None:
+            self.open()
+        self._file.write(chunk)
+
+    def _flush_held(self) -> None:
+        if self._file is None:
+            self.open()
+        for held in self._held:
+            self._file.write(held)
+        self._held = []
+
+    def commit(self) -> None:
+        """
+        Flush and fsync the '.part' file, then move it over the final path.
+
+        Raises:
+            NetworkError: If the body is shorter than the announced length (the part is kept for resuming)
+        """
+        # A body shorter than the header probe has not been written out yet
+        self._flush_held()
+        if self.expected_length is not None and self.bytes_written != self.expected_length:
+            if self.bytes_written > self.expected_length:
+                self.resumable = False
+            raise NetworkError(
+                f"{os.path.basename(self.filepath)} ended after {self.bytes_written} of {self.expected_length} bytes")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self.part_path, self.filepath)
+        self.committed = True
+        self._remove(self.meta_path)
+
+    @property
+    def sha256(self) -> Optional[str]:
+        """Hex SHA-256 of the committed file, or None before commit()."""
+        return self._hash.hexdigest() if self.committed else None
+
+    def reset(self) -> None:
+        """Drop any partial data so the download starts again from byte zero."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._remove(self.part_path)
+        self._remove(self.meta_path)
+        self._partial = None
+        self._held = []
+        self._hash = hashlib.sha256()
+        self.bytes_written = self.resumed_from = 0
+        self.resumable = False
+
+    def discard(self, keep_partial: bool = False) -> None:
+        """
+        Close the '.part' file and remove it if the download was not committed.
+
+        Args:
+            keep_partial: Keep the partial data for a later Range request when the server supports it
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.committed:
+            return
+        if keep_partial and self.resumable and os.path.exists(self.part_path):
+            logging.debug(f"Keeping {self.part_path} to resume later")
+            return
+        self._remove(self.part_path)
+        self._remove(self.meta_path)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """
+        Finish with the writer, discarding anything that was not committed.
+
+        Args:
+            error: The exception that ended the transfer, if any; partial data is kept
+                for broken transfers but not for rejected images
+        """
+        self.discard(keep_partial=error is not None
+                     and not isinstance(error, (DownloadTooLargeError, ResolutionError)))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Failed to remove {path}: {e}")
+
+    def __enter__(self) -> 'PartFileWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(exc_value)
@@ -0,0 +1,102 @@
+"""
+html_parser.py
+
+HTML parsing backend shared by the services and the scout.
+parse_html() builds BeautifulSoup trees with lxml when it is installed and the
+standard library parser otherwise. Services pass a SoupStrainer per page type
+so only the elements they read (result thumbnails, the full-size image,
+download links) become Tag objects, and select their elements with soupsieve
+selectors compiled once per process by compile_selector().
+"""
+
+import functools
+import logging
+import re
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+except ImportError:  # Optional dependency, html.parser builds the same trees for our selectors
+    lxml = None
+
+from src.config import CONFIG
+
+PARSERS = ('auto', 'lxml', 'html.parser')
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_parser(choice):
+    if choice not in PARSERS:
+        logging.warning(f"Unknown HTML_PARSER '{choice}', using auto")
+        choice = 'auto'
+    if choice == 'html.parser':
+        return choice
+    if lxml is None:
+        if choice == 'lxml':
+            logging.warning("HTML_PARSER is 'lxml' but lxml is not installed, using html.parser")
+        return 'html.parser'
+    return 'lxml'
+
+
+def parser_name():
+    """
+    Return the BeautifulSoup tree builder selected by CONFIG['HTML_PARSER'].
+
+    Returns:
+        'lxml' or 'html.parser'
+    """
+    return _resolve_parser(CONFIG.get('HTML_PARSER', 'auto'))
+
+
+def parse_html(html, strainer=None):
+    """
+    Parse a page with the configured backend.
+
+    Args:
+        html: Page markup (str or bytes)
+        strainer: Optional SoupStrainer; only matching elements and their
+            descendants are kept in the tree
+
+    Returns:
+        BeautifulSoup object
+    """
+    return BeautifulSoup(html, parser_name(), parse_only=strainer)
+
+
+def strainer(name, classes=(), **attrs):
+    """
+    Build a SoupStrainer for elements with one of the given CSS classes.
+    Strainers see the raw class attribute while the page is parsed, so a plain
+    class_='thumb' would miss class="thumb thumb-sfw"; the classes are matched
+    as whole words instead.
+
+    Args:
+        name: Tag name or list of tag names
+        classes: CSS classes, any one of which is enough to match
+        **attrs: Further attribute filters passed to SoupStrainer
+
+    Returns:
+        SoupStrainer
+    """
+    if classes:
+        if isinstance(classes, str):
+            classes = (classes,)
+        words = '|'.join(re.escape(cls) for cls in classes)
+        attrs['class_'] = re.compile(rf'(?:^|\s)(?:{words})(?:\s|$)')
+    return SoupStrainer(name, **attrs)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_selector(css):
+    """
+    Compile a CSS selector once for the lifetime of the process.
+
+    Args:
+        css: CSS selector, as accepted by Tag.select()
+
+    Returns:
+        soupsieve.SoupSieve with select() and select_one() methods
+    """
+    return soupsieve.compile(css)
@@ -0,0 +1,188 @@
+"""
+http_cache.py
+
+Persistent response cache for the HTML pages fetched by the services
+(search, theme and detail pages). Entries live in a SQLite file under
+CONFIG['TEMP_FOLDER'], are served directly while younger than the TTL,
+revalidated with ETag/Last-Modified afterwards, and evicted least recently
+used first once the cache grows past its size limit.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from src.config import CONFIG
+
+
+class CacheEntry(NamedTuple):
+    """A cached page body and the validators needed to revalidate it."""
+    url: str
+    body: bytes
+    encoding: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    @property
+    def text(self) -> str:
+        """The body decoded with the encoding it was served with."""
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class HttpCache:
+    """
+    Thread-safe, size-bounded LRU cache of page responses backed by SQLite.
+    """
+
+    def __init__(
+            self,
+            directory: Optional[str] = None,
+            ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None):
+        """
+        Initialize the cache, creating its directory and index on first use.
+
+        Args:
+            directory: Folder holding the cache database
+                (defaults to CONFIG['TEMP_FOLDER']/http_cache)
+            ttl: Seconds an entry is served without revalidation
+                (defaults to CONFIG['HTTP_CACHE_TTL'])
+            max_bytes: Maximum total size of cached bodies
+                (defaults to CONFIG['HTTP_CACHE_MAX_MB'] megabytes)
+        """
+        self.directory = directory or os.path.join(CONFIG['TEMP_FOLDER'], 'http_cache')
+        self.ttl = CONFIG.get('HTTP_CACHE_TTL', 21600) if ttl is None else ttl
+        if max_bytes is None:
+            max_bytes = CONFIG.get('HTTP_CACHE_MAX_MB', 100) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = self.revalidated = self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.directory, 'pages.sqlite3'), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, body BLOB NOT NULL, encoding TEXT,"
+            " etag TEXT, last_modified TEXT, stored_at REAL NOT NULL,"
+            " last_access REAL NOT NULL, size INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_lru ON pages (last_access)")
+        self._conn.commit()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """
+        Return the cached entry for a URL and mark it as recently used.
+        Lookups that find a fresh entry are counted as hits.
+
+        Args:
+            url: The page URL
+
+        Returns:
+            The CacheEntry, or None if the URL is not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, body, encoding, etag, last_modified, stored_at FROM pages WHERE url = ?",
+                (url,)).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(*row)
+            if self.is_fresh(entry):
+                self.hits += 1
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether an entry may be served without contacting the server."""
+        return time.time() - entry.stored_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> dict:
+        """
+        Build revalidation headers for a stale entry.
+
+        Args:
+            entry: The cached entry
+
+        Returns:
+            dict with If-None-Match / If-Modified-Since when validators are known
+        """
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(
+            self,
+            url: str,
+            body: bytes,
+            encoding: Optional[str] = None,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        """
+        Cache a freshly fetched page and evict old entries if over the size limit.
+
+        Args:
+            url: The page URL
+            body: Raw response body
+            encoding: Character encoding the body was served with
+            etag: ETag response header, if any
+            last_modified: Last-Modified response header, if any
+        """
+        if len(body) > self.max_bytes:
+            with self._lock:
+                self.misses += 1
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages"
+                " (url, body, encoding, etag, last_modified, stored_at, last_access, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, encoding, etag, last_modified, now, now, len(body)))
+            self.misses += 1
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, url: str) -> None:
+        """Restart the TTL of an entry after the server answered 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET stored_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            self.revalidated += 1
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the total size fits (lock held)."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for url, size in self._conn.execute(
+                "SELECT url, size FROM pages ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            evicted += 1
+        logging.debug(f"Evicted {evicted} pages from the HTTP cache")
+
+    def log_stats(self) -> None:
+        """Log how many page requests the cache saved during this run."""
+        if self.hits or self.revalidated or self.misses:
+            logging.info(
+                f"HTTP cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), "
+                f"{self.misses} fetched")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
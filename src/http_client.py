@@ -0,0 +1,262 @@
+"""
+http_client.py
+
+Shared HTTP transport layer for the Wallpaper Scraper application.
+Hands out one pooled requests.Session per host so that services, downloads
+and the scout reuse keep-alive connections instead of paying a new TCP+TLS
+handshake on every request. Page requests are paced by a per-host token bucket
+and, when a cache is attached, served from or revalidated against the on-disk
+HTTP cache.
+"""
+
+import codecs
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import CONFIG
+from src.http_cache import CacheEntry, HttpCache
+from src.rate_limiter import HostRateLimiter, parse_retry_after
+
+
+class HttpClient:
+    """
+    Thread-safe registry of per-host pooled sessions.
+
+    Each host gets its own requests.Session with a connection pool sized to the
+    number of workers that may hit that host at the same time.
+    """
+
+    def __init__(
+            self,
+            pool_size: Optional[int] = None,
+            headers: Optional[dict] = None,
+            rate_limiter: Optional[HostRateLimiter] = None,
+            cache: Optional[HttpCache] = None):
+        """
+        Initialize the client.
+
+        Args:
+            pool_size: Maximum number of pooled connections kept per host
+                (defaults to CONFIG['MAX_WORKERS'])
+            headers: Optional default headers applied to every session
+            rate_limiter: Optional per-host limiter (defaults to one built from CONFIG)
+            cache: Optional page cache used by get(..., cache=True)
+        """
+        self.pool_size = max(1, pool_size or CONFIG.get('MAX_WORKERS', 4))
+        self.headers = dict(headers) if headers else {}
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.cache = cache
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_for(url: str) -> str:
+        """Return the normalized host (netloc) for a URL."""
+        return urlparse(url).netloc.lower()
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Return the pooled session for the host of the given URL, creating it on first use.
+
+        Args:
+            url: Any URL on the target host
+
+        Returns:
+            The shared requests.Session for that host
+        """
+        host = self.host_for(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._create_session()
+                self._sessions[host] = session
+                logging.debug(f"Created pooled session for {host} (pool size {self.pool_size})")
+        return session
+
+    def _create_session(self) -> requests.Session:
+        """Create a session whose adapters keep up to pool_size connections alive."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if self.headers:
+            session.headers.update(self.headers)
+        return session
+
+    def get(
+            self,
+            url: str,
+            rate_limit: bool = True,
+            cache: bool = False,
+            cache_key: Optional[str] = None,
+            **kwargs) -> requests.Response:
+        """
+        Issue a GET request through the pooled session for the URL's host.
+
+        Args:
+            url: The URL to fetch
+            rate_limit: Wait for the host's token bucket first (page requests);
+                image downloads pass False
+            cache: Serve fresh pages from the attached cache and revalidate stale
+                ones with ETag/Last-Modified (HTML pages only)
+            cache_key: Key of the response in the cache (defaults to the URL), to keep
+                responses that are not plain pages, such as API results, apart
+            **kwargs: Passed through to requests.Session.get
+
+        Returns:
+            The response; a 429 also pauses the host until its Retry-After has passed
+        """
+        page_cache = self.cache if cache else None
+        key = cache_key or url
+        entry = None
+        if page_cache is not None:
+            entry = page_cache.lookup(key)
+            if entry is not None:
+                if page_cache.is_fresh(entry):
+                    return self._cached_response(entry)
+                kwargs['headers'] = {
+                    **(kwargs.get('headers') or {}), **page_cache.conditional_headers(entry)}
+
+        if rate_limit:
+            self.rate_limiter.acquire(url)
+        response = self.session_for(url).get(url, **kwargs)
+        if response.status_code == 429:
+            self.rate_limiter.penalize(url, parse_retry_after(response.headers.get('Retry-After')))
+
+        if page_cache is not None:
+            if response.status_code == 304 and entry is not None:
+                page_cache.refresh(key)
+                return self._cached_response(entry)
+            if response.status_code == 200:
+                page_cache.store(
+                    key, response.content, response.encoding or response.apparent_encoding,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response
+
+    def stream_page(
+            self,
+            url: str,
+            reader,
+            cache: bool = False,
+            chunk_size: Optional[int] = None,
+            **kwargs) -> requests.Response:
+        """
+        GET a page and feed its decoded text to a reader while it downloads.
+        Once reader.done turns true the connection is closed without reading the
+        rest. Only pages read to the end are stored in the cache; fresh cached
+        pages and 304 revalidations are fed from the cache in one piece.
+
+        Args:
+            url: The URL to fetch
+            reader: Object with feed(text), close() and a done attribute,
+                such as a ListingExtractor
+            cache: Use the attached page cache as get(..., cache=True) does
+            chunk_size: Bytes read at a time (defaults to CONFIG['LISTING_CHUNK_SIZE'])
+            **kwargs: Passed through to requests.Session.get
+
+        Returns:
+            The response; the reader was fed only if its status is 200 (or a 304 answered from the cache)
+        """
+        chunk_size = chunk_size or CONFIG.get('LISTING_CHUNK_SIZE', 16384)
+        page_cache = self.cache if cache else None
+        entry = None
+        if page_cache is not None:
+            entry = page_cache.lookup(url)
+            if entry is not None:
+                if page_cache.is_fresh(entry):
+                    return self._feed_cached(entry, reader)
+                kwargs['headers'] = {
+                    **(kwargs.get('headers') or {}), **page_cache.conditional_headers(entry)}
+
+        self.rate_limiter.acquire(url)
+        response = self.session_for(url).get(url, stream=True, **kwargs)
+        try:
+            if response.status_code == 429:
+                self.rate_limiter.penalize(url, parse_retry_after(response.headers.get('Retry-After')))
+            if response.status_code == 304 and entry is not None:
+                page_cache.refresh(url)
+                return self._feed_cached(entry, reader)
+            if response.status_code != 200:
+                return response
+
+            encoding = response.encoding or 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            body = []
+            for chunk in response.iter_content(chunk_size):
+                body.append(chunk)
+                reader.feed(decoder.decode(chunk))
+                if reader.done:
+                    logging.debug(f"Stopped reading {url} after {sum(map(len, body))} bytes")
+                    return response
+            reader.feed(decoder.decode(b'', final=True))
+            reader.close()
+            if page_cache is not None:
+                page_cache.store(
+                    url, b''.join(body), encoding,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return response
+        finally:
+            # Unread bytes are discarded with the connection rather than drained
+            response.close()
+
+    def _feed_cached(self, entry: CacheEntry, reader) -> requests.Response:
+        """Feed a cached page to a reader and return it as a 200 response."""
+        reader.feed(entry.text)
+        reader.close()
+        return self._cached_response(entry)
+
+    @staticmethod
+    def _cached_response(entry: CacheEntry) -> requests.Response:
+        """Build a 200 response from a cached page so callers can use .text as usual."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry.url
+        response.encoding = entry.encoding
+        response._content = entry.body
+        return response
+
+    def head(self, url: str, rate_limit: bool = True, **kwargs) -> requests.Response:
+        """Issue a HEAD request through the pooled session for the URL's host."""
+        if rate_limit:
+            self.rate_limiter.acquire(url)
+        response = self.session_for(url).head(url, **kwargs)
+        if response.status_code == 429:
+            self.rate_limiter.penalize(url, parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def close(self) -> None:
+        """Close every pooled session and release their connections."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __enter__(self) -> 'HttpClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+_default_client: Optional[HttpClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """
+    Return the process-wide shared client, used when no client is injected.
+
+    Returns:
+        The lazily created default HttpClient
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
@@ -0,0 +1,177 @@
+"""
+image_header.py
+
+Header-only image dimension reading for the Wallpaper Scraper application.
+Parses the width and height of PNG, JPEG, GIF and WebP images from their first
+bytes, so a download can be judged before the rest of the body is fetched.
+Files on disk are memory-mapped, so only the header pages are ever read.
+"""
+
+import mmap
+from typing import Optional, Tuple
+
+from src.config import CONFIG
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8'
+GIF_SIGNATURES = (b'GIF87a', b'GIF89a')
+
+# JPEG start-of-frame markers carry the dimensions (C4, C8 and CC are not frames)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01, 0xD8}
+
+
+def is_supported_header(data: bytes) -> bool:
+    """
+    Check whether data starts with the signature of a format read_image_size understands.
+
+    Args:
+        data: The first bytes of the file (at least 12 for WebP)
+
+    Returns:
+        True for PNG, JPEG, GIF and WebP signatures
+    """
+    return (
+        data[:8] == PNG_SIGNATURE
+        or data[:2] == JPEG_SIGNATURE
+        or data[:6] in GIF_SIGNATURES
+        or (data[:4] == b'RIFF' and data[8:12] == b'WEBP'))
+
+
+def read_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read image dimensions from the start of an image file.
+
+    Args:
+        data: The first bytes of the file, or any buffer that supports slicing (e.g. an mmap)
+
+    Returns:
+        Tuple of (width, height), or None if more data is needed or the format is unsupported
+    """
+    if data[:8] == PNG_SIGNATURE:
+        if len(data) < 24 or data[12:16] != b'IHDR':
+            return None
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if data[:2] == JPEG_SIGNATURE:
+        return _read_jpeg_size(data)
+    if data[:6] in GIF_SIGNATURES:
+        if len(data) < 10:
+            return None
+        return int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little')
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _read_webp_size(data)
+    return None
+
+
+def _read_jpeg_size(data):
+    i = 2
+    n = len(data)
+    while i < n:
+        # Every segment starts with 0xFF, optionally padded with more 0xFF fill bytes
+        if data[i] != 0xFF:
+            return None
+        while i < n and data[i] == 0xFF:
+            i += 1
+        if i >= n:
+            return None
+        marker = data[i]
+        i += 1
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            return None
+        if i + 2 > n:
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            if i + 7 > n:
+                return None
+            height = int.from_bytes(data[i + 3:i + 5], 'big')
+            width = int.from_bytes(data[i + 5:i + 7], 'big')
+            return width, height
+        i += int.from_bytes(data[i:i + 2], 'big')
+    return None
+
+
+def _read_webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width = int.from_bytes(data[26:28], 'little') & 0x3FFF
+        height = int.from_bytes(data[28:30], 'little') & 0x3FFF
+        return width, height
+    if chunk == b'VP8L' and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+
+def read_file_size(filepath: str) -> Optional[Tuple[int, int]]:
+    """
+    Read image dimensions from a file without decoding it.
+    The file is memory-mapped, so a JPEG header is walked segment by segment
+    and only the pages it touches are read from disk.
+
+    Args:
+        filepath: Path to the image file
+
+    Returns:
+        Tuple of (width, height), or None for empty files, unsupported formats and damaged headers
+
+    Raises:
+        OSError: If the file cannot be opened
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return None
+        with mapped:
+            return read_image_size(mapped)
+
+
+class ImageSizeProbe:
+    """
+    Incremental dimension reader fed with the first chunks of a download.
+
+    Once done is set, size holds the dimensions, or None if they could not be
+    read within max_bytes (unsupported format or a very large JPEG header).
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        Initialize the probe.
+
+        Args:
+            max_bytes: Give up after buffering this many bytes
+                (defaults to CONFIG['HEADER_PROBE_BYTES'])
+        """
+        self.max_bytes = max_bytes or CONFIG.get('HEADER_PROBE_BYTES', 262144)
+        self.size: Optional[Tuple[int, int]] = None
+        self.done = False
+        self._header = b''
+
+    def feed(self, chunk: bytes) -> Optional[Tuple[int, int]]:
+        """
+        Add the next chunk of the body.
+
+        Args:
+            chunk: Next bytes of the download
+
+        Returns:
+            The dimensions once known, None otherwise
+        """
+        if self.done:
+            return self.size
+        self._header += chunk
+        if len(self._header) >= 12 and not is_supported_header(self._header):
+            self.done = True
+            return None
+        self.size = read_image_size(self._header)
+        if self.size is not None or len(self._header) >= self.max_bytes:
+            self.done = True
+            self._header = b''
+        return self.size
@@ -0,0 +1,297 @@
+"""
+library_index.py
+
+Cached image dimensions for the wallpaper library.
+LibraryIndex stores the width and height of every image it has looked at,
+keyed by (path, size, mtime_ns), so check_image_resolution only opens a file
+again after it changed. scan() walks an output folder with os.scandir on a
+thread pool and reads the dimensions of new or changed files in parallel,
+which turns startup reconciliation of a large library into stat calls.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from src.config import CONFIG, SUPPORTED_IMAGE_FORMATS
+from src.image_header import read_file_size
+
+# Extensions considered part of the library; '.part' downloads and their sidecars never match
+LIBRARY_EXTENSIONS = frozenset(
+    f".{ext}" for ext in (*SUPPORTED_IMAGE_FORMATS, 'webp', 'gif'))
+
+
+class ScanReport(NamedTuple):
+    """Outcome of a library scan."""
+    files: int
+    cached: int
+    read: int
+    failed: int
+    seconds: float
+
+    @property
+    def files_per_second(self) -> float:
+        """Scan throughput."""
+        return self.files / self.seconds if self.seconds > 0 else float(self.files)
+
+
+def is_library_image(name: str) -> bool:
+    """
+    Check whether a file name belongs to a finished wallpaper.
+
+    Args:
+        name: File name or path
+
+    Returns:
+        True for image extensions; False for '.part' files, their '.part.json' sidecars and anything else
+    """
+    return os.path.splitext(name)[1].lower() in LIBRARY_EXTENSIONS
+
+
+def read_dimensions(filepath: str) -> Tuple[int, int]:
+    """
+    Read the dimensions of an image file.
+    PNG, JPEG, GIF and WebP headers are parsed from a memory map; anything
+    else, or a header that cannot be parsed, falls back to PIL.
+
+    Args:
+        filepath: Path to the image file
+
+    Returns:
+        Tuple of (width, height)
+
+    Raises:
+        OSError: If the file cannot be read or is not an image
+    """
+    size = read_file_size(filepath)
+    if size is not None:
+        return size
+    with Image.open(filepath) as img:
+        return img.size
+
+
+class LibraryIndex:
+    """
+    Thread-safe SQLite index of image dimensions keyed by (path, size, mtime_ns).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index, creating its database on first use.
+
+        Args:
+            path: Database file; None keeps the index in memory for this process only
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " width INTEGER NOT NULL, height INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[Tuple[int, int]]:
+        """
+        Return the cached dimensions of a file, if it is unchanged.
+
+        Args:
+            path: Absolute path of the file
+            size: Current size in bytes
+            mtime_ns: Current modification time in nanoseconds
+
+        Returns:
+            Tuple of (width, height), or None if the file is unknown or changed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT width, height FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row
+
+    def put_many(self, rows: Iterable[Tuple[str, int, int, int, int]]) -> None:
+        """
+        Store dimensions for several files.
+
+        Args:
+            rows: (path, size, mtime_ns, width, height) tuples
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, width, height)"
+                " VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def dimensions(self, filepath: str) -> Optional[Tuple[int, int]]:
+        """
+        Return the dimensions of an image, reading the file only on a cache miss.
+
+        Args:
+            filepath: Path to the image file
+
+        Returns:
+            Tuple of (width, height), or None if the file cannot be read as an image
+        """
+        path = os.path.abspath(filepath)
+        try:
+            stat = os.stat(path)
+            cached = self.get(path, stat.st_size, stat.st_mtime_ns)
+            if cached is not None:
+                return cached
+            width, height = read_dimensions(path)
+        except Exception as e:
+            logging.error(f"Error reading dimensions of {filepath}: {e}")
+            return None
+        self.put_many([(path, stat.st_size, stat.st_mtime_ns, width, height)])
+        return width, height
+
+    def scan(self, folder: str, workers: Optional[int] = None) -> ScanReport:
+        """
+        Walk a folder in parallel and bring the index up to date with it.
+        Unchanged files are answered from the index; new or changed ones are read
+        on the pool, and entries for files that disappeared are dropped.
+
+        Args:
+            folder: Library folder to scan (subfolders included)
+            workers: Threads for walking and reading (defaults to CONFIG['MAX_WORKERS'])
+
+        Returns:
+            ScanReport with the file counts and the time taken
+        """
+        start = time.perf_counter()
+        folder = os.path.abspath(folder)
+        workers = max(1, workers or CONFIG.get('MAX_WORKERS', 4))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            entries = self._walk(folder, executor)
+            with self._lock:
+                known = {
+                    path: (size, mtime_ns, width, height)
+                    for path, size, mtime_ns, width, height in self._conn.execute(
+                        "SELECT path, size, mtime_ns, width, height FROM files"
+                        " WHERE path >= ? AND path < ?", (folder + os.sep, folder + chr(ord(os.sep) + 1)))}
+
+            stale = [entry for entry in entries if known.get(entry[0], (None, None))[:2] != entry[1:]]
+
+            def read(entry):
+                path, size, mtime_ns = entry
+                try:
+                    return (path, size, mtime_ns, *read_dimensions(path))
+                except Exception as e:
+                    logging.debug(f"Skipping {path}: {e}")
+                    return None
+
+            results = list(executor.map(read, stale))
+
+        rows = [row for row in results if row is not None]
+        self.put_many(rows)
+        gone = set(known) - {entry[0] for entry in entries}
+        if gone:
+            with self._lock:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in gone))
+                self._conn.commit()
+
+        return ScanReport(
+            files=len(entries),
+            cached=len(entries) - len(stale),
+            read=len(rows),
+            failed=len(stale) - len(rows),
+            seconds=time.perf_counter() - start)
+
+    @staticmethod
+    def _walk(folder: str, executor: ThreadPoolExecutor) -> List[Tuple[str, int, int]]:
+        """List (path, size, mtime_ns) of the images under folder, one directory per task."""
+        def list_directory(directory):
+            files, subdirs = [], []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif is_library_image(entry.name) and entry.is_file():
+                            stat = entry.stat()
+                            files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+            except OSError as e:
+                logging.warning(f"Cannot scan {directory}: {e}")
+            return files, subdirs
+
+        entries = []
+        pending = [executor.submit(list_directory, folder)]
+        while pending:
+            files, subdirs = pending.pop().result()
+            entries.extend(files)
+            pending.extend(executor.submit(list_directory, subdir) for subdir in subdirs)
+        return entries
+
+    def dimension_columns(self, folder: str) -> Tuple[List[str], List[int], List[int]]:
+        """
+        Return the indexed images under a folder as parallel columns, ready for
+        evaluate_batch().
+
+        Args:
+            folder: Library folder (subfolders included)
+
+        Returns:
+            Tuple of (paths, widths, heights), ordered by path
+        """
+        folder = os.path.abspath(folder)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, width, height FROM files WHERE path >= ? AND path < ? ORDER BY path",
+                (folder + os.sep, folder + chr(ord(os.sep) + 1))).fetchall()
+        if not rows:
+            return [], [], []
+        paths, widths, heights = map(list, zip(*rows))
+        return paths, widths, heights
+
+    def log_stats(self) -> None:
+        """Log how many dimension lookups were answered from the index during this run."""
+        if self.hits:
+            logging.info(f"Library index: {self.hits} image dimensions reused")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+_default_index: Optional[LibraryIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_library_index() -> LibraryIndex:
+    """
+    Return the process-wide index used by check_image_resolution.
+    It is stored under CONFIG['TEMP_FOLDER'] so later runs reuse it, and kept in
+    memory when LIBRARY_INDEX_ENABLED is off or the file cannot be opened.
+
+    Returns:
+        The lazily created default LibraryIndex
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            path = None
+            if CONFIG.get('LIBRARY_INDEX_ENABLED', True):
+                path = os.path.join(CONFIG['TEMP_FOLDER'], 'library_index.sqlite3')
+            try:
+                _default_index = LibraryIndex(path)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"Library index kept in memory: {e}")
+                _default_index = LibraryIndex()
+        return _default_index
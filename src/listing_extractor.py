@@ -0,0 +1,182 @@
+"""
+listing_extractor.py
+
+Incremental extraction of detail links from search and theme pages.
+ListingExtractor is an html.parser.HTMLParser fed with the page text as it
+downloads: it recognises the result containers a service declares in a
+ListingRule, reports each detail link as soon as its tag has been read, and
+marks itself done once enough links were found so the caller can close the
+connection without reading or parsing the rest of the page. A rule may also
+name fields, elements inside a result whose text describes it (a listed
+resolution, a file type badge); they are collected per link, and a result is
+read to its end before the extractor is done. Each link's title (its title
+attribute, else the alt text of its image, else its text) is kept as well.
+No tree is built; the text itself is only kept until the first link turns up,
+so a page whose layout the rule does not match can still be parsed in full
+afterwards.
+"""
+
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+
+class ListingRule(NamedTuple):
+    """Where the detail links of a listing page are, e.g. 'figure.thumb a.preview'."""
+    container: str  # Tag of one result (or of the result grid)
+    container_classes: Tuple[str, ...]  # The container has at least one of these classes
+    link_class: Optional[str] = None  # Required class of the <a> inside it (None = any link)
+    first_link_only: bool = True  # One link per container (a result) or every link (a grid)
+    fields: Tuple[str, ...] = ()  # Classes of elements in a result whose text is kept per link
+
+
+class ListingExtractor(HTMLParser):
+    """
+    Collect the detail links of a listing page from text fed in chunks.
+    """
+
+    def __init__(self, rule: ListingRule, base_url: str, limit: Optional[int] = None):
+        """
+        Initialize the extractor.
+
+        Args:
+            rule: Where the links are on the page
+            base_url: Base for relative links
+            limit: Stop once this many links were found (None = read the whole page)
+        """
+        super().__init__(convert_charrefs=True)
+        self.rule = rule
+        self.base_url = base_url
+        self.limit = limit
+        self.links: List[str] = []
+        self.fields: Dict[str, Dict[str, str]] = {}  # Link -> {field class: text} of its result
+        self.titles: Dict[str, str] = {}  # Link -> its title, where it has one
+        self.chars_fed = 0
+        self._new: List[str] = []
+        self._text: Optional[List[str]] = []  # Page text, dropped once a link was found
+        self._depth = 0  # Nesting of the container tag while inside a container
+        self._taken = False  # A link of the current container was already considered
+        self._result: Dict[str, str] = {}  # Fields of the current container
+        self._field = None  # [field class, tag, nesting] of the field being read
+        self._title_link: Optional[str] = None  # Link whose title is still being read
+        self._title_text: List[str] = []
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the limit has been reached and the rest of the page is not needed."""
+        return self._done
+
+    @property
+    def _full(self) -> bool:
+        return self.limit is not None and len(self.links) >= self.limit
+
+    @property
+    def text(self) -> Optional[str]:
+        """The text fed so far, or None once a link was found and it was dropped."""
+        return None if self._text is None else ''.join(self._text)
+
+    def feed(self, data: str) -> List[str]:
+        """
+        Parse the next chunk of the page.
+
+        Args:
+            data: Decoded page text
+
+        Returns:
+            The links found in this chunk, in page order
+        """
+        if self.done:
+            return []
+        self.chars_fed += len(data)
+        if self._text is not None:
+            self._text.append(data)
+        super().feed(data)
+        return self._flush()
+
+    def close(self) -> List[str]:
+        """
+        Parse whatever is still buffered at the end of the page.
+
+        Returns:
+            The links found in the remaining text
+        """
+        if not self.done:
+            super().close()
+        return self._flush()
+
+    def _flush(self) -> List[str]:
+        new, self._new = self._new, []
+        return new
+
+    def handle_starttag(self, tag, attrs):
+        rule = self.rule
+        if self._depth:
+            if self._field is not None:
+                if tag == self._field[1]:
+                    self._field[2] += 1
+                return
+            if tag == rule.container:
+                self._depth += 1
+            elif tag == 'a' and not (rule.first_link_only and self._taken):
+                attributes = dict(attrs)
+                if rule.link_class is None or rule.link_class in (attributes.get('class') or '').split():
+                    self._taken = True
+                    self._add(attributes.get('href'), attributes.get('title'))
+            elif tag == 'img' and self._title_link is not None:
+                alt = (dict(attrs).get('alt') or '').strip()
+                if alt:
+                    self.titles[self._title_link] = alt
+                    self._title_link = None
+            if rule.fields:
+                classes = (dict(attrs).get('class') or '').split()
+                for name in rule.fields:
+                    if name in classes:
+                        self._result[name] = ''
+                        self._field = [name, tag, 1]
+                        break
+        elif tag == rule.container and not self._full:
+            classes = (dict(attrs).get('class') or '').split()
+            if any(cls in classes for cls in rule.container_classes):
+                self._depth = 1
+                self._taken = False
+                self._result = {}
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._title_link is not None:
+            text = ' '.join(''.join(self._title_text).split())
+            if text:
+                self.titles[self._title_link] = text
+            self._title_link = None
+        if self._field is not None and tag == self._field[1]:
+            self._field[2] -= 1
+            if not self._field[2]:
+                name = self._field[0]
+                self._result[name] = ' '.join(self._result[name].split())
+                self._field = None
+        elif self._depth and tag == self.rule.container:
+            self._depth -= 1
+            if not self._depth and self._full:
+                self._done = True
+
+    def handle_data(self, data):
+        if self._field is not None:
+            self._result[self._field[0]] += data
+        if self._title_link is not None:
+            self._title_text.append(data)
+
+    def _add(self, href, title=None):
+        if not href or self._full:
+            return
+        if not href.startswith(('http://', 'https://')):
+            href = urljoin(self.base_url, href)
+        self.links.append(href)
+        self.fields[href] = self._result
+        if title and title.strip():
+            self.titles[href] = title.strip()
+        else:
+            self._title_link, self._title_text = href, []
+        self._new.append(href)
+        self._text = None
+        if self._full and not self.rule.fields:
+            self._done = True
@@ -0,0 +1,310 @@
+"""
+near_duplicates.py
+
+Perceptual-hash near-duplicate detection for downloaded wallpapers.
+Each new image gets a 64-bit dHash (grayscale, downscaled, adjacent-pixel
+gradients; vectorized with NumPy when it is installed), computed on a process
+pool. Hashes live in a BK-tree persisted in the output folder, so finding every
+earlier image within PHASH_MAX_DISTANCE bits is a sub-linear walk rather than a
+pairwise comparison. When a near-duplicate turns up, only the version with the
+better evaluate_resolution_match result (then the larger image) is kept.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, the pure-Python path gives the same hashes
+    np = None
+
+from src.config import CONFIG
+
+HASH_SIZE = 8  # 8x8 gradients -> 64-bit hash
+
+
+def dhash(filepath: str, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute the difference hash of an image.
+
+    Args:
+        filepath: Path to the image file
+        hash_size: Rows of the hash; the hash has hash_size * hash_size bits
+
+    Returns:
+        The hash as an unsigned integer
+
+    Raises:
+        OSError: If the file cannot be read as an image
+    """
+    with Image.open(filepath) as img:
+        # Let JPEG decode at a fraction of the size; the hash only needs a thumbnail
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    if np is not None:
+        pixels = np.asarray(small, dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col + 1] > pixels[offset + col])
+    return value
+
+
+def _hash_file(filepath: str) -> Tuple[str, Optional[int]]:
+    """Process-pool worker: hash one file, None if it cannot be read."""
+    try:
+        return filepath, dhash(filepath)
+    except Exception:
+        return filepath, None
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class ImageRecord(NamedTuple):
+    """An image in the near-duplicate index."""
+    id: int
+    path: str
+    hash: int
+    score: int
+    pixels: int
+
+
+class NearDuplicateIndex:
+    """
+    Thread-safe BK-tree of image dHashes, persisted in SQLite.
+
+    Every node stores its parent and its distance to it, so the tree is
+    rebuilt in one pass when the index is opened. Removed images stay in the
+    tree as tombstones that route queries but are never returned.
+    """
+
+    def __init__(self, output_folder: str, path: Optional[str] = None):
+        """
+        Initialize the index, creating its database on first use.
+
+        Args:
+            output_folder: Folder the wallpapers are saved to
+            path: Database file (defaults to CONFIG['PHASH_INDEX_NAME'] in output_folder)
+        """
+        self.path = path or os.path.join(
+            output_folder, CONFIG.get('PHASH_INDEX_NAME', '.phash.sqlite3'))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " id INTEGER PRIMARY KEY, path TEXT NOT NULL, hash INTEGER NOT NULL,"
+            " parent INTEGER, distance INTEGER, score INTEGER NOT NULL,"
+            " pixels INTEGER NOT NULL, removed INTEGER NOT NULL DEFAULT 0)")
+        self._conn.commit()
+
+        self._root: Optional[int] = None
+        self._nodes: Dict[int, ImageRecord] = {}
+        self._children: Dict[int, Dict[int, int]] = {}
+        self._removed = set()
+        self._by_path: Dict[str, int] = {}
+        for node_id, node_path, value, parent, distance, score, pixels, removed in self._conn.execute(
+                "SELECT id, path, hash, parent, distance, score, pixels, removed FROM images ORDER BY id"):
+            self._attach(ImageRecord(node_id, node_path, _to_unsigned(value), score, pixels), parent, distance)
+            if removed:
+                self._removed.add(node_id)
+            else:
+                self._by_path[node_path] = node_id
+
+    def __len__(self) -> int:
+        return len(self._nodes) - len(self._removed)
+
+    def _attach(self, record, parent, distance):
+        self._nodes[record.id] = record
+        self._children[record.id] = {}
+        if parent is None:
+            self._root = record.id
+        else:
+            self._children[parent][distance] = record.id
+
+    def query(self, value: int, max_distance: int) -> List[Tuple[int, ImageRecord]]:
+        """
+        Find the images within max_distance bits of a hash.
+
+        Args:
+            value: dHash to look up
+            max_distance: Largest Hamming distance reported
+
+        Returns:
+            (distance, ImageRecord) pairs, closest first
+        """
+        matches = []
+        with self._lock:
+            pending = [self._root] if self._root is not None else []
+            while pending:
+                node_id = pending.pop()
+                distance = hamming(value, self._nodes[node_id].hash)
+                if distance <= max_distance and node_id not in self._removed:
+                    matches.append((distance, self._nodes[node_id]))
+                # Triangle inequality: only subtrees at distance d +- max_distance can match
+                for edge, child in self._children[node_id].items():
+                    if distance - max_distance <= edge <= distance + max_distance:
+                        pending.append(child)
+        return sorted(matches, key=lambda match: match[0])
+
+    def add(self, path: str, value: int, score: int, pixels: int) -> ImageRecord:
+        """
+        Insert an image into the tree.
+
+        Args:
+            path: Path of the image
+            value: Its dHash
+            score: evaluate_resolution_match() result for the target resolution
+            pixels: Width times height
+
+        Returns:
+            The stored ImageRecord
+        """
+        with self._lock:
+            if path in self._by_path:
+                self._remove_locked(self._by_path[path])
+            parent = distance = None
+            node_id = self._root
+            while node_id is not None:
+                parent, distance = node_id, hamming(value, self._nodes[node_id].hash)
+                node_id = self._children[node_id].get(distance)
+            cursor = self._conn.execute(
+                "INSERT INTO images (path, hash, parent, distance, score, pixels) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, _to_signed(value), parent, distance, score, pixels))
+            self._conn.commit()
+            record = ImageRecord(cursor.lastrowid, path, value, score, pixels)
+            self._attach(record, parent, distance)
+            self._by_path[path] = record.id
+        return record
+
+    def remove(self, record: ImageRecord) -> None:
+        """Mark an image as removed; it keeps routing queries but is no longer returned."""
+        with self._lock:
+            self._remove_locked(record.id)
+
+    def _remove_locked(self, node_id):
+        self._removed.add(node_id)
+        self._by_path.pop(self._nodes[node_id].path, None)
+        self._conn.execute("UPDATE images SET removed = 1 WHERE id = ?", (node_id,))
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class NearDuplicateReport(NamedTuple):
+    """Outcome of one near-duplicate pass."""
+    hashed: int
+    removed: int
+    bytes_freed: int
+
+
+def hash_files(paths: List[str], workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Hash several images on a process pool.
+
+    Args:
+        paths: Image files
+        workers: Worker processes (defaults to CONFIG['MAX_WORKERS'])
+
+    Returns:
+        Mapping of path to dHash for every file that could be read
+    """
+    if not paths:
+        return {}
+    workers = max(1, min(len(paths), workers or CONFIG.get('MAX_WORKERS', 4)))
+    if workers == 1:
+        results = map(_hash_file, paths)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_hash_file, paths, chunksize=8))
+    return {path: value for path, value in results if value is not None}
+
+
+def collapse_near_duplicates(
+        index: NearDuplicateIndex,
+        images: Iterable[Tuple[str, int, int, int]],
+        max_distance: Optional[int] = None,
+        workers: Optional[int] = None,
+        on_replaced=None) -> NearDuplicateReport:
+    """
+    Hash new images and keep only the best version of each near-duplicate group.
+
+    Args:
+        index: The persistent BK-tree of earlier images
+        images: (path, match_code, width, height) of the new downloads
+        max_distance: Largest Hamming distance treated as the same picture
+            (defaults to CONFIG['PHASH_MAX_DISTANCE'])
+        workers: Worker processes for hashing
+        on_replaced: Optional callable(removed_path, kept_path) run after a file is deleted
+
+    Returns:
+        NearDuplicateReport with the counts of this pass
+    """
+    if max_distance is None:
+        max_distance = CONFIG.get('PHASH_MAX_DISTANCE', 4)
+    images = [image for image in images if os.path.exists(image[0])]
+    hashes = hash_files([image[0] for image in images], workers)
+    removed = freed = 0
+
+    for path, match_code, width, height in images:
+        if path not in hashes:
+            continue
+        score, pixels = match_code, width * height
+        keep_new = True
+        for _, other in index.query(hashes[path], max_distance):
+            if other.path == path or not os.path.exists(other.path):
+                continue
+            if os.path.samefile(other.path, path):
+                # Hardlinked exact duplicate: nothing to free
+                continue
+            if (other.score, other.pixels) >= (score, pixels):
+                loser, winner = path, other.path
+            else:
+                loser, winner = other.path, path
+            size = os.path.getsize(loser)
+            try:
+                os.remove(loser)
+            except OSError as e:
+                logging.warning(f"Failed to remove near-duplicate {loser}: {e}")
+                continue
+            # Only a file that is gone is tombstoned; one that stays is compared again next time
+            if loser == path:
+                keep_new = False
+            else:
+                index.remove(other)
+            logging.info(
+                f"Removed {os.path.basename(loser)}, a near-duplicate of {os.path.basename(winner)}")
+            removed += 1
+            freed += size
+            if on_replaced is not None:
+                on_replaced(loser, winner)
+            if not keep_new:
+                break
+        if keep_new:
+            index.add(path, hashes[path], score, pixels)
+
+    return NearDuplicateReport(len(hashes), removed, freed)
@@ -0,0 +1,316 @@
+"""
+pipeline.py
+
+Streaming hand-off from discovery to downloads for the Wallpaper Scraper application.
+Services emit a Candidate for every wallpaper as soon as they find it, carrying
+its detail page, download URL, listed dimensions, site and theme; choose_candidate()
+is the one selection rule every service applies to a detail page's options.
+CandidateSelector drops duplicates and applies the per-theme limit while they
+stream through, ThemeBudget tells the services when a theme has enough, and
+the engines put admitted candidates on a bounded queue that download workers
+consume right away, so downloads start while the slower sites are still being
+scraped. With several target resolutions, each DownloadTarget
+keeps its own selector, counters and output folder while sharing the one crawl.
+"""
+
+import logging
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+from src.resolution_match import evaluate_resolution_match
+
+
+class Candidate:
+    """
+    A wallpaper found during discovery. Width and height are 0 when the site
+    does not state them. __slots__ keeps instances small on large crawls.
+    """
+
+    __slots__ = ('download_url', 'width', 'height', 'detail_url', 'site', 'theme', 'resolution')
+
+    def __init__(
+            self,
+            download_url: str,
+            width: int = 0,
+            height: int = 0,
+            detail_url: Optional[str] = None,
+            site: Optional[str] = None,
+            theme: Optional[str] = None,
+            resolution: Optional[str] = None):
+        """
+        Initialize the candidate.
+
+        Args:
+            download_url: URL of the image itself
+            width: Listed width in pixels (0 if unknown)
+            height: Listed height in pixels (0 if unknown)
+            detail_url: Detail page the image was found on
+            site: Site the image was found on
+            theme: Theme it was found for
+            resolution: Target resolution it was chosen for (e.g., '5120x1440')
+        """
+        self.download_url = download_url
+        self.width = width
+        self.height = height
+        self.detail_url = detail_url
+        self.site = site
+        self.theme = theme
+        self.resolution = resolution
+
+    @property
+    def has_size(self) -> bool:
+        """Whether the site stated the dimensions."""
+        return bool(self.width and self.height)
+
+    def replace(self, **fields) -> 'Candidate':
+        """Return a copy with some fields changed."""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(fields)
+        return Candidate(**values)
+
+    def may_fit(self, min_width: int, min_height: int) -> bool:
+        """
+        Whether the image can meet a target, judged from its listed dimensions.
+
+        Args:
+            min_width: Target width in pixels
+            min_height: Target height in pixels
+
+        Returns:
+            False only when the dimensions are known and evaluate_resolution_match() rejects them
+        """
+        if not self.has_size or min_width <= 0 or min_height <= 0:
+            return True
+        return evaluate_resolution_match(self.width, self.height, min_width, min_height) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, Candidate):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        size = f"{self.width}x{self.height}" if self.has_size else "unknown size"
+        return f"Candidate({self.download_url!r}, {size}, site={self.site!r}, theme={self.theme!r})"
+
+
+def choose_candidate(
+        candidates: Iterable[Candidate],
+        width: int,
+        height: int,
+        fallback_to_largest: bool = False) -> Optional[Candidate]:
+    """
+    Pick the option of a detail page to download for one target resolution:
+    an exact match, else the smallest option at least as large as the target.
+    Options without listed dimensions are taken to match the target, but never exactly.
+
+    Args:
+        candidates: The options listed on one detail page
+        width: Target width in pixels
+        height: Target height in pixels
+        fallback_to_largest: Take the largest option when none reaches the target
+
+    Returns:
+        The chosen Candidate, or None if there is no suitable option
+    """
+    candidates = list(candidates)
+    if not candidates:
+        return None
+
+    def size(candidate):
+        return (candidate.width, candidate.height) if candidate.has_size else (width, height)
+
+    for candidate in candidates:
+        if candidate.has_size and (candidate.width, candidate.height) == (width, height):
+            logging.debug(f"Found exact resolution match: {candidate.download_url} ({width}x{height})")
+            return candidate
+
+    # No exact match, find the smallest one that's bigger than the target
+    valid = [c for c in candidates if size(c)[0] >= width and size(c)[1] >= height]
+    if valid:
+        chosen = min(valid, key=lambda c: size(c)[0] * size(c)[1])
+        logging.debug(f"Found next larger resolution: {chosen.download_url} ({chosen.width}x{chosen.height})")
+        return chosen
+    if fallback_to_largest:
+        chosen = max(candidates, key=lambda c: size(c)[0] * size(c)[1])
+        logging.debug(f"Using largest available resolution: {chosen.download_url} ({chosen.width}x{chosen.height})")
+        return chosen
+    logging.debug(f"No suitable resolution found that meets {width}x{height}")
+    return None
+
+
+class CandidateSelector:
+    """
+    Thread-safe streaming deduplication and per-theme limit for discovered URLs.
+    """
+
+    def __init__(self, max_per_theme: Optional[int] = None):
+        """
+        Initialize the selector.
+
+        Args:
+            max_per_theme: Maximum URLs admitted for each theme (None or 0 = unlimited)
+        """
+        self.max_per_theme = max_per_theme
+        self.found = 0
+        self.admitted = []
+        self._seen = set()
+        self._per_theme = Counter()
+        self._limited = Counter()
+        self._lock = threading.Lock()
+
+    def admit(self, theme: str, url: str) -> bool:
+        """
+        Decide whether a discovered URL should be downloaded.
+
+        Args:
+            theme: The theme the URL was found for
+            url: The wallpaper download URL
+
+        Returns:
+            True the first time a URL is seen while its theme is under the limit
+        """
+        with self._lock:
+            self.found += 1
+            if url in self._seen:
+                return False
+            if self.max_per_theme and self._per_theme[theme] >= self.max_per_theme:
+                self._limited[theme] += 1
+                return False
+            self._seen.add(url)
+            self._per_theme[theme] += 1
+            self.admitted.append(url)
+            return True
+
+    def remaining(self, theme: str) -> Optional[int]:
+        """
+        Return how many more URLs a theme can still have admitted.
+
+        Args:
+            theme: The theme to check
+
+        Returns:
+            Free slots of the theme, or None without a per-theme limit
+        """
+        if not self.max_per_theme:
+            return None
+        with self._lock:
+            return max(0, self.max_per_theme - self._per_theme[theme])
+
+    @property
+    def unique(self) -> int:
+        """Number of URLs admitted so far."""
+        return len(self.admitted)
+
+    def log_summary(self) -> None:
+        """Log how many URLs were found, kept and cut by the per-theme limit."""
+        logging.info(f"Found {self.found} total wallpapers, {self.unique} selected")
+        for theme, dropped in self._limited.items():
+            logging.info(
+                f"Limited theme '{theme}' to {self.max_per_theme} wallpapers ({dropped} more found)")
+        if not self.admitted:
+            logging.warning(
+                "No wallpapers found. Check your configuration or network connection.")
+
+
+class ThemeBudget:
+    """
+    Per-theme download budget of a run, read by the services to decide whether a
+    theme is worth another result page or detail page.
+    """
+
+    def __init__(self, selectors: Iterable[CandidateSelector]):
+        """
+        Initialize the budget.
+
+        Args:
+            selectors: The CandidateSelector of every target; a theme stays open
+                while any of them has room for it
+        """
+        self.selectors = list(selectors)
+
+    def remaining(self, theme: str) -> Optional[int]:
+        """
+        Return how many more wallpapers a theme can use over all targets.
+
+        Args:
+            theme: The theme to check
+
+        Returns:
+            The largest number of free slots of any target, or None if a target has no limit
+        """
+        remaining = 0
+        for selector in self.selectors:
+            slots = selector.remaining(theme)
+            if slots is None:
+                return None
+            remaining = max(remaining, slots)
+        return remaining
+
+
+class DownloadStats:
+    """Thread-safe counters for the download workers."""
+
+    def __init__(self):
+        self.successes = 0
+        self.attempted = 0
+        self.already_downloaded = 0
+        self.downloaded = []
+        self._lock = threading.Lock()
+
+    def record(
+            self,
+            already_downloaded: bool = False,
+            success: bool = False,
+            path: Optional[str] = None) -> None:
+        """
+        Record the outcome of one URL.
+
+        Args:
+            already_downloaded: The file already existed with an acceptable resolution
+            success: The download was attempted and succeeded
+            path: Where a successful download was saved
+        """
+        with self._lock:
+            if already_downloaded:
+                self.already_downloaded += 1
+                return
+            self.attempted += 1
+            if success:
+                self.successes += 1
+                if path:
+                    self.downloaded.append(path)
+
+
+class DownloadTarget:
+    """
+    One target resolution of a run: the folder its wallpapers are saved to,
+    plus its own selection, download counters and manifest.
+    """
+
+    def __init__(
+            self,
+            resolution: str,
+            min_width: int,
+            min_height: int,
+            output_folder: str,
+            max_per_theme: Optional[int] = None,
+            manifest=None):
+        """
+        Initialize the target.
+
+        Args:
+            resolution: Target resolution (e.g., '5120x1440')
+            min_width: Target width in pixels
+            min_height: Target height in pixels
+            output_folder: Folder the wallpapers for this resolution are saved to
+            max_per_theme: Maximum URLs admitted for each theme (None or 0 = unlimited)
+            manifest: Optional DownloadManifest of earlier downloads in output_folder
+        """
+        self.resolution = resolution
+        self.min_width = min_width
+        self.min_height = min_height
+        self.output_folder = output_folder
+        self.manifest = manifest
+        self.selector = CandidateSelector(max_per_theme)
+        self.stats = DownloadStats()
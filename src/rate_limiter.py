@@ -0,0 +1,186 @@
+"""
+rate_limiter.py
+
+Per-host token-bucket rate limiting for the HTTP layer.
+Replaces fixed sleeps after every request with a shared, thread-safe budget per
+host, so concurrent workers together stay at each site's allowed rate, and
+pauses a host when it answers 429 with a Retry-After header.
+"""
+
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.config import CONFIG
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP-date
+
+    Returns:
+        Seconds to wait (never negative), or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Callers reserve a token and receive the delay after which they may proceed.
+    Reservations are allowed to drive the bucket negative, so concurrent callers
+    queue up fairly at exactly `rate` requests per second after the initial burst.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second; None or <= 0 disables limiting
+            burst: Maximum number of tokens that can accumulate
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token.
+
+        Returns:
+            Seconds the caller must wait before sending its request
+        """
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            if now > self._last:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+            self._tokens -= 1
+            ready_at = self._last + max(0.0, -self._tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for the given number of seconds (e.g. Retry-After).
+        An unlimited bucket ignores the pause; see HostRateLimiter.pauses().
+
+        Args:
+            seconds: Length of the pause, counted from now
+        """
+        if self.rate is None or seconds <= 0:
+            return
+        with self._lock:
+            resume_at = self._clock() + seconds
+            if resume_at > self._last:
+                # No refill during the pause, and only one request right when it ends
+                self._last = resume_at
+                self._tokens = min(self._tokens, 1.0)
+
+
+class HostRateLimiter:
+    """
+    Registry of token buckets keyed by host, shared by all workers of a run.
+    """
+
+    def __init__(
+            self,
+            rate: Optional[float] = None,
+            burst: Optional[int] = None,
+            host_limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Default requests per second per host (defaults to CONFIG['RATE_LIMIT'],
+                or 1 / CONFIG['REQUEST_DELAY'] when that is 0)
+            burst: Default burst size per host (defaults to CONFIG['RATE_LIMIT_BURST'])
+            host_limits: Optional per-host (rate, burst) overrides
+                (defaults to CONFIG['HOST_RATE_LIMITS'])
+        """
+        if rate is None:
+            rate = CONFIG.get('RATE_LIMIT', 0.0)
+            if not rate:
+                request_delay = CONFIG.get('REQUEST_DELAY', 2.0)
+                rate = 1.0 / request_delay if request_delay > 0 else None
+        self.rate = rate
+        self.burst = burst or CONFIG.get('RATE_LIMIT_BURST', 2)
+        self.host_limits = {
+            host.lower(): limits
+            for host, limits in (host_limits if host_limits is not None else CONFIG.get('HOST_RATE_LIMITS', {})).items()
+        }
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Return the token bucket for the host of the given URL."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.host_limits.get(host, (self.rate, self.burst))
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+        return bucket
+
+    def acquire(self, url: str) -> None:
+        """Block the calling thread until a request to the URL's host is allowed."""
+        wait_time = self.bucket_for(url).reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    async def acquire_async(self, url: str) -> None:
+        """Wait on the event loop until a request to the URL's host is allowed."""
+        wait_time = self.bucket_for(url).reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    def pauses(self, url: str) -> bool:
+        """
+        Whether penalize() holds back the next request to the URL's host.
+        An unlimited bucket hands out tokens without waiting and cannot pause,
+        so after a 429 the caller has to wait for Retry-After itself.
+        """
+        return self.bucket_for(url).rate is not None
+
+    def penalize(self, url: str, retry_after: Optional[float] = None) -> None:
+        """
+        Pause a host after it answered 429 Too Many Requests.
+
+        Args:
+            url: The URL that was rate limited
+            retry_after: Seconds from the Retry-After header, if any
+                (defaults to CONFIG['RATE_LIMIT_COOLDOWN'])
+        """
+        if retry_after is None:
+            retry_after = CONFIG.get('RATE_LIMIT_COOLDOWN', 5.0)
+        logging.info(f"Pausing requests to {urlparse(url).netloc} for {retry_after:.1f}s")
+        self.bucket_for(url).pause(retry_after)
@@ -0,0 +1,131 @@
+"""
+resolution_cache.py
+
+Persistent cache of detail-page outcomes, keyed by detail URL and target
+resolution. A positive entry records the download URL the service chose and
+its dimensions; a negative entry records that the page had no suitable
+resolution. Either way a later run can skip the request and the parse until
+the entry expires, so pages whose downloads move or disappear are checked again.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from src.config import CONFIG
+
+
+class DetailResult(NamedTuple):
+    """Cached outcome of a detail page; download_url is None for negative entries."""
+    download_url: Optional[str]
+    width: int
+    height: int
+    checked_at: float
+
+    @property
+    def is_negative(self) -> bool:
+        """Whether the page had no suitable resolution when it was checked."""
+        return self.download_url is None
+
+
+class ResolutionCache:
+    """
+    Thread-safe SQLite store of detail-page results.
+    """
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            negative_ttl: Optional[float] = None,
+            positive_ttl: Optional[float] = None):
+        """
+        Initialize the cache, creating its database on first use.
+
+        Args:
+            path: Database file (defaults to CONFIG['TEMP_FOLDER']/detail_pages.sqlite3)
+            negative_ttl: Seconds a negative entry is trusted before the page is checked
+                again (defaults to CONFIG['DETAIL_CACHE_NEGATIVE_TTL'])
+            positive_ttl: Seconds a cached download URL is trusted before the page is checked
+                again (defaults to CONFIG['DETAIL_CACHE_TTL'])
+        """
+        self.path = path or os.path.join(CONFIG['TEMP_FOLDER'], 'detail_pages.sqlite3')
+        if negative_ttl is None:
+            negative_ttl = CONFIG.get('DETAIL_CACHE_NEGATIVE_TTL', 604800)
+        self.negative_ttl = negative_ttl
+        if positive_ttl is None:
+            positive_ttl = CONFIG.get('DETAIL_CACHE_TTL', 2592000)
+        self.positive_ttl = positive_ttl
+        self.hits = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detail_pages ("
+            " detail_url TEXT NOT NULL, resolution TEXT NOT NULL, download_url TEXT,"
+            " width INTEGER NOT NULL DEFAULT 0, height INTEGER NOT NULL DEFAULT 0,"
+            " checked_at REAL NOT NULL, PRIMARY KEY (detail_url, resolution))")
+        self._conn.commit()
+
+    def get(self, detail_url: str, resolution: str) -> Optional[DetailResult]:
+        """
+        Return the cached result for a detail page at a target resolution.
+
+        Args:
+            detail_url: URL of the detail page
+            resolution: Target resolution string (e.g., '5120x1440')
+
+        Returns:
+            The DetailResult, or None if the page is unknown or its entry expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT download_url, width, height, checked_at FROM detail_pages"
+                " WHERE detail_url = ? AND resolution = ?",
+                (detail_url, resolution.lower())).fetchone()
+            if row is None:
+                return None
+            result = DetailResult(*row)
+            ttl = self.negative_ttl if result.is_negative else self.positive_ttl
+            if time.time() - result.checked_at >= ttl:
+                return None
+            self.hits += 1
+        return result
+
+    def put(
+            self,
+            detail_url: str,
+            resolution: str,
+            download_url: Optional[str],
+            width: int = 0,
+            height: int = 0) -> None:
+        """
+        Record the outcome of a detail page.
+
+        Args:
+            detail_url: URL of the detail page
+            resolution: Target resolution string
+            download_url: Chosen download URL, or None for a negative entry
+            width: Width of the chosen image in pixels
+            height: Height of the chosen image in pixels
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detail_pages"
+                " (detail_url, resolution, download_url, width, height, checked_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (detail_url, resolution.lower(), download_url, width, height, time.time()))
+            self._conn.commit()
+
+    def log_stats(self) -> None:
+        """Log how many detail pages were answered from the cache during this run."""
+        if self.hits:
+            logging.info(f"Detail page cache: {self.hits} pages skipped")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
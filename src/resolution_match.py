@@ -0,0 +1,177 @@
+"""
+resolution_match.py
+
+Resolution match codes for one image or for many at once.
+evaluate_resolution_match() scores a single image against a target resolution.
+evaluate_batch() scores every candidate against every target in one vectorized
+NumPy pass and ranks them, so re-evaluating a whole library for a new monitor
+is a handful of array operations rather than a Python loop over every file.
+Without NumPy the batch functions fall back to the scalar code and return lists.
+"""
+
+import functools
+from typing import List, NamedTuple, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, the scalar fallback gives the same codes
+    np = None
+
+MATCH_CODES = (0, 1, 2, 3)
+
+
+@functools.lru_cache(maxsize=4096)
+def evaluate_resolution_match(width, height, target_width, target_height):
+    """
+    Evaluate how well an image matches the desired resolution.
+    Returns a match code (0-3) for filtering and quality ranking.
+
+    Args:
+        width (int): Actual width of the image
+        height (int): Actual height of the image
+        target_width (int): Desired width
+        target_height (int): Desired height
+
+    Returns:
+        int: Match code indicating the quality of the resolution match:
+            3 - Exact match (perfect)
+            2 - Greater resolution with similar aspect ratio (good)
+            1 - Greater resolution with any aspect ratio (acceptable)
+            0 - Smaller resolution (unacceptable)
+    """
+    # Calculate aspect ratios (with a small epsilon to avoid division by zero)
+    epsilon = 0.0001
+    target_ratio = target_width / max(target_height, epsilon)
+    actual_ratio = width / max(height, epsilon)
+
+    # Check for exact match (allowing a small 5% tolerance)
+    width_match = 0.95 <= width / target_width <= 1.05
+    height_match = 0.95 <= height / target_height <= 1.05
+    if width_match and height_match:
+        return 3  # Exact match
+
+    # Check if greater resolution with similar aspect ratio
+    # Aspect ratio within 10% of target is considered similar
+    ratio_match = 0.9 <= (actual_ratio / target_ratio) <= 1.1
+    greater_res = width >= target_width and height >= target_height
+    if greater_res and ratio_match:
+        return 2  # Greater resolution with similar aspect ratio
+
+    # Check if any greater resolution
+    if width >= target_width and height >= target_height:
+        return 1  # Greater resolution but aspect ratio differs
+
+    # Smaller resolution
+    return 0  # Unacceptable
+
+
+class BatchMatch(NamedTuple):
+    """Match codes and ranking of several candidates against several targets."""
+    codes: object  # (targets, candidates) int8 array, or a list of lists without NumPy
+    ranking: object  # (targets, candidates) candidate indices, best first
+
+
+def _check_targets(targets: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    targets = [(int(width), int(height)) for width, height in targets]
+    if any(width <= 0 or height <= 0 for width, height in targets):
+        raise ValueError(f"Target resolutions must be positive: {targets}")
+    return targets
+
+
+def match_codes(widths, heights, targets: Sequence[Tuple[int, int]]):
+    """
+    Compute evaluate_resolution_match() for every candidate and target.
+
+    Args:
+        widths: Candidate widths (array or sequence)
+        heights: Candidate heights, same length as widths
+        targets: (width, height) target resolutions
+
+    Returns:
+        Codes shaped (len(targets), len(widths)): an int8 array with NumPy,
+        otherwise a list of lists
+
+    Raises:
+        ValueError: If a target is not positive or widths and heights differ in length
+    """
+    targets = _check_targets(targets)
+    if len(widths) != len(heights):
+        raise ValueError(f"{len(widths)} widths but {len(heights)} heights")
+    if np is None:
+        return [[evaluate_resolution_match(int(w), int(h), tw, th) for w, h in zip(widths, heights)]
+                for tw, th in targets]
+
+    epsilon = 0.0001
+    width = np.asarray(widths, dtype=np.float64)[np.newaxis, :]
+    height = np.asarray(heights, dtype=np.float64)[np.newaxis, :]
+    target = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    target_width, target_height = target[:, 0:1], target[:, 1:2]
+
+    # Same float operations as the scalar code, broadcast to (targets, candidates)
+    width_scale = width / target_width
+    height_scale = height / target_height
+    exact = (0.95 <= width_scale) & (width_scale <= 1.05) & (0.95 <= height_scale) & (height_scale <= 1.05)
+    ratio = (width / np.maximum(height, epsilon)) / (target_width / np.maximum(target_height, epsilon))
+    similar = (0.9 <= ratio) & (ratio <= 1.1)
+    greater = (width >= target_width) & (height >= target_height)
+
+    codes = np.where(greater, np.where(similar, 2, 1), 0).astype(np.int8)
+    codes[exact] = 3
+    return codes
+
+
+def rank_candidates(codes, widths, heights):
+    """
+    Order candidates best first for each target: higher match code, then fewer
+    pixels (the closest size that still qualifies), then original order.
+
+    Args:
+        codes: Output of match_codes()
+        widths: Candidate widths
+        heights: Candidate heights
+
+    Returns:
+        Candidate indices shaped like codes
+    """
+    if np is None:
+        areas = [int(w) * int(h) for w, h in zip(widths, heights)]
+        return [sorted(range(len(areas)), key=lambda i, row=row: (-row[i], areas[i])) for row in codes]
+    area = np.asarray(widths, dtype=np.int64) * np.asarray(heights, dtype=np.int64)
+    codes = np.asarray(codes)
+    # lexsort is stable and sorts by the last key first
+    return np.lexsort((np.broadcast_to(area, codes.shape), -codes.astype(np.int16)), axis=-1)
+
+
+def evaluate_batch(widths, heights, targets: Sequence[Tuple[int, int]]) -> BatchMatch:
+    """
+    Score and rank candidates against one or more target resolutions in one pass.
+
+    Args:
+        widths: Candidate widths (array or sequence)
+        heights: Candidate heights, same length as widths
+        targets: (width, height) target resolutions
+
+    Returns:
+        BatchMatch with the codes and the best-first ranking per target
+
+    Raises:
+        ValueError: If a target is not positive or widths and heights differ in length
+    """
+    codes = match_codes(widths, heights, targets)
+    return BatchMatch(codes, rank_candidates(codes, widths, heights))
+
+
+def count_codes(codes) -> List[List[int]]:
+    """
+    Count the candidates per match code for each target.
+
+    Args:
+        codes: Output of match_codes()
+
+    Returns:
+        One [code 0, code 1, code 2, code 3] count list per target
+    """
+    if np is None:
+        return [[row.count(code) for code in MATCH_CODES] for row in codes]
+    return [np.bincount(np.asarray(row, dtype=np.int64), minlength=len(MATCH_CODES)).tolist()
+            for row in codes]
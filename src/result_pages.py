@@ -0,0 +1,204 @@
+"""
+result_pages.py
+
+Lazy walk over the numbered result pages of a search or theme listing.
+ResultPages hands out detail page URLs in batches and fetches listing pages
+only when the batches run dry; once the links of one page are handed out and
+the caller may still want more, the next page is already being fetched in the
+background while the caller visits the detail pages. The caller asks for the next batch only while its theme
+still needs wallpapers, so a theme whose budget is met stops the walk without
+fetching any further listing or detail page. AsyncResultPages is the event
+loop counterpart used by the async engine.
+
+A listing page is cut off at what the caller still wants only when that is
+a hard cap (cut_pages). A caller whose wanted count can stay up after a batch
+(its detail pages may be rejected) gets every page in full instead; the links
+of a page not handed out yet stay buffered and are drained before the walk
+moves on, so no link is skipped and no page requested twice.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+# fetch_page(page_number, limit) -> detail URLs of that page (at most limit), or None if there is no such page
+FetchPage = Callable[[int, Optional[int]], Optional[List[str]]]
+
+
+class _PageState:
+    """Buffer, de-duplication and end-of-listing bookkeeping shared by both walkers."""
+
+    def __init__(self, max_pages: Optional[int], cut_pages: bool):
+        self.max_pages = max_pages
+        self.cut_pages = cut_pages
+        self.next_page = 1
+        self.exhausted = False
+        self.buffer: List[str] = []
+        self._seen = set()
+
+    def claim_page(self) -> Optional[int]:
+        """Return the number of the next page to fetch, or None at the end of the listing."""
+        if self.exhausted or (self.max_pages and self.next_page > self.max_pages):
+            self.exhausted = True
+            return None
+        number = self.next_page
+        self.next_page += 1
+        return number
+
+    def add(self, number: int, links: Optional[List[str]]) -> None:
+        """Buffer the new links of a page; a missing page or one with nothing new ends the walk."""
+        new = [link for link in links or () if link not in self._seen]
+        if not new:
+            if number > 1:
+                logging.debug(f"Listing ends before page {number}")
+            self.exhausted = True
+            return
+        self._seen.update(new)
+        self.buffer.extend(new)
+
+    def limit(self, want: int) -> Optional[int]:
+        """Limit for fetching a page when the caller wants want more URLs (None = the whole page)."""
+        return want if self.cut_pages else None
+
+    def pop(self, count: int) -> List[str]:
+        batch, self.buffer = self.buffer[:count], self.buffer[count:]
+        return batch
+
+
+class ResultPages:
+    """
+    Detail page URLs of a paginated listing, fetched page by page on demand.
+    """
+
+    def __init__(self, fetch_page: FetchPage, max_pages: Optional[int] = None, cut_pages: bool = True):
+        """
+        Initialize the walk; nothing is fetched until the first take().
+
+        Args:
+            fetch_page: Callable(page_number, limit) returning the detail URLs of
+                a page (page numbers start at 1), or None if it does not exist
+            max_pages: Stop after this many pages (None or 0 = until the listing ends)
+            cut_pages: Pass what the caller still wants to fetch_page as the limit; only
+                right when every URL handed out counts against want, otherwise pages
+                are fetched in full
+        """
+        self.fetch_page = fetch_page
+        self._state = _PageState(max_pages, cut_pages)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._prefetch = None  # (page number, future) of the page being fetched ahead
+
+    @property
+    def pages_fetched(self) -> int:
+        """Number of listing pages requested so far, the prefetched one included."""
+        return self._state.next_page - 1
+
+    def take(self, count: int, want: Optional[int] = None) -> List[str]:
+        """
+        Return the next detail page URLs, fetching listing pages as needed.
+
+        Args:
+            count: Maximum number of URLs to return
+            want: How many URLs the caller may still need in total, used to cut
+                off listing pages early and to decide on a prefetch (defaults to count)
+
+        Returns:
+            Up to count URLs not returned before; an empty list once the listing is exhausted
+        """
+        state = self._state
+        want = max(count, want or 0)
+        while len(state.buffer) < count and not state.exhausted:
+            if self._prefetch is not None:
+                number, future = self._prefetch
+                self._prefetch = None
+                state.add(number, future.result())
+            else:
+                number = state.claim_page()
+                if number is not None:
+                    state.add(number, self.fetch_page(number, state.limit(want - len(state.buffer))))
+        batch = state.pop(count)
+        if batch and not state.buffer and want > len(batch):
+            self._start_prefetch(want - len(batch))
+        return batch
+
+    def _start_prefetch(self, limit: int) -> None:
+        number = self._state.claim_page()
+        if number is None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-pages')
+        self._prefetch = (number, self._executor.submit(self.fetch_page, number, self._state.limit(limit)))
+
+    def close(self) -> None:
+        """Stop the walk; a prefetch that has not started yet is cancelled."""
+        if self._prefetch is not None:
+            self._prefetch[1].cancel()
+            self._prefetch = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class AsyncResultPages:
+    """
+    Asyncio counterpart of ResultPages; the prefetch runs as a task on the event loop.
+    """
+
+    def __init__(
+            self,
+            fetch_page: Callable[[int, Optional[int]], Awaitable[Optional[List[str]]]],
+            max_pages: Optional[int] = None,
+            cut_pages: bool = True):
+        """
+        Initialize the walk; nothing is fetched until the first take().
+
+        Args:
+            fetch_page: Coroutine function(page_number, limit) returning the detail
+                URLs of a page, or None if it does not exist
+            max_pages: Stop after this many pages (None or 0 = until the listing ends)
+            cut_pages: Pass what the caller still wants to fetch_page as the limit (see ResultPages)
+        """
+        self.fetch_page = fetch_page
+        self._state = _PageState(max_pages, cut_pages)
+        self._prefetch = None
+
+    @property
+    def pages_fetched(self) -> int:
+        """Number of listing pages requested so far, the prefetched one included."""
+        return self._state.next_page - 1
+
+    async def take(self, count: int, want: Optional[int] = None) -> List[str]:
+        """
+        Return the next detail page URLs, fetching listing pages as needed.
+
+        Args:
+            count: Maximum number of URLs to return
+            want: How many URLs the caller may still need in total (defaults to count)
+
+        Returns:
+            Up to count URLs not returned before; an empty list once the listing is exhausted
+        """
+        state = self._state
+        want = max(count, want or 0)
+        while len(state.buffer) < count and not state.exhausted:
+            if self._prefetch is not None:
+                number, task = self._prefetch
+                self._prefetch = None
+                state.add(number, await task)
+            else:
+                number = state.claim_page()
+                if number is not None:
+                    state.add(number, await self.fetch_page(number, state.limit(want - len(state.buffer))))
+        batch = state.pop(count)
+        if batch and not state.buffer and want > len(batch):
+            number = state.claim_page()
+            if number is not None:
+                self._prefetch = (
+                    number, asyncio.ensure_future(self.fetch_page(number, state.limit(want - len(batch)))))
+        return batch
+
+    def close(self) -> None:
+        """Stop the walk and cancel a prefetch still in flight."""
+        if self._prefetch is not None:
+            self._prefetch[1].cancel()
+            self._prefetch = None
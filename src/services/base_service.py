@@ -0,0 +1,753 @@
+"""
+Base class shared by the wallpaper site services.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.config import CONFIG, DEFAULT_HEADERS
+from src.html_parser import parse_html
+from src.http_client import get_default_client
+from src.listing_extractor import ListingExtractor
+from src.pipeline import Candidate, choose_candidate
+from src.rate_limiter import parse_retry_after
+from src.result_pages import AsyncResultPages, ResultPages
+from src.utils import to_thread
+
+
+class BaseWallpaperService:
+    """
+    Common setup and transport handling for the site-specific services.
+    Subclasses provide BASE_URL, SITE_NAME, PAGE_STRAINERS and fetch_wallpapers(),
+    and _page_url() for listings with more than one result page.
+    """
+    BASE_URL = ""
+    SITE_NAME = ""
+    # Whether a detail page with no option reaching the target still yields its largest image
+    FALLBACK_TO_LARGEST = False
+    # SoupStrainer per page type ('search', 'detail', ...); pages without one are parsed in full
+    PAGE_STRAINERS = {}
+    # ListingRule per listing page type; those pages are streamed and cut off at MAX_ITEMS_PER_THEME
+    LISTING_RULES = {}
+
+    def __init__(
+            self, resolution="5120x1440", themes=None, http_client=None, resolution_cache=None,
+            wallpaper_callback=None, budget=None):
+        """
+        Initialize the service with the desired resolutions and themes.
+
+        Args:
+            resolution: Desired wallpaper resolution (e.g., '5120x1440'), or several as a list or
+                comma-separated string; search listings follow the first, and every detail page
+                is matched against all of them
+            themes: List of themes to search for (e.g., ['nature', 'abstract'])
+            http_client: Optional shared HttpClient (defaults to the process-wide client)
+            resolution_cache: Optional ResolutionCache of earlier detail-page results
+            wallpaper_callback: Optional callable(candidate) invoked with a Candidate for each
+                wallpaper and target resolution as soon as it is found, before fetch_wallpapers() returns
+            budget: Optional ThemeBudget; listings are then walked page by page until each
+                theme has enough wallpapers, instead of stopping at MAX_ITEMS_PER_THEME
+        """
+        if isinstance(resolution, str):
+            resolution = resolution.split(',')
+        self.resolutions = [res.strip().lower() for res in resolution if res.strip()] or ['']
+        self.resolution = self.resolutions[0]
+        self.themes = themes or []
+
+        # Parse resolutions for comparison purposes: (resolution, width, height) per target
+        self.targets = []
+        for res in self.resolutions:
+            try:
+                width, height = map(int, res.split('x'))
+            except Exception as e:
+                logging.error(f"Failed to parse resolution '{res}': {e}")
+                width = height = 0
+            self.targets.append((res, width, height))
+        _, self.min_width, self.min_height = self.targets[0]
+
+        # Set up headers using centralized configuration
+        self.headers = DEFAULT_HEADERS.copy()
+        self.headers['User-Agent'] = CONFIG['USER_AGENT']
+
+        # Pooled per-host sessions shared with the other services and the downloader
+        self.http = http_client or get_default_client()
+        self.resolution_cache = resolution_cache
+        self.wallpaper_callback = wallpaper_callback
+        self.budget = budget
+
+        # Detail pages processed at once within a theme (SITE_CONCURRENCY overrides DETAIL_CONCURRENCY)
+        site_limit = CONFIG.get('SITE_CONCURRENCY', {}).get(self.SITE_NAME)
+        self.detail_concurrency = max(1, site_limit or CONFIG.get('DETAIL_CONCURRENCY', 4))
+
+    def fetch_wallpapers(self, progress_callback=None):
+        """
+        Fetch wallpaper download URLs by theme and resolution.
+
+        Args:
+            progress_callback: Optional callback function to report progress
+
+        Returns:
+            List of wallpaper download URLs matching the requested criteria.
+        """
+        raise NotImplementedError
+
+    async def fetch_wallpapers_async(self, client, progress_callback=None):
+        """
+        Asyncio counterpart of fetch_wallpapers().
+
+        Args:
+            client: AsyncHttpClient shared by every service on the event loop
+            progress_callback: Optional callback function to report progress
+
+        Returns:
+            List of wallpaper download URLs matching the requested criteria.
+        """
+        raise NotImplementedError
+
+    def _emit(self, theme, found, resolution=None):
+        """
+        Hand wallpapers found for a theme to the wallpaper callback right away.
+
+        Args:
+            theme: The theme the wallpapers were found for (None: not attributable yet, nothing is emitted)
+            found: Candidates or download URLs, or a mapping of target resolution to Candidate
+            resolution: Target resolution of a plain list (defaults to the first target)
+        """
+        if self.wallpaper_callback is None or theme is None:
+            return
+        for candidate in self._candidates(theme, found, resolution):
+            self.wallpaper_callback(candidate)
+
+    async def _emit_async(self, theme, found, resolution=None):
+        """Asyncio counterpart of _emit(); awaits the callback when it is a coroutine function."""
+        if self.wallpaper_callback is None or theme is None:
+            return
+        for candidate in self._candidates(theme, found, resolution):
+            result = self.wallpaper_callback(candidate)
+            if inspect.isawaitable(result):
+                await result
+
+    def _candidates(self, theme, found, resolution=None):
+        """Stamp found wallpapers with this site, the theme and their target resolution."""
+        if isinstance(found, dict):
+            pairs = found.items()
+        else:
+            pairs = ((resolution or self.resolution, item) for item in found)
+        for target, item in pairs:
+            if isinstance(item, str):
+                item = Candidate(item)
+            yield item.replace(site=self.SITE_NAME, theme=theme, resolution=target)
+
+    def _soup(self, html, page):
+        """
+        Parse a page, keeping only the elements its page type declares in PAGE_STRAINERS.
+
+        Args:
+            html: The markup of the page
+            page: Page type key of PAGE_STRAINERS
+
+        Returns:
+            BeautifulSoup object
+        """
+        return parse_html(html, self.PAGE_STRAINERS.get(page))
+
+    def _listing_extractor(self, page, limit=None):
+        """
+        Return a fresh ListingExtractor for a page type, stopping after limit links
+        (None = the whole page), or None if the page type is not streamed.
+        """
+        rule = self.LISTING_RULES.get(page)
+        if rule is None or not CONFIG.get('STREAM_LISTINGS', True):
+            return None
+        return ListingExtractor(rule, self.BASE_URL, limit)
+
+    def _listing_links(self, url, page, parse, limit=None):
+        """
+        Fetch a search or theme page and return its detail page URLs.
+        Page types with a LISTING_RULES entry are parsed while they download and
+        the connection is closed once limit links were found; a page the rule
+        finds nothing on (another layout) is parsed in full with parse() from
+        the text the extractor kept.
+
+        Args:
+            url: The URL of the listing page
+            page: Page type key of LISTING_RULES
+            parse: Callable(html) returning the detail URLs of a whole page
+            limit: Maximum links to return (None = every link on the page)
+
+        Returns:
+            List of detail page URLs, or None if the page could not be fetched
+        """
+        if self._listing_extractor(page, limit) is not None:
+            extractor = self._stream_with_retry(url, lambda: self._listing_extractor(page, limit))
+            if extractor is None:
+                return None
+            if extractor.links:
+                logging.debug(f"Found {len(extractor.links)} links in the first {extractor.chars_fed} characters of {url}")
+                self._remember_listing(extractor.fields, extractor.titles)
+                return extractor.links
+            logging.debug(f"No listing matched on {url}, parsing the whole page")
+            return parse(extractor.text)[:limit]
+
+        response = self._fetch_with_retry(url)
+        return None if response is None else parse(response.text)[:limit]
+
+    async def _listing_links_async(self, client, url, page, parse, limit=None):
+        """
+        Asyncio counterpart of _listing_links().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            url: The URL of the listing page
+            page: Page type key of LISTING_RULES
+            parse: Callable(html) returning the detail URLs of a whole page
+            limit: Maximum links to return (None = every link on the page)
+
+        Returns:
+            List of detail page URLs, or None if the page could not be fetched
+        """
+        if self._listing_extractor(page, limit) is not None:
+            extractor = await client.stream_page(
+                url, lambda: self._listing_extractor(page, limit), headers=self.headers)
+            if extractor is None:
+                return None
+            if extractor.links:
+                logging.debug(f"Found {len(extractor.links)} links in the first {extractor.chars_fed} characters of {url}")
+                self._remember_listing(extractor.fields, extractor.titles)
+                return extractor.links
+            logging.debug(f"No listing matched on {url}, parsing the whole page")
+            return parse(extractor.text)[:limit]
+
+        html = await client.fetch_text(url, headers=self.headers)
+        return None if html is None else parse(html)[:limit]
+
+    def _remember_listing(self, fields, titles=None):
+        """
+        Take note of what a listing page says about its results; services that
+        use the fields of their LISTING_RULES or the link titles override this.
+
+        Args:
+            fields: dict mapping detail page URL to {field class: text} of its result
+            titles: Optional dict mapping detail page URL to the title of its link
+        """
+
+    def _page_url(self, url, number):
+        """
+        Build the URL of a later result page of a listing.
+
+        Args:
+            url: The URL of the first page
+            number: Page number, starting at 1
+
+        Returns:
+            The page URL, or None if the listing has no such page
+        """
+        return url if number == 1 else None
+
+    def _detail_budget(self, theme, visited, limit=None):
+        """
+        Return how many more detail pages of a theme are worth visiting.
+        Without a ThemeBudget (or outside a theme) that is limit (default MAX_ITEMS_PER_THEME)
+        per listing; with one, the slots the theme still has free, or one batch if it has no limit.
+        """
+        if self.budget is None or theme is None:
+            return (limit or CONFIG.get('MAX_ITEMS_PER_THEME', 10)) - visited
+        remaining = self.budget.remaining(theme)
+        return self.detail_concurrency if remaining is None else remaining
+
+    def _cuts_pages(self, theme):
+        """Whether the detail pages handed out are all that count against _detail_budget()."""
+        return self.budget is None or theme is None
+
+    def _batch_size(self, want):
+        # Without a budget there is nothing to re-check between batches
+        return want if self.budget is None else min(want, self.detail_concurrency)
+
+    def _walk_listing(self, url, page, parse, progress_callback=None, theme=None):
+        """
+        Visit the detail pages of a listing, walking its result pages lazily
+        until the theme's budget is met or the listing ends (at most MAX_PAGES_PER_THEME).
+
+        Args:
+            url: The URL of the first result page
+            page: Page type key of LISTING_RULES
+            parse: Callable(html) returning the detail URLs of a whole page
+            progress_callback: Optional callback invoked after each detail page
+            theme: Theme the listing belongs to, for the budget and for emitting URLs
+
+        Returns:
+            List of unique wallpaper download URLs, in listing order
+        """
+        return self._walk_pages(
+            self._page_fetcher(url, page, parse),
+            lambda batch: self._process_detail_pages(batch, progress_callback, theme), theme, url)
+
+    async def _walk_listing_async(self, client, url, page, parse, theme=None):
+        """
+        Asyncio counterpart of _walk_listing().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            url: The URL of the first result page
+            page: Page type key of LISTING_RULES
+            parse: Callable(html) returning the detail URLs of a whole page
+            theme: Theme the listing belongs to, for the budget and for emitting URLs
+
+        Returns:
+            List of unique wallpaper download URLs, in listing order
+        """
+        return await self._walk_pages_async(
+            self._page_fetcher_async(client, url, page, parse),
+            lambda batch: self._process_detail_pages_async(client, batch, theme), theme)
+
+    def _page_fetcher(self, url, page, parse):
+        """Return fetch_page(number, limit) for ResultPages over the result pages of a listing."""
+        def fetch_page(number, limit):
+            page_url = self._page_url(url, number)
+            if page_url is None:
+                return None
+            return self._listing_links(page_url, page, parse, limit)
+        return fetch_page
+
+    def _page_fetcher_async(self, client, url, page, parse):
+        """Asyncio counterpart of _page_fetcher(), for AsyncResultPages."""
+        async def fetch_page(number, limit):
+            page_url = self._page_url(url, number)
+            if page_url is None:
+                return None
+            return await self._listing_links_async(client, page_url, page, parse, limit)
+        return fetch_page
+
+    def _walk_pages(self, fetch_page, process, theme=None, url=None, limit=None):
+        """
+        Hand the items of a paginated listing to process() in batches until the
+        theme's budget is met or the listing ends. The budget is checked before
+        each batch, so nothing is processed for a theme that already has enough.
+
+        Args:
+            fetch_page: Callable(page_number, limit) for ResultPages
+            process: Callable(batch) returning the download URLs found for a batch
+            theme: Theme the listing belongs to, for the budget
+            url: The URL of the listing, for logging
+            limit: Items to process when there is no budget or theme (default MAX_ITEMS_PER_THEME)
+
+        Returns:
+            List of unique wallpaper download URLs, in listing order
+        """
+        # A theme's budget stays open while its detail pages are rejected, so its pages are read in full
+        pages = ResultPages(fetch_page, CONFIG.get('MAX_PAGES_PER_THEME', 5), self._cuts_pages(theme))
+        wallpapers = []
+        visited = 0
+        try:
+            while True:
+                want = self._detail_budget(theme, visited, limit)
+                if want <= 0:
+                    break
+                batch = pages.take(self._batch_size(want), want)
+                if not batch:
+                    break
+                visited += len(batch)
+                wallpapers.extend(process(batch))
+        finally:
+            pages.close()
+        if pages.pages_fetched > 1:
+            logging.debug(f"Walked {pages.pages_fetched} result pages of {url or self.SITE_NAME}")
+        return self._unique(wallpapers)
+
+    async def _walk_pages_async(self, fetch_page, process, theme=None, limit=None):
+        """
+        Asyncio counterpart of _walk_pages(); fetch_page and process are coroutine functions.
+
+        Args:
+            fetch_page: Coroutine function(page_number, limit) for AsyncResultPages
+            process: Coroutine function(batch) returning the download URLs found for a batch
+            theme: Theme the listing belongs to, for the budget
+            limit: Items to process when there is no budget or theme (default MAX_ITEMS_PER_THEME)
+
+        Returns:
+            List of unique wallpaper download URLs, in listing order
+        """
+        # A theme's budget stays open while its detail pages are rejected, so its pages are read in full
+        pages = AsyncResultPages(fetch_page, CONFIG.get('MAX_PAGES_PER_THEME', 5), self._cuts_pages(theme))
+        wallpapers = []
+        visited = 0
+        try:
+            while True:
+                want = self._detail_budget(theme, visited, limit)
+                if want <= 0:
+                    break
+                batch = await pages.take(self._batch_size(want), want)
+                if not batch:
+                    break
+                visited += len(batch)
+                wallpapers.extend(await process(batch))
+        finally:
+            pages.close()
+        return self._unique(wallpapers)
+
+    def _detail_options(self, html):
+        """
+        List the download options offered on a detail page.
+
+        Args:
+            html: The markup of the detail page
+
+        Returns:
+            List of Candidate options (width and height 0 when the page does not say)
+        """
+        raise NotImplementedError
+
+    def _parse_detail_page(self, html, url=None):
+        """
+        Choose the download option of a detail page for every target resolution,
+        parsing the page only once.
+
+        Args:
+            html: The markup of the detail page
+            url: The URL of the detail page, recorded on the candidates
+
+        Returns:
+            dict mapping each target resolution to its chosen Candidate, or to None if there is no suitable option
+        """
+        return self._choose_options(self._detail_options(html), url)
+
+    def _choose_options(self, options, url=None):
+        """
+        Choose among the download options of one wallpaper for every target resolution.
+
+        Args:
+            options: Candidate options of the wallpaper
+            url: The URL of its detail page, recorded on the candidates
+
+        Returns:
+            dict mapping each target resolution to its chosen Candidate, or to None if there is no suitable option
+        """
+        for option in options:
+            option.detail_url = url
+            option.site = self.SITE_NAME
+        return {
+            res: choose_candidate(options, width, height, self.FALLBACK_TO_LARGEST)
+            for res, width, height in self.targets}
+
+    def _cached_detail(self, url):
+        """
+        Look up earlier results for a detail page at this service's resolutions.
+
+        Args:
+            url: The URL of the detail page
+
+        Returns:
+            dict mapping target resolution to Candidate (negative entries are left out),
+            or None unless every target is cached
+        """
+        if self.resolution_cache is None:
+            return None
+        found = {}
+        for res in self.resolutions:
+            result = self.resolution_cache.get(url, res)
+            if result is None:
+                return None
+            if not result.is_negative:
+                found[res] = Candidate(
+                    result.download_url, result.width, result.height, detail_url=url, site=self.SITE_NAME)
+        logging.debug(f"Detail page cache hit for {url}")
+        return found
+
+    def _remember_detail(self, url, html):
+        """
+        Parse a detail page and record the outcome for every target, including
+        targets with no suitable resolution.
+
+        Args:
+            url: The URL of the detail page
+            html: The markup of the detail page
+
+        Returns:
+            dict mapping each target resolution with a suitable option to its Candidate
+        """
+        chosen = self._parse_detail_page(html, url)
+        self._store_detail(url, chosen)
+        return {res: candidate for res, candidate in chosen.items() if candidate}
+
+    def _store_detail(self, url, chosen):
+        """Record the Candidate (or None: no suitable option) chosen for each target of a detail page."""
+        if self.resolution_cache is None:
+            return
+        for res, candidate in chosen.items():
+            if candidate:
+                self.resolution_cache.put(
+                    url, res, candidate.download_url, candidate.width, candidate.height)
+            else:
+                self.resolution_cache.put(url, res, None)
+
+    def _detail_without_page(self, url):
+        """
+        Find a detail page's wallpapers without fetching the page, where a service
+        knows a cheaper way; the default knows none.
+
+        Args:
+            url: The URL of the detail page
+
+        Returns:
+            dict mapping every target resolution to its Candidate, or None to fetch the page
+        """
+        return None
+
+    async def _detail_without_page_async(self, client, url):
+        """Asyncio counterpart of _detail_without_page()."""
+        return None
+
+    def _process_detail_page(self, url):
+        """
+        Process a wallpaper detail page to find download links.
+
+        Args:
+            url: The URL of the detail page
+
+        Returns:
+            dict mapping each target resolution with a suitable option to its Candidate
+        """
+        try:
+            cached = self._cached_detail(url)
+            if cached is not None:
+                return cached
+            found = self._detail_without_page(url)
+            if found is not None:
+                self._store_detail(url, found)
+                return found
+            response = self._fetch_with_retry(url)
+            if response is None:
+                return {}
+            return self._remember_detail(url, response.text)
+        except Exception as e:
+            logging.error(f"Error processing detail page {url}: {e}")
+            return {}
+
+    def _process_detail_pages(self, detail_urls, progress_callback=None, theme=None):
+        """
+        Process several detail pages on a pool bounded by detail_concurrency.
+
+        Args:
+            detail_urls: Detail page URLs, in listing order
+            progress_callback: Optional callback invoked after each detail page
+            theme: Theme the pages belong to; when given, each page's candidates are emitted as soon as it is done
+
+        Returns:
+            List of unique wallpaper download URLs over all targets, in listing order
+        """
+        results = self._detail_results(detail_urls, progress_callback, theme)
+        return self._unique(
+            candidate.download_url for found in results for candidate in found.values())
+
+    def _detail_results(self, detail_urls, progress_callback=None, theme=None):
+        """
+        Like _process_detail_pages(), but return what each detail page yielded.
+
+        Returns:
+            List with one dict per detail page, mapping target resolution to Candidate
+        """
+        def process(detail_url):
+            try:
+                found = self._process_detail_page(detail_url)
+                self._emit(theme, found)
+                return found
+            except Exception as e:
+                logging.error(f"Error processing wallpaper item: {e}")
+                return {}
+            finally:
+                # Update progress after each wallpaper
+                if progress_callback:
+                    progress_callback()
+
+        workers = min(self.detail_concurrency, len(detail_urls))
+        if workers <= 1:
+            results = [process(url) for url in detail_urls]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.SITE_NAME) as executor:
+                results = list(executor.map(process, detail_urls))
+        return results
+
+    async def _process_detail_page_async(self, client, url):
+        """
+        Asyncio counterpart of _process_detail_page().
+
+        Args:
+            client: AsyncHttpClient used for the request
+            url: The URL of the detail page
+
+        Returns:
+            dict mapping each target resolution with a suitable option to its Candidate
+        """
+        try:
+            # SQLite work stays off the event loop
+            cached = await to_thread(self._cached_detail, url)
+        except Exception as e:
+            logging.error(f"Error reading detail page cache for {url}: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+
+        try:
+            found = await self._detail_without_page_async(client, url)
+            if found is not None:
+                await to_thread(self._store_detail, url, found)
+                return found
+        except Exception as e:
+            logging.error(f"Error resolving {url} without its page: {e}")
+
+        html = await client.fetch_text(url, headers=self.headers)
+        if html is None:
+            return {}
+        try:
+            return await to_thread(self._remember_detail, url, html)
+        except Exception as e:
+            logging.error(f"Error processing detail page {url}: {e}")
+            return {}
+
+    async def _process_detail_pages_async(self, client, detail_urls, theme=None):
+        """
+        Process several detail pages concurrently on the event loop,
+        at most detail_concurrency at a time.
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            detail_urls: Detail page URLs, in listing order
+            theme: Theme the pages belong to; when given, each page's candidates are emitted as soon as it is done
+
+        Returns:
+            List of unique wallpaper download URLs over all targets, in listing order
+        """
+        results = await self._detail_results_async(client, detail_urls, theme)
+        return self._unique(
+            candidate.download_url for found in results for candidate in found.values())
+
+    async def _detail_results_async(self, client, detail_urls, theme=None):
+        """Asyncio counterpart of _detail_results()."""
+        semaphore = asyncio.Semaphore(self.detail_concurrency)
+
+        async def process(url):
+            async with semaphore:
+                found = await self._process_detail_page_async(client, url)
+            await self._emit_async(theme, found)
+            return found
+
+        return list(await asyncio.gather(*(process(url) for url in detail_urls)))
+
+    @staticmethod
+    def _unique(urls):
+        """Remove duplicates while preserving order."""
+        unique_urls = []
+        seen = set()
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                unique_urls.append(url)
+        return unique_urls
+
+    def _stream_with_retry(self, url, new_reader):
+        """
+        Stream a page into a reader with the retry logic of _fetch_with_retry().
+
+        Args:
+            url: The URL to fetch
+            new_reader: Callable returning a fresh reader for each attempt
+
+        Returns:
+            The reader of the successful attempt, or None if the page could not be fetched
+        """
+        timeout = CONFIG.get('REQUEST_TIMEOUT', 10)
+        max_retries = CONFIG.get('MAX_RETRIES', 3)
+        retry_delay = CONFIG.get('RETRY_DELAY', 1)
+
+        for attempt in range(max_retries):
+            rate_limited = None
+            reader = new_reader()
+            try:
+                response = self.http.stream_page(url, reader, headers=self.headers, timeout=timeout, cache=True)
+
+                if response.status_code == 200:
+                    return reader
+                elif response.status_code == 429:  # Too Many Requests
+                    logging.warning(f"Rate limited by {self.SITE_NAME} on attempt {attempt + 1}")
+                    rate_limited = response
+                else:
+                    logging.warning(f"HTTP {response.status_code} fetching {url} on attempt {attempt + 1}")
+            except (requests.exceptions.RequestException, IOError) as e:
+                logging.warning(f"Error fetching {url} on attempt {attempt + 1}: {e}")
+
+            if attempt < max_retries - 1:
+                wait_time = self._retry_wait(url, retry_delay * (2 ** attempt), rate_limited)
+                if wait_time > 0:
+                    logging.debug(f"Retrying in {wait_time} seconds")
+                    time.sleep(wait_time)
+
+        logging.error(f"Failed to fetch {url} after {max_retries} attempts")
+        return None
+
+    def _retry_wait(self, url, backoff, rate_limited=None):
+        """
+        Return the seconds to wait before the next attempt at a URL.
+
+        Args:
+            url: The URL being fetched
+            backoff: Exponential backoff delay of this attempt
+            rate_limited: The 429 response of this attempt, if it was rate limited
+
+        Returns:
+            0 after a 429 when the HTTP layer has paused the host (the next attempt
+            waits in the rate limiter); Retry-After, or else the backoff, when the
+            host's rate is unlimited and cannot be paused; the backoff otherwise
+        """
+        if rate_limited is None:
+            return backoff
+        limiter = getattr(self.http, 'rate_limiter', None)
+        if limiter is not None and limiter.pauses(url):
+            return 0
+        retry_after = parse_retry_after((getattr(rate_limited, 'headers', None) or {}).get('Retry-After'))
+        return backoff if retry_after is None else retry_after
+
+    def _fetch_with_retry(self, url, headers=None, cache_key=None):
+        """
+        Fetch a URL with retry logic and exponential backoff.
+
+        Args:
+            url: The URL to fetch
+            headers: Request headers (defaults to the service's headers)
+            cache_key: Key of the response in the page cache (defaults to the URL)
+
+        Returns:
+            Response object if successful, None otherwise
+        """
+        timeout = CONFIG.get('REQUEST_TIMEOUT', 10)
+        max_retries = CONFIG.get('MAX_RETRIES', 3)
+        retry_delay = CONFIG.get('RETRY_DELAY', 1)
+
+        for attempt in range(max_retries):
+            rate_limited = None
+            try:
+                response = self.http.get(
+                    url, headers=headers or self.headers, timeout=timeout, cache=True, cache_key=cache_key)
+
+                if response.status_code == 200:
+                    return response
+                elif response.status_code == 429:  # Too Many Requests
+                    logging.warning(f"Rate limited by {self.SITE_NAME} on attempt {attempt + 1}")
+                    rate_limited = response
+                else:
+                    logging.warning(f"HTTP {response.status_code} fetching {url} on attempt {attempt + 1}")
+            except (requests.exceptions.RequestException, IOError) as e:
+                logging.warning(f"Error fetching {url} on attempt {attempt + 1}: {e}")
+
+            # Apply exponential backoff if this is not the last attempt
+            if attempt < max_retries - 1:
+                wait_time = self._retry_wait(url, retry_delay * (2 ** attempt), rate_limited)
+                if wait_time > 0:
+                    logging.debug(f"Retrying in {wait_time} seconds")
+                    time.sleep(wait_time)
+
+        logging.error(f"Failed to fetch {url} after {max_retries} attempts")
+        return None
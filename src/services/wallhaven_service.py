@@ -2,278 +2,494 @@
 Service module for fetching wallpapers from wallhaven.cc.
 Enhanced with improved error handling and retry logic.
 """
-import requests
-from bs4 import BeautifulSoup
-import re
+import asyncio
+import hashlib
+import json
 import logging
-from urllib.parse import urljoin, quote_plus
-import time
-from src.config import CONFIG, DEFAULT_HEADERS
+import re
+from urllib.parse import urlencode, urljoin, urlparse, quote_plus
+from src.config import CONFIG
+from src.html_parser import compile_selector, strainer
+from src.listing_extractor import ListingRule
+from src.pipeline import Candidate
+from src.services.base_service import BaseWallpaperService
+
+THUMBS = compile_selector('figure.thumb')
+PREVIEW_LINK = compile_selector('a.preview')
+WALLPAPER_IMG = compile_selector('img#wallpaper')
+WALL_RES = compile_selector('span.wall-res')
+PNG_BADGE = compile_selector('span.png')
 
-class WallhavenService:
+# Full-size images live at a path derived from the wallpaper id
+FULL_IMAGE_URL = "https://w.wallhaven.cc/full/{prefix}/wallhaven-{id}.{ext}"
+WALLPAPER_ID = re.compile(r'/w/([a-z0-9]{2,})/?')
+LISTED_RESOLUTION = re.compile(r'(\d+)\s*x\s*(\d+)')
+
+class WallhavenService(BaseWallpaperService):
     """
     Service for fetching wallpapers from wallhaven.cc which has a wide variety
     of high-resolution wallpapers and supports search by resolution.
     """
     BASE_URL = "https://wallhaven.cc"
-    
-    def __init__(self, resolution="5120x1440", themes=None):
-        """
-        Initialize the service with the desired resolution and themes.
-        
-        Args:
-            resolution: String with the desired wallpaper resolution (e.g., '5120x1440')
-            themes: List of themes to search for (e.g., ['nature', 'abstract'])
-        """
-        self.resolution = resolution.lower()
-        self.themes = themes or []
-        
-        # Parse resolution for comparison purposes
-        try:
-            self.min_width, self.min_height = map(int, resolution.lower().split('x'))
-        except Exception as e:
-            logging.error(f"Failed to parse resolution '{resolution}': {e}")
-            self.min_width = self.min_height = 0
-              # Set up headers using centralized configuration
-        self.headers = DEFAULT_HEADERS.copy()
-        self.headers['User-Agent'] = CONFIG['USER_AGENT']
+    SITE_NAME = "wallhaven.cc"
+    PAGE_STRAINERS = {
+        'search': strainer('figure', 'thumb'),
+        'detail': strainer('img', id='wallpaper'),
+    }
+    LISTING_RULES = {
+        'search': ListingRule('figure', ('thumb',), link_class='preview', fields=('wall-res', 'png')),
+    }
+    API_URL = "https://wallhaven.cc/api/v1"
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the service; see BaseWallpaperService. WALLHAVEN_API_KEY is sent with API requests only."""
+        super().__init__(*args, **kwargs)
+        self._listed = {}  # Detail page URL -> Candidate built from its search thumbnail
+        self.api_headers = dict(self.headers)
+        api_key = CONFIG.get('WALLHAVEN_API_KEY')
+        # API results are cached apart from pages, per key (never the key itself)
+        self._api_cache_scope = 'wallhaven-api'
+        if api_key:
+            # The API applies the account's purity and category settings for this key
+            self.api_headers['X-API-Key'] = api_key
+            self._api_cache_scope += '-' + hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+    @property
+    def use_api(self):
+        """Whether themes are searched through the JSON API (WALLHAVEN_USE_API)."""
+        return CONFIG.get('WALLHAVEN_USE_API', True)
+
     def fetch_wallpapers(self, progress_callback=None):
         """
         Fetch wallpaper download URLs by theme and resolution.
-        
+
         Args:
             progress_callback: Optional callback function to report progress
-            
+
         Returns:
             List of wallpaper download URLs matching the requested criteria.
         """
         wallpapers = []
-        
+
         # Process each theme
         for theme in self.themes:
             # Progress: Starting theme search
             if progress_callback:
                 progress_callback()
-                
+
             theme_wallpapers = self._fetch_theme_wallpapers(theme)
             wallpapers.extend(theme_wallpapers)
             logging.info(f"Found {len(theme_wallpapers)} wallpapers for theme '{theme}'")
-            
+
             # Progress: Processing search results
             if progress_callback:
                 progress_callback()
-            
+
             # Progress: Theme completed
             if progress_callback:
                 progress_callback()
-            
-            # Add delay between theme requests
-            time.sleep(CONFIG.get('REQUEST_DELAY', 2.0))
-        
+
         # Remove duplicates while preserving order
-        unique_wallpapers = []
-        seen = set()
-        for url in wallpapers:
-            if url not in seen:
-                seen.add(url)
-                unique_wallpapers.append(url)
-        
+        unique_wallpapers = self._unique(wallpapers)
+
+        logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallhaven.cc")
+        return unique_wallpapers
+
+    async def fetch_wallpapers_async(self, client, progress_callback=None):
+        """
+        Fetch wallpaper download URLs by theme and resolution on the event loop.
+        All themes and their detail pages are fetched concurrently.
+
+        Args:
+            client: AsyncHttpClient shared by every service on the event loop
+            progress_callback: Optional callback function to report progress
+
+        Returns:
+            List of wallpaper download URLs matching the requested criteria.
+        """
+        async def fetch_theme(theme):
+            # Progress: Starting theme search
+            if progress_callback:
+                progress_callback()
+            theme_wallpapers = await self._fetch_theme_wallpapers_async(client, theme)
+            logging.info(f"Found {len(theme_wallpapers)} wallpapers for theme '{theme}'")
+            # Progress: Processing search results and theme completed
+            if progress_callback:
+                progress_callback()
+                progress_callback()
+            return theme_wallpapers
+
+        results = await asyncio.gather(*(fetch_theme(theme) for theme in self.themes))
+        unique_wallpapers = self._unique(url for urls in results for url in urls)
+
         logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallhaven.cc")
         return unique_wallpapers
-    
+
+    def _search_url(self, theme):
+        """Build the search URL for a theme and every target resolution."""
+        search_term = quote_plus(theme)
+        resolutions = ",".join(f"{width}x{height}" for _, width, height in self.targets)
+        return f"{self.BASE_URL}/search?q={search_term}&resolutions={resolutions}"
+
+    def _page_url(self, url, number):
+        """Search results continue on numbered pages of the same query."""
+        return url if number == 1 else f"{url}&page={number}"
+
     def _fetch_theme_wallpapers(self, theme, progress_callback=None):
         """
         Fetch wallpapers for a specific theme.
-        
+
         Args:
             theme: The theme to search for
             progress_callback: Optional callback function to report progress
-            
+
         Returns:
             List of wallpaper URLs
         """
+        if self.use_api:
+            logging.info(f"Searching the wallhaven.cc API for '{theme}' with resolution {', '.join(self.resolutions)}")
+            try:
+                wallpapers = self._walk_api(theme, progress_callback)
+                if wallpapers is not None:
+                    return wallpapers
+            except Exception as e:
+                logging.error(f"Error searching the wallhaven.cc API for {theme}: {e}")
+            logging.warning(f"wallhaven.cc API unavailable for '{theme}', falling back to the search pages")
+
         wallpapers = []
-        
+
         # Build the search URL for this theme and resolution
-        search_term = quote_plus(theme)
-        resolutions = f"{self.min_width}x{self.min_height}"
-        search_url = f"{self.BASE_URL}/search?q={search_term}&resolutions={resolutions}"
-        
-        logging.info(f"Searching wallhaven.cc for '{theme}' with resolution {resolutions}: {search_url}")
-        
+        search_url = self._search_url(theme)
+        logging.info(f"Searching wallhaven.cc for '{theme}' with resolution {', '.join(self.resolutions)}: {search_url}")
+
         try:
-            response = self._fetch_with_retry(search_url)
-            if response is None:
-                return []
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for wallpaper preview images
-            wallpaper_items = soup.select('figure.thumb')
-            logging.debug(f"Found {len(wallpaper_items)} wallpaper items")
-            
-            # Process each wallpaper up to the maximum per theme
-            max_items = CONFIG.get('MAX_ITEMS_PER_THEME', 10)
-            for item in wallpaper_items[:max_items]:
-                try:
-                    # Extract wallpaper info
-                    link = item.select_one('a.preview')
-                    if not link or not link.has_attr('href'):
-                        continue
-                    
-                    detail_url = link['href']
-                    if not detail_url.startswith(('http://', 'https://')):
-                        detail_url = urljoin(self.BASE_URL, detail_url)
-                    
-                    # Get the actual wallpaper URLs from the detail page
-                    download_urls = self._process_detail_page(detail_url)
-                    wallpapers.extend(download_urls)
-                    
-                    # Update progress after each wallpaper
-                    if progress_callback:
-                        progress_callback()
-                    
-                except Exception as e:
-                    logging.error(f"Error processing wallpaper item: {e}")
-                    continue
-                    
-                # Add delay between wallpaper requests
-                time.sleep(CONFIG.get('REQUEST_DELAY', 1))
-                
+            # Get the actual wallpaper URLs from the detail pages, result page by result page
+            wallpapers.extend(self._walk_listing(search_url, 'search', self._parse_search_page, progress_callback, theme))
+
         except Exception as e:
             logging.error(f"Error fetching theme {theme}: {e}")
-            
+
         return wallpapers
-    
-    def _process_detail_page(self, url):
+
+    async def _fetch_theme_wallpapers_async(self, client, theme):
         """
-        Process a wallpaper detail page to find the download link.
-        
+        Asyncio counterpart of _fetch_theme_wallpapers().
+
         Args:
-            url: The URL of the detail page
-            
+            client: AsyncHttpClient used for the requests
+            theme: The theme to search for
+
         Returns:
-            List containing the wallpaper download URL if found, empty list otherwise
+            List of wallpaper URLs
         """
-        download_urls = []
-        
+        if self.use_api:
+            logging.info(f"Searching the wallhaven.cc API for '{theme}' with resolution {', '.join(self.resolutions)}")
+            try:
+                wallpapers = await self._walk_api_async(client, theme)
+                if wallpapers is not None:
+                    return wallpapers
+            except Exception as e:
+                logging.error(f"Error searching the wallhaven.cc API for {theme}: {e}")
+            logging.warning(f"wallhaven.cc API unavailable for '{theme}', falling back to the search pages")
+
+        search_url = self._search_url(theme)
+        logging.info(f"Searching wallhaven.cc for '{theme}' with resolution {', '.join(self.resolutions)}: {search_url}")
+
         try:
-            response = self._fetch_with_retry(url)
-            if response is None:
-                return []
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for the main wallpaper image or download link
-            wallpaper_options = []
-            
-            # Try to find the high-resolution download button/link
-            download_link = soup.select_one('img#wallpaper')
-            if download_link and download_link.has_attr('src'):
-                img_url = download_link['src']
-                
-                # Check if the URL is relative or absolute
-                if not img_url.startswith(('http://', 'https://')):
-                    img_url = urljoin(self.BASE_URL, img_url)
-                
-                # Try to get resolution from URL or attributes
-                width = download_link.get('data-wallpaper-width') or download_link.get('width')
-                height = download_link.get('data-wallpaper-height') or download_link.get('height')
-                
-                if width and height:
-                    try:
-                        width = int(width)
-                        height = int(height)
-                        
-                        # Add to options with resolution details
-                        wallpaper_options.append({
-                            'url': img_url,
-                            'width': width,
-                            'height': height,
-                            'exact_match': width == self.min_width and height == self.min_height
-                        })
-                        logging.debug(f"Found download option: {img_url} ({width}x{height})")
-                    except (ValueError, TypeError) as e:
-                        # If we can't parse the resolution, still add the URL
-                        logging.warning(f"Couldn't parse resolution for {img_url}: {e}")
-                        wallpaper_options.append({
-                            'url': img_url,
-                            'width': self.min_width,  # Assume it matches what we searched for
-                            'height': self.min_height,
-                            'exact_match': False
-                        })
-                else:
-                    # No resolution info available, assume it matches our search
-                    wallpaper_options.append({
-                        'url': img_url,
-                        'width': self.min_width,
-                        'height': self.min_height,
-                        'exact_match': False
-                    })
-                    logging.debug(f"Found download without resolution info: {img_url}")
-            
-            # Process the resolution selection logic
-            if wallpaper_options:
-                # First, check for exact match
-                exact_matches = [opt for opt in wallpaper_options if opt['exact_match']]
-                if exact_matches:
-                    # Exactly one match with our desired resolution, use it
-                    chosen = exact_matches[0]
-                    download_urls.append(chosen['url'])
-                    logging.info(f"Found exact resolution match: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-                else:
-                    # No exact match, find the smallest one that's bigger than our minimum
-                    valid_options = [opt for opt in wallpaper_options 
-                                    if opt['width'] >= self.min_width and opt['height'] >= self.min_height]
-                    
-                    if valid_options:
-                        # Sort by resolution area (width * height) to find the closest one
-                        valid_options.sort(key=lambda x: x['width'] * x['height'])
-                        chosen = valid_options[0]  # Smallest valid resolution
-                        download_urls.append(chosen['url'])
-                        logging.info(f"Found next larger resolution: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-                    else:
-                        logging.debug(f"No suitable resolution found that meets {self.min_width}x{self.min_height}")
-            
+            return await self._walk_listing_async(client, search_url, 'search', self._parse_search_page, theme)
         except Exception as e:
-            logging.error(f"Error processing detail page {url}: {e}")
-            
-        return download_urls
-    
-    def _fetch_with_retry(self, url):
+            logging.error(f"Error fetching theme {theme}: {e}")
+            return []
+
+    def _api_search_url(self, theme, number=1):
+        """Build the API search URL of one result page for a theme and every target resolution."""
+        params = {
+            'q': theme,
+            'resolutions': ",".join(f"{width}x{height}" for _, width, height in self.targets),
+            'sorting': 'relevance',  # The order of the HTML search; the API defaults to date_added
+        }
+        if number > 1:
+            params['page'] = number
+        return f"{self.API_URL}/search?{urlencode(params)}"
+
+    def _api_cache_key(self, url):
+        """Key of an API response in the page cache, kept apart from HTML pages and other API keys."""
+        return f"{self._api_cache_scope}:{url}"
+
+    def _parse_api_page(self, body):
         """
-        Fetch a URL with retry logic and exponential backoff.
-        
+        Read one page of API search results.
+
         Args:
-            url: The URL to fetch
-            
+            body: The JSON text of the response
+
         Returns:
-            Response object if successful, None otherwise
+            (list of (wallpaper page URL, Candidate) in result order, last page number or None)
+
+        Raises:
+            ValueError: If the body is not an API search response
         """
-        timeout = CONFIG.get('REQUEST_TIMEOUT', 10)
-        max_retries = CONFIG.get('MAX_RETRIES', 3)
-        retry_delay = CONFIG.get('RETRY_DELAY', 1)
-        
-        for attempt in range(max_retries):
+        payload = json.loads(body)
+        if not isinstance(payload, dict) or not isinstance(payload.get('data'), list):
+            raise ValueError("Unexpected API response")
+        max_bytes = max(0, CONFIG.get('MAX_IMAGE_MB', 0)) * 1024 * 1024
+
+        results = []
+        for item in payload['data']:
+            path = item.get('path')
+            if not path:
+                continue
+            # Images the download would abort on are left out without a request
+            if max_bytes and (item.get('file_size') or 0) > max_bytes:
+                logging.debug(f"Skipping {path}: {item['file_size']} bytes is over MAX_IMAGE_MB")
+                continue
             try:
-                response = requests.get(url, headers=self.headers, timeout=timeout)
-                
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 429:  # Too Many Requests
-                    # Special handling for rate limiting
-                    logging.warning(f"Rate limited by wallhaven.cc on attempt {attempt + 1}")
-                    wait_time = retry_delay * (2 ** attempt) + 2  # Add extra time for rate limiting
-                else:
-                    logging.warning(f"HTTP {response.status_code} fetching {url} on attempt {attempt + 1}")
-            except Exception as e:
-                logging.warning(f"Error fetching {url} on attempt {attempt + 1}: {e}")
-                
-            # Apply exponential backoff if this is not the last attempt
-            if attempt < max_retries - 1:
-                wait_time = retry_delay * (2 ** attempt)
-                logging.debug(f"Retrying in {wait_time} seconds")
-                time.sleep(wait_time)
-                
-        logging.error(f"Failed to fetch {url} after {max_retries} attempts")
-        return None
+                width, height = map(int, str(item.get('resolution') or '').split('x'))
+            except ValueError:
+                width, height = item.get('dimension_x') or 0, item.get('dimension_y') or 0
+            results.append((item.get('url') or path, Candidate(path, width, height)))
+        return results, (payload.get('meta') or {}).get('last_page')
+
+    def _api_walk_state(self, theme):
+        """
+        Shared bookkeeping of _walk_api() and _walk_api_async().
+
+        Returns:
+            (read_page(number, body) for ResultPages, choose(page_url) returning the
+            Candidates per target of a result, state dict whose 'failed' tells whether
+            the first page could not be read)
+        """
+        options = {}
+        state = {'last_page': None, 'failed': False}
+
+        def read_page(number, body):
+            if body is None:
+                state['failed'] = number == 1
+                return None
+            try:
+                results, state['last_page'] = self._parse_api_page(body)
+            except ValueError as e:
+                logging.warning(f"Unreadable wallhaven.cc API page {number} for '{theme}': {e}")
+                state['failed'] = number == 1
+                return None
+            options.update(results)
+            return [page_url for page_url, _ in results]
+
+        def choose(page_url):
+            chosen = self._choose_options([options.pop(page_url)], page_url)
+            return {res: candidate for res, candidate in chosen.items() if candidate}
+
+        return read_page, choose, state
+
+    def _walk_api(self, theme, progress_callback=None):
+        """
+        Fetch a theme's wallpapers from the JSON search API, page by page until
+        its budget is met. Every result already carries the image path, resolution
+        and file size, so no detail page is requested.
+
+        Args:
+            theme: The theme to search for
+            progress_callback: Optional callback invoked after each result
+
+        Returns:
+            List of wallpaper URLs, or None if the API could not be used
+        """
+        read_page, choose, state = self._api_walk_state(theme)
+
+        def fetch_page(number, limit):
+            if state['last_page'] and number > state['last_page']:
+                return None
+            url = self._api_search_url(theme, number)
+            response = self._fetch_with_retry(url, self.api_headers, self._api_cache_key(url))
+            return read_page(number, None if response is None else response.text)
+
+        def process(batch):
+            wallpapers = []
+            for page_url in batch:
+                found = choose(page_url)
+                self._emit(theme, found)
+                wallpapers.extend(candidate.download_url for candidate in found.values())
+                if progress_callback:
+                    progress_callback()
+            return wallpapers
+
+        wallpapers = self._walk_pages(fetch_page, process, theme, self._api_search_url(theme))
+        return None if state['failed'] else wallpapers
+
+    async def _walk_api_async(self, client, theme):
+        """
+        Asyncio counterpart of _walk_api().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            theme: The theme to search for
+
+        Returns:
+            List of wallpaper URLs, or None if the API could not be used
+        """
+        read_page, choose, state = self._api_walk_state(theme)
+
+        async def fetch_page(number, limit):
+            if state['last_page'] and number > state['last_page']:
+                return None
+            url = self._api_search_url(theme, number)
+            body = await client.fetch_text(url, headers=self.api_headers, cache_key=self._api_cache_key(url))
+            return read_page(number, body)
+
+        async def process(batch):
+            wallpapers = []
+            for page_url in batch:
+                found = choose(page_url)
+                await self._emit_async(theme, found)
+                wallpapers.extend(candidate.download_url for candidate in found.values())
+            return wallpapers
+
+        wallpapers = await self._walk_pages_async(fetch_page, process, theme)
+        return None if state['failed'] else wallpapers
+
+    def _parse_search_page(self, html):
+        """
+        Extract detail page URLs from a search results page.
+
+        Args:
+            html: The markup of the search results page
+
+        Returns:
+            List of detail page URLs, in page order
+        """
+        detail_urls = []
+        soup = self._soup(html, 'search')
+
+        # Look for wallpaper preview images
+        wallpaper_items = THUMBS.select(soup)
+        logging.debug(f"Found {len(wallpaper_items)} wallpaper items")
+
+        # Process each wallpaper (_listing_links() applies the limit)
+        fields = {}
+        for item in wallpaper_items:
+            # Extract wallpaper info
+            link = PREVIEW_LINK.select_one(item)
+            if not link or not link.has_attr('href'):
+                continue
+
+            detail_url = link['href']
+            if not detail_url.startswith(('http://', 'https://')):
+                detail_url = urljoin(self.BASE_URL, detail_url)
+            detail_urls.append(detail_url)
+
+            # The same fields the streamed listing collects
+            resolution = WALL_RES.select_one(item)
+            fields[detail_url] = {'wall-res': resolution.get_text(' ', strip=True)} if resolution else {}
+            if PNG_BADGE.select_one(item):
+                fields[detail_url]['png'] = 'PNG'
+
+        self._remember_listing(fields)
+        return detail_urls
+
+    def _remember_listing(self, fields, titles=None):
+        """
+        Build the full-size image of every search result whose thumbnail lists its
+        resolution, so its detail page need not be fetched (WALLHAVEN_LISTING_METADATA).
+
+        Args:
+            fields: dict mapping detail page URL to the 'wall-res' and 'png' texts of its thumbnail
+            titles: Unused; wallhaven.cc preview links carry no title
+        """
+        if not CONFIG.get('WALLHAVEN_LISTING_METADATA', True):
+            return
+        for detail_url, result in fields.items():
+            candidate = self._listed_candidate(detail_url, result)
+            if candidate is not None:
+                self._listed[detail_url] = candidate
+
+    @staticmethod
+    def _listed_candidate(detail_url, fields):
+        """
+        Derive the full-size image of a search result from its thumbnail.
+        wallhaven.cc serves JPEG unless the thumbnail carries a PNG badge.
+
+        Args:
+            detail_url: The URL of the wallpaper's detail page (/w/<id>)
+            fields: The 'wall-res' and 'png' texts of its thumbnail
+
+        Returns:
+            Candidate with the listed dimensions, or None if the id or resolution is missing
+        """
+        wallpaper_id = WALLPAPER_ID.search(urlparse(detail_url).path)
+        size = LISTED_RESOLUTION.fullmatch(fields.get('wall-res', ''))
+        if not wallpaper_id or not size:
+            return None
+        wallpaper_id = wallpaper_id.group(1)
+        ext = 'png' if 'png' in fields else 'jpg'
+        url = FULL_IMAGE_URL.format(prefix=wallpaper_id[:2], id=wallpaper_id, ext=ext)
+        return Candidate(url, int(size.group(1)), int(size.group(2)))
+
+    def _from_listing(self, url):
+        """
+        Choose the image built from a detail page's search thumbnail for every target.
+
+        Returns:
+            dict mapping target resolution to Candidate, or None if the thumbnail said too little
+        """
+        candidate = self._listed.pop(url, None)
+        if candidate is None:
+            return None
+        chosen = self._choose_options([candidate], url)
+        return {res: option for res, option in chosen.items() if option}
+
+    def _process_detail_page(self, url):
+        """Use the search thumbnail when it describes the wallpaper, else fetch the detail page."""
+        found = self._from_listing(url)
+        return super()._process_detail_page(url) if found is None else found
+
+    async def _process_detail_page_async(self, client, url):
+        """Asyncio counterpart of _process_detail_page()."""
+        found = self._from_listing(url)
+        return await super()._process_detail_page_async(client, url) if found is None else found
+
+    def _detail_options(self, html):
+        """
+        List the download options offered on a wallpaper detail page.
+
+        Args:
+            html: The markup of the detail page
+
+        Returns:
+            List of Candidate options (width and height 0 when the page does not say)
+        """
+        soup = self._soup(html, 'detail')
+
+        # Look for the main wallpaper image or download link
+        wallpaper_options = []
+
+        # Try to find the high-resolution download button/link
+        download_link = WALLPAPER_IMG.select_one(soup)
+        if download_link and download_link.has_attr('src'):
+            img_url = download_link['src']
+
+            # Check if the URL is relative or absolute
+            if not img_url.startswith(('http://', 'https://')):
+                img_url = urljoin(self.BASE_URL, img_url)
+
+            # Try to get resolution from URL or attributes
+            width = download_link.get('data-wallpaper-width') or download_link.get('width')
+            height = download_link.get('data-wallpaper-height') or download_link.get('height')
+
+            if width and height:
+                try:
+                    width = int(width)
+                    height = int(height)
+
+                    # Add to options with resolution details
+                    wallpaper_options.append(Candidate(img_url, width, height))
+                    logging.debug(f"Found download option: {img_url} ({width}x{height})")
+                except (ValueError, TypeError) as e:
+                    # If we can't parse the resolution, still add the URL
+                    logging.warning(f"Couldn't parse resolution for {img_url}: {e}")
+                    wallpaper_options.append(Candidate(img_url))
+            else:
+                # No resolution info available, assume it matches each target
+                wallpaper_options.append(Candidate(img_url))
+                logging.debug(f"Found download without resolution info: {img_url}")
+
+        return wallpaper_options
@@ -1,41 +1,51 @@
 """
 Service module for fetching wallpapers from wallpaperbat.com.
 """
-import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+import asyncio
 import re
 import logging
 from urllib.parse import urljoin, quote_plus
-import time
-from src.config import CONFIG, DEFAULT_HEADERS
+from src.config import CONFIG
+from src.html_parser import compile_selector, strainer
+from src.listing_extractor import ListingRule
+from src.pipeline import Candidate
+from src.services.base_service import BaseWallpaperService
+from src.theme_index import ThemeIndex
 
-class WallpaperBatService:
+GRID_LINKS = compile_selector('div.wallpapers a')
+ITEM_LINKS = compile_selector('div.item a')
+ANCHORS = compile_selector('a')
+MAIN_IMG = compile_selector('img.img-wallpaper')
+WALLPAPER_IMG = compile_selector('img#wallpaper')
+IMAGES = compile_selector('img')
+DOWNLOAD_BUTTONS = compile_selector('a.download-button, a.btn-download')
+
+# Themes that take the whole ultrawide listing rather than the wallpapers matching them
+ULTRAWIDE_THEMES = ('ultrawide', 'super ultrawide', 'wide', '5120x1440')
+
+class WallpaperBatService(BaseWallpaperService):
     """
     Service for fetching wallpapers from wallpaperbat.com which has a collection
     of super ultrawide wallpapers and various other resolutions.
     """
     BASE_URL = "https://wallpaperbat.com"
-    
-    def __init__(self, resolution="5120x1440", themes=None):
-        """
-        Initialize the service with the desired resolution and themes.
-        
-        Args:
-            resolution: String with the desired wallpaper resolution (e.g., '5120x1440')
-            themes: List of themes to search for (e.g., ['nature', 'abstract'])
-        """
-        self.resolution = resolution.lower()
-        self.themes = themes or []
-        
-        # Parse resolution for comparison purposes
-        try:
-            self.min_width, self.min_height = map(int, resolution.lower().split('x'))
-        except Exception as e:
-            logging.error(f"Failed to parse resolution '{resolution}': {e}")
-            self.min_width = self.min_height = 0
-              # Set up headers using centralized configuration
-        self.headers = DEFAULT_HEADERS.copy()
-        self.headers['User-Agent'] = CONFIG['USER_AGENT']
+    SITE_NAME = "wallpaperbat.com"
+    PAGE_STRAINERS = {
+        'search': strainer('div', ('wallpapers', 'item')),
+        # Second pass over a search page whose layout has neither container
+        'search_links': SoupStrainer('a'),
+        'detail': SoupStrainer(['img', 'a']),
+    }
+    LISTING_RULES = {'search': ListingRule('div', ('wallpapers',), first_link_only=False)}
+    # Take the largest image when none reaches the target
+    FALLBACK_TO_LARGEST = True
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the service; see BaseWallpaperService."""
+        super().__init__(*args, **kwargs)
+        self._titles = {}  # Detail page URL -> title of its link on a listing page
+
     def fetch_wallpapers(self, progress_callback=None):
         """
         Fetch wallpaper download URLs by theme and resolution.
@@ -47,9 +57,8 @@ class WallpaperBatService:
             List of wallpaper download URLs matching the requested criteria.
         """
         wallpapers = []
-        
-        # Wallpaperbat has specific URL format for super ultrawide resolution
-        resolution_url = f"{self.BASE_URL}/{self.resolution}-super-ultrawide-wallpapers"
+        # The ultrawide listing is shared by all themes, so it is walked once on first use
+        ultrawide = None
         
         # Process each theme
         for theme in self.themes:
@@ -60,14 +69,13 @@ class WallpaperBatService:
                 progress_callback()
             
             # Try theme-specific page with resolution
-            theme_search = quote_plus(theme)
-            search_url = f"{self.BASE_URL}/search?q={theme_search}"
+            search_url = self._search_url(theme)
             
             # Progress: Processing theme search results
             if progress_callback:
                 progress_callback()
                 
-            theme_wallpapers.extend(self._process_search_page(search_url))
+            theme_wallpapers.extend(self._process_search_page(search_url, theme=theme))
             
             # If we're looking for a specific resolution that has its own page, check that too
             if self.resolution == "5120x1440":
@@ -75,25 +83,17 @@ class WallpaperBatService:
                 if progress_callback:
                     progress_callback()
                     
-                ultrawide_url = f"{self.BASE_URL}/5120x1440-super-ultrawide-wallpapers"
-                ultrawide_wallpapers = self._process_search_page(ultrawide_url)
+                if ultrawide is None:
+                    ultrawide = self._ultrawide_index()
                 
                 # Progress: Processing ultrawide results
                 if progress_callback:
                     progress_callback()
                 
-                # If this is a theme search, filter the ultrawide results to only include ones matching the theme
-                if theme.lower() not in ['ultrawide', 'super ultrawide', 'wide', '5120x1440']:
-                    # Keep only wallpapers that might match our theme (simple text matching)
-                    filtered_wallpapers = []
-                    for url in ultrawide_wallpapers:
-                        # Extract keywords from the URL and check if they match our theme
-                        if theme.lower() in url.lower():
-                            filtered_wallpapers.append(url)
-                    theme_wallpapers.extend(filtered_wallpapers)
-                else:
-                    # If we're specifically looking for ultrawide wallpapers, keep all results
-                    theme_wallpapers.extend(ultrawide_wallpapers)
+                # The shared listing is only attributable to a theme once matched
+                for res, candidates in self._match_ultrawide(theme, ultrawide).items():
+                    self._emit(theme, candidates, res)
+                    theme_wallpapers.extend(candidate.download_url for candidate in candidates)
                     
             wallpapers.extend(theme_wallpapers)
             logging.info(f"Found {len(theme_wallpapers)} wallpapers for theme '{theme}' on wallpaperbat.com")
@@ -101,28 +101,185 @@ class WallpaperBatService:
             # Progress: Theme completed
             if progress_callback:
                 progress_callback()
-            
-            # Add delay between theme requests
-            time.sleep(CONFIG.get('REQUEST_DELAY', 2.0))
         
         # Remove duplicates while preserving order
-        unique_wallpapers = []
-        seen = set()
-        for url in wallpapers:
-            if url not in seen:
-                seen.add(url)
-                unique_wallpapers.append(url)
+        unique_wallpapers = self._unique(wallpapers)
         
         logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallpaperbat.com")
         return unique_wallpapers
+
+    async def fetch_wallpapers_async(self, client, progress_callback=None):
+        """
+        Fetch wallpaper download URLs by theme and resolution on the event loop.
+        All themes, listing pages and detail pages are fetched concurrently;
+        the ultrawide listing is walked once and shared by all themes.
+
+        Args:
+            client: AsyncHttpClient shared by every service on the event loop
+            progress_callback: Optional callback function to report progress
+
+        Returns:
+            List of wallpaper download URLs matching the requested criteria.
+        """
+        def report(steps):
+            if progress_callback:
+                for _ in range(steps):
+                    progress_callback()
+
+        ultrawide = None
+        if self.resolution == "5120x1440" and self.themes:
+            # Walked alongside the theme searches; every theme awaits the same index
+            ultrawide = asyncio.ensure_future(self._ultrawide_index_async(client))
+
+        async def fetch_theme(theme):
+            # Progress: Starting theme search and processing its results
+            report(2)
+            theme_wallpapers = list(
+                await self._process_search_page_async(client, self._search_url(theme), theme))
+            if ultrawide is not None:
+                index = await ultrawide
+                # Progress: Ultrawide search and its results
+                report(2)
+                for res, candidates in self._match_ultrawide(theme, index).items():
+                    await self._emit_async(theme, candidates, res)
+                    theme_wallpapers.extend(candidate.download_url for candidate in candidates)
+
+            logging.info(f"Found {len(theme_wallpapers)} wallpapers for theme '{theme}' on wallpaperbat.com")
+            # Progress: Theme completed
+            report(1)
+            return theme_wallpapers
+
+        try:
+            results = await asyncio.gather(*(fetch_theme(theme) for theme in self.themes))
+        finally:
+            if ultrawide is not None:
+                ultrawide.cancel()
+        unique_wallpapers = self._unique(url for urls in results for url in urls)
+
+        logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallpaperbat.com")
+        return unique_wallpapers
+
+    def _search_url(self, theme):
+        """Build the search URL for a theme."""
+        return f"{self.BASE_URL}/search?q={quote_plus(theme)}"
+
+    def _ultrawide_url(self):
+        """Wallpaperbat has a dedicated listing for super ultrawide resolution."""
+        return f"{self.BASE_URL}/5120x1440-super-ultrawide-wallpapers"
+
+    def _page_url(self, url, number):
+        """Search and resolution listings continue on ?page=<number>."""
+        if number == 1:
+            return url
+        return f"{url}{'&' if '?' in url else '?'}page={number}"
+
+    def _ultrawide_index(self):
+        """
+        Walk the ultrawide listing and its detail pages once for all themes.
+
+        Returns:
+            ThemeIndex of (target resolution, Candidate) pairs by the words of their detail URL,
+            title and download URL
+        """
+        index = ThemeIndex()
+        url = self._ultrawide_url()
+        try:
+            self._walk_pages(
+                self._page_fetcher(url, 'search', lambda html: self._parse_search_page(html, url)),
+                lambda batch: self._index_details(index, batch, self._detail_results(batch)),
+                url=url, limit=CONFIG.get('WALLPAPERBAT_ULTRAWIDE_ITEMS', 30))
+        except Exception as e:
+            logging.error(f"Error processing search page {url}: {e}")
+        logging.debug(f"Indexed {len(index)} ultrawide wallpapers for {len(self.themes)} themes")
+        return index
+
+    async def _ultrawide_index_async(self, client):
+        """
+        Asyncio counterpart of _ultrawide_index().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+
+        Returns:
+            ThemeIndex of (target resolution, Candidate) pairs by the words of their detail URL,
+            title and download URL
+        """
+        index = ThemeIndex()
+        url = self._ultrawide_url()
+
+        async def process(batch):
+            return self._index_details(index, batch, await self._detail_results_async(client, batch))
+
+        try:
+            await self._walk_pages_async(
+                self._page_fetcher_async(client, url, 'search', lambda html: self._parse_search_page(html, url)),
+                process, limit=CONFIG.get('WALLPAPERBAT_ULTRAWIDE_ITEMS', 30))
+        except Exception as e:
+            logging.error(f"Error processing search page {url}: {e}")
+        return index
+
+    def _index_details(self, index, detail_urls, results):
+        """
+        Add the wallpapers found on a batch of ultrawide detail pages to the index.
+
+        Args:
+            index: ThemeIndex being built
+            detail_urls: Detail page URLs of the batch
+            results: What each detail page yielded, as returned by _detail_results()
+
+        Returns:
+            List of unique download URLs of the batch
+        """
+        downloads = []
+        for detail_url, found in zip(detail_urls, results):
+            title = self._titles.get(detail_url, '')
+            for res, candidate in found.items():
+                # Each target keeps its own choice, so one target's image never fills another's slot
+                index.add((res, candidate), detail_url, title, candidate.download_url)
+                downloads.append(candidate.download_url)
+        return self._unique(downloads)
+
+    @staticmethod
+    def _match_ultrawide(theme, index):
+        """
+        Pick the wallpapers of the ultrawide listing that match a theme.
+
+        Args:
+            theme: The theme being searched
+            index: ThemeIndex of the ultrawide listing
+
+        Returns:
+            dict mapping target resolution to the Candidates relevant to the theme, in listing order
+        """
+        # If we're specifically looking for ultrawide wallpapers, keep all results
+        if theme.lower() in ULTRAWIDE_THEMES:
+            matches = list(index)
+        else:
+            # Every word of the theme has to start a word of the slug or title
+            matches = index.match(theme)
+        by_target = {}
+        for res, candidate in matches:
+            by_target.setdefault(res, []).append(candidate)
+        return by_target
+
+    def _remember_listing(self, fields, titles=None):
+        """
+        Keep the link titles of a listing page, so the ultrawide listing can be matched by title.
+
+        Args:
+            fields: Unused, wallpaperbat.com's listing rule has no fields
+            titles: Optional dict mapping detail page URL to the title of its link
+        """
+        self._titles.update(titles or {})
     
-    def _process_search_page(self, url, progress_callback=None):
+    def _process_search_page(self, url, progress_callback=None, theme=None):
         """
         Process a search results page to find wallpaper detail pages.
         
         Args:
             url: The URL of the search results page
             progress_callback: Optional callback function to report progress
+            theme: Theme the page belongs to, for emitting URLs as they are found
             
         Returns:
             List of wallpaper download URLs
@@ -130,252 +287,173 @@ class WallpaperBatService:
         wallpapers = []
         
         try:
-            response = self._fetch_with_retry(url)
-            if response is None:
-                return []
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for wallpaper cards/items that contain images
-            wallpaper_items = soup.select('div.wallpapers a')
-            if not wallpaper_items:
-                # Try alternative selectors
-                wallpaper_items = soup.select('div.item a')
-            if not wallpaper_items:
-                # Try another approach - look for images inside links
-                wallpaper_items = [a for a in soup.select('a') if a.find('img')]
-                
-            logging.debug(f"Found {len(wallpaper_items)} wallpaper items on page: {url}")
-            
-            # Process each wallpaper item up to the maximum per theme
-            max_items = CONFIG.get('MAX_ITEMS_PER_THEME', 10)
-            for i, item in enumerate(wallpaper_items):
-                if i >= max_items:
-                    break
-                    
-                try:
-                    # Get the detail page URL
-                    if not item.has_attr('href'):
-                        continue
-                        
-                    detail_url = item['href']
-                    if not detail_url.startswith(('http://', 'https://')):
-                        detail_url = urljoin(self.BASE_URL, detail_url)
-                    
-                    logging.debug(f"Processing wallpaper detail page: {detail_url}")
-                    
-                    # Get download links from the detail page
-                    download_urls = self._process_detail_page(detail_url)
-                    wallpapers.extend(download_urls)
-                    
-                    # Update progress after each wallpaper
-                    if progress_callback:
-                        progress_callback()
-                    
-                    # Add a short delay between requests
-                    time.sleep(CONFIG.get('REQUEST_DELAY', 2.0))
-                    
-                except Exception as e:
-                    logging.error(f"Error processing wallpaper item: {e}")
+            # Get download links from the detail pages, result page by result page
+            wallpapers.extend(self._walk_listing(
+                url, 'search', lambda html: self._parse_search_page(html, url), progress_callback, theme))
             
         except Exception as e:
             logging.error(f"Error processing search page {url}: {e}")
         
         return wallpapers
+
+    async def _process_search_page_async(self, client, url, theme=None):
+        """
+        Asyncio counterpart of _process_search_page().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            url: The URL of the search results page
+            theme: Theme the page belongs to, for emitting URLs as they are found
+
+        Returns:
+            List of wallpaper download URLs
+        """
+        try:
+            return await self._walk_listing_async(
+                client, url, 'search', lambda html: self._parse_search_page(html, url), theme)
+        except Exception as e:
+            logging.error(f"Error processing search page {url}: {e}")
+            return []
+
+    def _parse_search_page(self, html, url=None):
+        """
+        Extract detail page URLs from a search results page.
+
+        Args:
+            html: The markup of the search results page
+            url: The URL of the page, used for logging
+
+        Returns:
+            List of detail page URLs, in page order
+        """
+        detail_urls = []
+        titles = {}
+        soup = self._soup(html, 'search')
+
+        # Look for wallpaper cards/items that contain images
+        wallpaper_items = GRID_LINKS.select(soup)
+        if not wallpaper_items:
+            # Try alternative selectors
+            wallpaper_items = ITEM_LINKS.select(soup)
+        if not wallpaper_items:
+            # Try another approach - look for images inside links
+            soup = self._soup(html, 'search_links')
+            wallpaper_items = [a for a in ANCHORS.select(soup) if a.find('img')]
+
+        logging.debug(f"Found {len(wallpaper_items)} wallpaper items on page: {url}")
+
+        # Process each wallpaper item (_listing_links() applies the limit)
+        for item in wallpaper_items:
+            # Get the detail page URL
+            if not item.has_attr('href'):
+                continue
+
+            detail_url = item['href']
+            if not detail_url.startswith(('http://', 'https://')):
+                detail_url = urljoin(self.BASE_URL, detail_url)
+            detail_urls.append(detail_url)
+
+            img = item.find('img')
+            title = item.get('title') or (img.get('alt') if img else None) or item.get_text(' ', strip=True)
+            if title and detail_url not in titles:
+                titles[detail_url] = title
+
+        self._remember_listing({}, titles)
+        return detail_urls
     
-    def _process_detail_page(self, url):
+    def _detail_options(self, html):
         """
-        Process a wallpaper detail page to find download links.
+        List the download options offered on a wallpaper detail page.
         
         Args:
-            url: The URL of the detail page
+            html: The markup of the detail page
             
         Returns:
-            List of wallpaper download URLs with matching resolution
+            List of Candidate options (width and height 0 when the page does not say)
         """
-        download_links = []
+        soup = self._soup(html, 'detail')
         
-        try:
-            response = self._fetch_with_retry(url)
-            if response is None:
-                return []
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
+        # Look for the high-resolution image and download options
+        wallpaper_options = []
+        
+        # Try to find the main image first
+        main_img = MAIN_IMG.select_one(soup)
+        if not main_img:
+            main_img = WALLPAPER_IMG.select_one(soup)
+        if not main_img:
+            # Try alternative approach - find the largest image on the page
+            all_imgs = IMAGES.select(soup)
+            if all_imgs:
+                # Find images with src attribute
+                imgs_with_src = [img for img in all_imgs if img.has_attr('src')]
+                if imgs_with_src:
+                    # Sort by assumed size (length of src URL often correlates with image size)
+                    imgs_with_src.sort(key=lambda x: len(x['src']), reverse=True)
+                    main_img = imgs_with_src[0]
+        
+        if main_img and main_img.has_attr('src'):
+            img_url = main_img['src']
             
-            # Look for the high-resolution image and download options
-            wallpaper_options = []
+            # Check if the URL is relative or absolute
+            if not img_url.startswith(('http://', 'https://')):
+                img_url = urljoin(self.BASE_URL, img_url)
             
-            # Try to find the main image first
-            main_img = soup.select_one('img.img-wallpaper')
-            if not main_img:
-                main_img = soup.select_one('img#wallpaper')
-            if not main_img:
-                # Try alternative approach - find the largest image on the page
-                all_imgs = soup.select('img')
-                if all_imgs:
-                    # Find images with src attribute
-                    imgs_with_src = [img for img in all_imgs if img.has_attr('src')]
-                    if imgs_with_src:
-                        # Sort by assumed size (length of src URL often correlates with image size)
-                        imgs_with_src.sort(key=lambda x: len(x['src']), reverse=True)
-                        main_img = imgs_with_src[0]
+            # Try to determine resolution from image attributes or URL
+            width = main_img.get('width') or main_img.get('data-width')
+            height = main_img.get('height') or main_img.get('data-height')
             
-            if main_img and main_img.has_attr('src'):
-                img_url = main_img['src']
-                
-                # Check if the URL is relative or absolute
-                if not img_url.startswith(('http://', 'https://')):
-                    img_url = urljoin(self.BASE_URL, img_url)
+            # If no width/height in attributes, try to find it in URL or nearby text
+            if not (width and height):
+                # Try to extract resolution from URL
+                res_match = re.search(r'(\d+)x(\d+)', img_url)
+                if res_match:
+                    width = res_match.group(1)
+                    height = res_match.group(2)
+                    
+            # If we found width and height, use them
+            if width and height:
+                try:
+                    width = int(width)
+                    height = int(height)
+                    
+                    # Add to options with resolution details
+                    wallpaper_options.append(Candidate(img_url, width, height))
+                    logging.debug(f"Found download option: {img_url} ({width}x{height})")
+                except (ValueError, TypeError) as e:
+                    # If we can't parse the resolution, still add the URL
+                    logging.warning(f"Couldn't parse resolution for {img_url}: {e}")
+                    wallpaper_options.append(Candidate(img_url))
+            else:
+                # No resolution info available, assume it matches each target
+                wallpaper_options.append(Candidate(img_url))
+                logging.debug(f"Found download without resolution info: {img_url}")
                 
-                # Try to determine resolution from image attributes or URL
-                width = main_img.get('width') or main_img.get('data-width')
-                height = main_img.get('height') or main_img.get('data-height')
+        # Also look for download links or buttons that might contain high-res images
+        download_buttons = DOWNLOAD_BUTTONS.select(soup)
+        for button in download_buttons:
+            if button.has_attr('href'):
+                dl_url = button['href']
+                if not dl_url.startswith(('http://', 'https://')):
+                    dl_url = urljoin(self.BASE_URL, dl_url)
                 
-                # If no width/height in attributes, try to find it in URL or nearby text
-                if not (width and height):
-                    # Try to extract resolution from URL
-                    res_match = re.search(r'(\d+)x(\d+)', img_url)
-                    if res_match:
-                        width = res_match.group(1)
-                        height = res_match.group(2)
-                        
-                # If we found width and height, use them
-                if width and height:
+                # Try to extract resolution from the link text or URL
+                res_match = None
+                if button.get_text():
+                    res_match = re.search(r'(\d+)\s*[xX]\s*(\d+)', button.get_text())
+                if not res_match:
+                    res_match = re.search(r'(\d+)x(\d+)', dl_url)
+                    
+                if res_match:
                     try:
-                        width = int(width)
-                        height = int(height)
+                        width = int(res_match.group(1))
+                        height = int(res_match.group(2))
                         
-                        # Add to options with resolution details
-                        wallpaper_options.append({
-                            'url': img_url,
-                            'width': width,
-                            'height': height,
-                            'exact_match': width == self.min_width and height == self.min_height
-                        })
-                        logging.debug(f"Found download option: {img_url} ({width}x{height})")
+                        wallpaper_options.append(Candidate(dl_url, width, height))
+                        logging.debug(f"Found download button: {dl_url} ({width}x{height})")
                     except (ValueError, TypeError) as e:
-                        # If we can't parse the resolution, still add the URL
-                        logging.warning(f"Couldn't parse resolution for {img_url}: {e}")
-                        wallpaper_options.append({
-                            'url': img_url,
-                            'width': self.min_width,  # Assume it matches what we searched for
-                            'height': self.min_height,
-                            'exact_match': False
-                        })
-                else:
-                    # No resolution info available, assume it matches our search
-                    wallpaper_options.append({
-                        'url': img_url,
-                        'width': self.min_width,
-                        'height': self.min_height,
-                        'exact_match': False
-                    })
-                    logging.debug(f"Found download without resolution info: {img_url}")
-                    
-            # Also look for download links or buttons that might contain high-res images
-            download_buttons = soup.select('a.download-button, a.btn-download')
-            for button in download_buttons:
-                if button.has_attr('href'):
-                    dl_url = button['href']
-                    if not dl_url.startswith(('http://', 'https://')):
-                        dl_url = urljoin(self.BASE_URL, dl_url)
-                    
-                    # Try to extract resolution from the link text or URL
-                    res_match = None
-                    if button.get_text():
-                        res_match = re.search(r'(\d+)\s*[xX]\s*(\d+)', button.get_text())
-                    if not res_match:
-                        res_match = re.search(r'(\d+)x(\d+)', dl_url)
-                        
-                    if res_match:
-                        try:
-                            width = int(res_match.group(1))
-                            height = int(res_match.group(2))
-                            
-                            wallpaper_options.append({
-                                'url': dl_url,
-                                'width': width,
-                                'height': height,
-                                'exact_match': width == self.min_width and height == self.min_height
-                            })
-                            logging.debug(f"Found download button: {dl_url} ({width}x{height})")
-                        except (ValueError, TypeError) as e:
-                            logging.warning(f"Couldn't parse resolution in button: {e}")
-                    else:
-                        # Add without resolution info
-                        wallpaper_options.append({
-                            'url': dl_url,
-                            'width': self.min_width,  # Assume it matches
-                            'height': self.min_height,
-                            'exact_match': False
-                        })
-            
-            # Process the resolution selection logic
-            if wallpaper_options:
-                # First, check for exact matches
-                exact_matches = [opt for opt in wallpaper_options if opt['exact_match']]
-                if exact_matches:
-                    # Use the first exact match
-                    chosen = exact_matches[0]
-                    download_links.append(chosen['url'])
-                    logging.info(f"Found exact resolution match: {chosen['url']} ({chosen['width']}x{chosen['height']})")
+                        logging.warning(f"Couldn't parse resolution in button: {e}")
                 else:
-                    # No exact match, find the smallest one that's bigger than our minimum
-                    valid_options = [opt for opt in wallpaper_options 
-                                    if opt['width'] >= self.min_width and opt['height'] >= self.min_height]
-                    
-                    if valid_options:
-                        # Sort by resolution area to find the closest one
-                        valid_options.sort(key=lambda x: x['width'] * x['height'])
-                        chosen = valid_options[0]  # Smallest valid resolution
-                        download_links.append(chosen['url'])
-                        logging.info(f"Found next larger resolution: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-                    else:
-                        # If nothing is bigger than what we want, just use the largest available
-                        wallpaper_options.sort(key=lambda x: x['width'] * x['height'], reverse=True)
-                        chosen = wallpaper_options[0]  # Largest resolution
-                        download_links.append(chosen['url'])
-                        logging.info(f"Using largest available resolution: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-            
-        except Exception as e:
-            logging.error(f"Error processing detail page {url}: {e}")
-            
-        return download_links
-    
-    def _fetch_with_retry(self, url):
-        """
-        Fetch a URL with retry logic and exponential backoff.
+                    # Add without resolution info
+                    wallpaper_options.append(Candidate(dl_url))
         
-        Args:
-            url: The URL to fetch
-            
-        Returns:
-            Response object if successful, None otherwise
-        """
-        timeout = CONFIG.get('REQUEST_TIMEOUT', 10)
-        max_retries = CONFIG.get('MAX_RETRIES', 3)
-        retry_delay = CONFIG.get('RETRY_DELAY', 1)
-        
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(url, headers=self.headers, timeout=timeout)
-                
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 429:  # Too Many Requests
-                    # Special handling for rate limiting
-                    logging.warning(f"Rate limited by wallpaperbat.com on attempt {attempt + 1}")
-                    wait_time = retry_delay * (2 ** attempt) + 2  # Add extra time for rate limiting
-                else:
-                    logging.warning(f"HTTP {response.status_code} fetching {url} on attempt {attempt + 1}")
-            except (requests.exceptions.RequestException, IOError) as e:
-                logging.warning(f"Error fetching {url} on attempt {attempt + 1}: {e}")
-                
-            # Apply exponential backoff if this is not the last attempt
-            if attempt < max_retries - 1:
-                wait_time = retry_delay * (2 ** attempt)
-                logging.debug(f"Retrying in {wait_time} seconds")
-                time.sleep(wait_time)
-                
-        logging.error(f"Failed to fetch {url} after {max_retries} attempts")
-        return None
+        return wallpaper_options
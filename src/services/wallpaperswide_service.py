@@ -1,39 +1,37 @@
 """
 Service module for fetching wallpapers from wallpaperswide.com.
 """
-import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+import asyncio
 import re
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import logging
-from src.config import CONFIG, DEFAULT_HEADERS
-import time
+import requests
+from src.config import CONFIG
+from src.html_parser import compile_selector, strainer
+from src.listing_extractor import ListingRule
+from src.pipeline import Candidate
+from src.services.base_service import BaseWallpaperService
+
+WALLPAPER_ITEMS = compile_selector('div.wallpaper')
+ITEMS = compile_selector('div.item')
+IMAGE_LINKS = compile_selector('a.wallpapers-image')
+
+# Detail pages are /<slug>-wallpapers.html, their downloads /download/<slug>-wallpaper-<WxH>.jpg
+DETAIL_SLUG = re.compile(r'/([^/]+)-wallpapers\.html')
 
-class WallpapersWideService:
+class WallpapersWideService(BaseWallpaperService):
     """
     Service for fetching wallpapers from wallpaperswide.com which has a different
     structure than other wallpaper sites and supports direct resolution filtering.
     """
     BASE_URL = "https://wallpaperswide.com"
-
-    def __init__(self, resolution="5120x1440", themes=None):
-        """
-        Initialize the service with the desired resolution and themes.
-        
-        Args:
-            resolution: String with the desired wallpaper resolution (e.g., '5120x1440')
-            themes: List of themes to search for (e.g., ['nature', 'abstract'])
-        """
-        self.resolution = resolution.lower()
-        self.themes = themes or []
-        # Parse resolution for comparison purposes
-        try:
-            self.min_width, self.min_height = map(int, resolution.lower().split('x'))
-        except Exception as e:
-            logging.error(f"Failed to parse resolution '{resolution}': {e}")
-            self.min_width = self.min_height = 0        # Set up headers using centralized configuration
-        self.headers = DEFAULT_HEADERS.copy()
-        self.headers['User-Agent'] = CONFIG['USER_AGENT']
+    SITE_NAME = "wallpaperswide.com"
+    PAGE_STRAINERS = {
+        'theme': strainer(['div', 'a'], ('wallpaper', 'item', 'wallpapers-image')),
+        'detail': SoupStrainer('a', href=True),
+    }
+    LISTING_RULES = {'theme': ListingRule('div', ('wallpaper',))}
 
     def fetch_wallpapers(self, progress_callback=None):
         """
@@ -47,37 +45,21 @@ class WallpapersWideService:
         """
         wallpapers = []
 
-        # This site allows direct resolution filtering via URL
-        resolution_url = f"{self.resolution}-wallpapers-r.html"
-        
         # Process each theme
         for theme in self.themes:
             # Progress: Starting theme
             if progress_callback:
                 progress_callback()
                 
-            theme_urls = []
-            
-            # Try theme-specific page first
-            theme_path = f"{theme}-desktop-wallpapers.html"
-            theme_url = urljoin(self.BASE_URL, theme_path)
-            theme_urls.append(theme_url)
-            
-            # Also try resolution-specific URL with theme
-            # Some sites have URLs like /5120x1440-nature-wallpapers-r.html
-            alt_theme_path = f"{self.resolution}-{theme}-wallpapers-r.html"
-            alt_theme_url = urljoin(self.BASE_URL, alt_theme_path)
-            theme_urls.append(alt_theme_url)
-            
             # Process each URL approach
-            for url in theme_urls:
+            for url in self._theme_urls(theme):
                 # Progress: Trying URL variant
                 if progress_callback:
                     progress_callback()
                     
                 logging.info(f"Fetching theme page: {url}")
                 try:
-                    theme_wallpapers = self._process_theme_page(url)
+                    theme_wallpapers = self._process_theme_page(url, theme=theme)
                     wallpapers.extend(theme_wallpapers)
                     
                     if theme_wallpapers:
@@ -85,161 +67,253 @@ class WallpapersWideService:
                         break  # If we found wallpapers, no need to try alternative URL
                 except Exception as e:
                     logging.error(f"Error processing theme page {url}: {e}")
-                
-                # Delay to avoid overloading the server
-                time.sleep(CONFIG.get('REQUEST_DELAY', 1))
             
             # Progress: Theme completed
             if progress_callback:
                 progress_callback()
         
         # Remove duplicates while preserving order
-        unique_wallpapers = []
-        seen = set()
-        for url in wallpapers:
-            if url not in seen:
-                seen.add(url)
-                unique_wallpapers.append(url)
+        unique_wallpapers = self._unique(wallpapers)
         
         logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallpaperswide.com")
         return unique_wallpapers
+
+    async def fetch_wallpapers_async(self, client, progress_callback=None):
+        """
+        Fetch wallpaper download URLs by theme and resolution on the event loop.
+        Themes run concurrently; each theme still tries its URL variants in order.
+
+        Args:
+            client: AsyncHttpClient shared by every service on the event loop
+            progress_callback: Optional callback function to report progress
+
+        Returns:
+            List of wallpaper download URLs matching the requested criteria.
+        """
+        async def fetch_theme(theme):
+            # Progress: Starting theme
+            if progress_callback:
+                progress_callback()
+            theme_wallpapers = []
+            for url in self._theme_urls(theme):
+                # Progress: Trying URL variant
+                if progress_callback:
+                    progress_callback()
+                logging.info(f"Fetching theme page: {url}")
+                theme_wallpapers = await self._process_theme_page_async(client, url, theme)
+                if theme_wallpapers:
+                    logging.info(f"Found {len(theme_wallpapers)} wallpapers for {theme} using {url}")
+                    break  # If we found wallpapers, no need to try alternative URL
+            # Progress: Theme completed
+            if progress_callback:
+                progress_callback()
+            return theme_wallpapers
+
+        results = await asyncio.gather(*(fetch_theme(theme) for theme in self.themes))
+        unique_wallpapers = self._unique(url for urls in results for url in urls)
+
+        logging.info(f"Found {len(unique_wallpapers)} unique wallpapers from wallpaperswide.com")
+        return unique_wallpapers
+
+    def _theme_urls(self, theme):
+        """
+        Build the theme page URLs to try, in order of preference.
+
+        Args:
+            theme: The theme to search for
+
+        Returns:
+            List of theme page URLs
+        """
+        theme_urls = []
+
+        # Try theme-specific page first
+        theme_path = f"{theme}-desktop-wallpapers.html"
+        theme_urls.append(urljoin(self.BASE_URL, theme_path))
+
+        # Also try resolution-specific URL with theme
+        # Some sites have URLs like /5120x1440-nature-wallpapers-r.html
+        alt_theme_path = f"{self.resolution}-{theme}-wallpapers-r.html"
+        theme_urls.append(urljoin(self.BASE_URL, alt_theme_path))
+        return theme_urls
     
-    def _process_theme_page(self, url, progress_callback=None):
+    def _page_url(self, url, number):
+        """Theme pages continue at <theme page without .html>/page/<number>."""
+        if number == 1:
+            return url
+        base = url[:-len('.html')] if url.endswith('.html') else url
+        return f"{base}/page/{number}"
+
+    def _process_theme_page(self, url, progress_callback=None, theme=None):
         """
         Process a theme page to find wallpaper detail pages.
         
         Args:
             url: The URL of the theme page
             progress_callback: Optional callback function to report progress
+            theme: Theme the page belongs to, for emitting URLs as they are found
             
         Returns:
             List of wallpaper download URLs
         """
         wallpapers = []
         try:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Try different selectors to find wallpaper containers
-                wallpaper_items = soup.select('div.wallpaper')  # Primary selector
-                if not wallpaper_items:
-                    # Try alternative selectors
-                    wallpaper_items = soup.select('div.item')
-                    if not wallpaper_items:
-                        wallpaper_items = soup.select('a.wallpapers-image')
-                
-                # Process each wallpaper up to the maximum
-                max_items = CONFIG.get('MAX_ITEMS_PER_THEME', 10)
-                for i, item in enumerate(wallpaper_items[:max_items]):
-                    try:
-                        # Get the detail page URL
-                        detail_url = None
-                        link = item.find('a')
-                        if link and link.has_attr('href'):
-                            detail_url = link['href']
-                        
-                        if detail_url:
-                            if not detail_url.startswith(('http://', 'https://')):
-                                detail_url = urljoin(self.BASE_URL, detail_url)
-                            
-                            # Get download links from the detail page
-                            download_urls = self._process_detail_page(detail_url)
-                            wallpapers.extend(download_urls)
-                            
-                            # Update progress after each wallpaper
-                            if progress_callback:
-                                progress_callback()
-                            
-                            # Add delay between requests
-                            time.sleep(CONFIG.get('REQUEST_DELAY', 1))
-                            
-                    except Exception as e:
-                        logging.error(f"Error processing wallpaper item: {e}")
-                        continue
+            # Get download links from the detail pages, result page by result page
+            wallpapers.extend(self._walk_listing(url, 'theme', self._parse_theme_page, progress_callback, theme))
                         
         except Exception as e:
             logging.error(f"Error processing theme page {url}: {e}")
             
         return wallpapers
+
+    async def _process_theme_page_async(self, client, url, theme=None):
+        """
+        Asyncio counterpart of _process_theme_page().
+
+        Args:
+            client: AsyncHttpClient used for the requests
+            url: The URL of the theme page
+            theme: Theme the page belongs to, for emitting URLs as they are found
+
+        Returns:
+            List of wallpaper download URLs
+        """
+        try:
+            return await self._walk_listing_async(client, url, 'theme', self._parse_theme_page, theme)
+        except Exception as e:
+            logging.error(f"Error processing theme page {url}: {e}")
+            return []
+
+    def _parse_theme_page(self, html):
+        """
+        Extract detail page URLs from a theme page.
+
+        Args:
+            html: The markup of the theme page
+
+        Returns:
+            List of detail page URLs, in page order
+        """
+        detail_urls = []
+        soup = self._soup(html, 'theme')
+
+        # Try different selectors to find wallpaper containers
+        wallpaper_items = WALLPAPER_ITEMS.select(soup)  # Primary selector
+        if not wallpaper_items:
+            # Try alternative selectors
+            wallpaper_items = ITEMS.select(soup)
+            if not wallpaper_items:
+                wallpaper_items = IMAGE_LINKS.select(soup)
+
+        # Process each wallpaper (_listing_links() applies the limit)
+        for item in wallpaper_items:
+            # Get the detail page URL
+            link = item.find('a')
+            if link and link.has_attr('href'):
+                detail_url = link['href']
+                if not detail_url.startswith(('http://', 'https://')):
+                    detail_url = urljoin(self.BASE_URL, detail_url)
+                detail_urls.append(detail_url)
+
+        return detail_urls
     
-    def _process_detail_page(self, url):
+    def _synthesized_downloads(self, url):
         """
-        Process a wallpaper detail page to find download links.
-        
+        Derive the download URL of every target resolution from a detail page URL.
+
         Args:
             url: The URL of the detail page
-            
+
         Returns:
-            List of wallpaper download URLs with matching resolution
+            dict mapping target resolution to Candidate, or None if the URL does not follow the usual scheme
         """
-        download_links = []
-        timeout = CONFIG.get('REQUEST_TIMEOUT', 10)
+        if not CONFIG.get('WALLPAPERSWIDE_PROBE_DOWNLOADS', True):
+            return None
+        slug = DETAIL_SLUG.fullmatch(urlparse(url).path)
+        if not slug or not all(width and height for _, width, height in self.targets):
+            return None
+        return {
+            res: Candidate(
+                urljoin(self.BASE_URL, f"/download/{slug.group(1)}-wallpaper-{res}.jpg"),
+                width, height, detail_url=url, site=self.SITE_NAME)
+            for res, width, height in self.targets}
+
+    @staticmethod
+    def _is_image(status, content_type):
+        # A missing size redirects to an HTML page rather than failing outright
+        return status == 200 and (not content_type or content_type.startswith('image/'))
+
+    def _detail_without_page(self, url):
+        """
+        Check the derived download URLs with HEAD requests instead of fetching
+        the detail page; any miss falls back to the page, which also offers the
+        next larger sizes.
+        """
+        found = self._synthesized_downloads(url)
+        if found is None:
+            return None
+        for candidate in found.values():
+            try:
+                response = self.http.head(
+                    candidate.download_url, headers=self.headers,
+                    timeout=CONFIG.get('REQUEST_TIMEOUT', 10), allow_redirects=True)
+            except (requests.exceptions.RequestException, IOError) as e:
+                logging.debug(f"HEAD {candidate.download_url} failed: {e}")
+                return None
+            if not self._is_image(response.status_code, response.headers.get('Content-Type', '')):
+                logging.debug(f"{candidate.download_url} is not available, fetching {url}")
+                return None
+        return found
+
+    async def _detail_without_page_async(self, client, url):
+        """Asyncio counterpart of _detail_without_page()."""
+        found = self._synthesized_downloads(url)
+        if found is None:
+            return None
+        for candidate in found.values():
+            answer = await client.head(candidate.download_url, headers=self.headers)
+            if answer is None or not self._is_image(*answer):
+                logging.debug(f"{candidate.download_url} is not available, fetching {url}")
+                return None
+        return found
+
+    def _detail_options(self, html):
+        """
+        List the download options offered on a wallpaper detail page.
         
-        try:
-            resp = requests.get(url, headers=self.headers, timeout=timeout)
-            if resp.status_code != 200:
-                logging.warning(f"Failed to fetch detail page {url}, status {resp.status_code}")
-                return []
-            
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # Look for download links with resolution information
-            # WallpapersWide typically has direct download links with resolution in the text
-            all_links = soup.find_all('a', href=True)
+        Args:
+            html: The markup of the detail page
             
-            # Store all wallpaper options with their resolutions
-            wallpaper_options = []
+        Returns:
+            List of Candidate options (width and height 0 when the page does not say)
+        """
+        soup = self._soup(html, 'detail')
+        
+        # Look for download links with resolution information
+        # WallpapersWide typically has direct download links with resolution in the text
+        all_links = soup.find_all('a', href=True)
+        
+        # Store all wallpaper options with their resolutions
+        wallpaper_options = []
+        
+        for link in all_links:
+            href = link.get('href', '')
+            text = link.get_text().strip()
             
-            for link in all_links:
-                href = link.get('href', '')
-                text = link.get_text().strip()
+            # Check for links containing "/download/" and our desired resolution
+            if '/download/' in href and href.endswith(('.jpg', '.png', '.jpeg')):
+                resolution_match = re.search(r'(\d+)x(\d+)', href) or re.search(r'(\d+)\s*[xX]\s*(\d+)', text)
                 
-                # Check for links containing "/download/" and our desired resolution
-                if '/download/' in href and href.endswith(('.jpg', '.png', '.jpeg')):
-                    resolution_match = re.search(r'(\d+)x(\d+)', href) or re.search(r'(\d+)\s*[xX]\s*(\d+)', text)
-                    
-                    if resolution_match:
-                        try:
-                            width = int(resolution_match.group(1))
-                            height = int(resolution_match.group(2))
-                            download_url = urljoin(self.BASE_URL, href)
-                            
-                            # Add to options list with resolution details
-                            wallpaper_options.append({
-                                'url': download_url,
-                                'width': width,
-                                'height': height,
-                                'exact_match': width == self.min_width and height == self.min_height
-                            })
-                            logging.debug(f"Found download option: {download_url} ({width}x{height})")
-                        except (ValueError, IndexError) as e:
-                            logging.warning(f"Failed to parse resolution in '{text}' or '{href}': {e}")
-            
-            # Process the resolution selection logic
-            if wallpaper_options:
-                # First, check for exact match
-                exact_matches = [opt for opt in wallpaper_options if opt['exact_match']]
-                if exact_matches:
-                    # Exactly one match with our desired resolution, use it
-                    chosen = exact_matches[0]
-                    download_links.append(chosen['url'])
-                    logging.debug(f"Found exact resolution match: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-                else:
-                    # No exact match, find the smallest one that's bigger than our minimum
-                    valid_options = [opt for opt in wallpaper_options 
-                                    if opt['width'] >= self.min_width and opt['height'] >= self.min_height]
-                    
-                    if valid_options:
-                        # Sort by resolution area (width * height) to find the closest one
-                        valid_options.sort(key=lambda x: x['width'] * x['height'])
-                        chosen = valid_options[0]  # Smallest valid resolution
-                        download_links.append(chosen['url'])
-                        logging.debug(f"Found next larger resolution: {chosen['url']} ({chosen['width']}x{chosen['height']})")
-                    else:
-                        logging.debug(f"No suitable resolution found that meets {self.min_width}x{self.min_height}")
-            
-        except Exception as e:
-            logging.error(f"Error processing detail page {url}: {e}")
+                if resolution_match:
+                    try:
+                        width = int(resolution_match.group(1))
+                        height = int(resolution_match.group(2))
+                        download_url = urljoin(self.BASE_URL, href)
+                        
+                        # Add to options list with resolution details
+                        wallpaper_options.append(Candidate(download_url, width, height))
+                        logging.debug(f"Found download option: {download_url} ({width}x{height})")
+                    except (ValueError, IndexError) as e:
+                        logging.warning(f"Failed to parse resolution in '{text}' or '{href}': {e}")
         
-        return download_links
+        return wallpaper_options
@@ -0,0 +1,98 @@
+"""
+theme_index.py
+
+Inverted index from words to the items of a shared listing.
+A listing that is not specific to one theme (such as a site's ultrawide
+collection) is fetched once per run; every item is indexed by the words of its
+URL slugs and title, and each theme is then matched with a few set lookups
+instead of scanning the whole listing once per theme. A query word matches
+every indexed word it starts, so 'mountain' finds 'mountains' and 'sun' finds
+'sunset', and a theme of several words needs all of them.
+"""
+
+import bisect
+import re
+from typing import Dict, Generic, Iterator, List, Set, TypeVar
+
+T = TypeVar('T')
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower-case words; URL punctuation, dashes and spaces all separate words.
+
+    Args:
+        text: A title, theme or URL
+
+    Returns:
+        List of words, in order
+    """
+    return _WORD.findall(text.lower()) if text else []
+
+
+class ThemeIndex(Generic[T]):
+    """
+    Items of a listing indexed by the words describing them.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._items: List[T] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._vocabulary: List[str] = []  # Sorted words, rebuilt lazily after add()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def add(self, item: T, *texts: str) -> None:
+        """
+        Index an item under the words of the given texts.
+
+        Args:
+            item: The item returned by match()
+            *texts: URLs, titles or other text describing the item
+        """
+        position = len(self._items)
+        self._items.append(item)
+        for text in texts:
+            for word in tokenize(text):
+                self._postings.setdefault(word, set()).add(position)
+        self._vocabulary = []
+
+    def match(self, query: str) -> List[T]:
+        """
+        Return the items described by every word of a query.
+
+        Args:
+            query: A theme such as 'mountain lake'
+
+        Returns:
+            List of matching items in the order they were added; empty for a query without words
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        matches = None
+        for word in words:
+            positions = self._prefix_postings(word)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return [self._items[position] for position in sorted(matches)]
+
+    def _prefix_postings(self, prefix: str) -> Set[int]:
+        """Positions of the items with a word starting with prefix."""
+        if not self._vocabulary and self._postings:
+            self._vocabulary = sorted(self._postings)
+        positions: Set[int] = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            positions |= self._postings[word]
+        return positions
@@ -3,6 +3,9 @@ Enhanced error handling and logging utilities for WallpaperScraper.
 Provides custom exceptions, retry decorators, and structured logging.
 """
 
+from __future__ import annotations  # tuple[int, int] annotations on Python 3.8
+
+import asyncio
 import logging
 import functools
 import time
@@ -27,6 +30,11 @@ class ResolutionError(WallpaperScraperError):
     pass
 
 
+class UndersizedImageError(ResolutionError):
+    """An image header showed dimensions below the target resolution."""
+    pass
+
+
 class ServiceError(WallpaperScraperError):
     """Service-specific errors (site parsing, API issues, etc.)."""
     pass
@@ -37,6 +45,11 @@ class ConfigurationError(WallpaperScraperError):
     pass
 
 
+class DownloadTooLargeError(WallpaperScraperError):
+    """An image download exceeded the configured size limit."""
+    pass
+
+
 def retry_on_exception(
     max_retries: int = 3,
     delay: float = 1.0,
@@ -93,6 +106,23 @@ def log_execution_time(func: Callable) -> Callable:
     return wrapper
 
 
+async def to_thread(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call in the default executor and await its result, like
+    asyncio.to_thread(), which only exists from Python 3.9.
+
+    Args:
+        func: The blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        What func returned
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
 def setup_enhanced_logging(
     log_level: str = 'INFO',
     log_file: Optional[Path] = None,
@@ -11,8 +11,7 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import re
-import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 import logging
 import time
 from urllib.parse import urljoin
@@ -21,6 +20,8 @@ from tqdm import tqdm
 import datetime
 
 from src.config import CONFIG
+from src.html_parser import parse_html, strainer
+from src.http_client import HttpClient
 from src.services.wallpaperswide_service import WallpapersWideService
 from src.services.wallhaven_service import WallhavenService
 from src.services.wallpaperbat_service import WallpaperBatService
@@ -39,9 +40,12 @@ class WallpaperScout:
     Generates a markdown report for user configuration.
     """
 
-    def __init__(self):
+    def __init__(self, http_client=None):
         """
         Initialize the scout with HTTP headers and config values.
+
+        Args:
+            http_client: Optional shared HttpClient providing pooled sessions
         """
         self.headers = {
             'User-Agent': CONFIG['USER_AGENT'],
@@ -53,6 +57,8 @@ class WallpaperScout:
         self.retry_delay = CONFIG['RETRY_DELAY']
         self.max_retries = CONFIG['MAX_RETRIES']
         self.output_file = "SITES.md"
+        # The three sites are scouted in parallel, one worker each
+        self.http = http_client or HttpClient(pool_size=3)
 
     def _fetch_with_retry(self, url):
         """
@@ -60,7 +66,7 @@ class WallpaperScout:
         """
         for attempt in range(self.max_retries):
             try:
-                resp = requests.get(
+                resp = self.http.get(
                     url, headers=self.headers, timeout=self.timeout)
                 if resp.status_code == 200:
                     return resp
@@ -94,7 +100,7 @@ class WallpaperScout:
         if not resp:
             return site_info
 
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        soup = parse_html(resp.text, strainer('div', ('wallpapers-menu-items', 'resolutions')))
 
         # Extract categories
         menu_items = soup.select('div.wallpapers-menu-items a')
@@ -155,7 +161,7 @@ class WallpaperScout:
         if not resp:
             return site_info
 
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        soup = parse_html(resp.text, strainer('a', 'tag'))
 
         # Extract popular tags which make good themes
         tag_items = soup.select('a.tag')
@@ -168,7 +174,7 @@ class WallpaperScout:
         search_url = urljoin(site_info['url'], '/search')
         resp = self._fetch_with_retry(search_url)
         if resp:
-            soup = BeautifulSoup(resp.text, 'html.parser')
+            soup = parse_html(resp.text, SoupStrainer('select', attrs={'name': 'resolutions'}))
             resolution_options = soup.select(
                 'select[name="resolutions"] option')
             for option in resolution_options:
@@ -209,7 +215,7 @@ class WallpaperScout:
         if not resp:
             return site_info
 
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        soup = parse_html(resp.text, SoupStrainer('a'))
 
         # Extract categories which can be used as themes
         menu_items = soup.select('a.nav-link')
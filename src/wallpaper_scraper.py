@@ -5,66 +5,35 @@ Main orchestration module for downloading ultra-high-resolution wallpapers from
 Handles configuration, parallel downloads, resolution verification, and logging.
 """
 
+from __future__ import annotations  # main()'s annotations use list[str] and str | list[str]
+
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
 import requests
 from tqdm import tqdm
 import logging
+import sqlite3
 import time
 import sys
-from PIL import Image  # For checking image dimensions
 
 from src.config import CONFIG, PROGRESS_BAR_CONFIG
+from src.download_manifest import DownloadManifest
+from src.download_writer import RESUMABLE_STATUSES, PartFileWriter
+from src.http_cache import HttpCache
+from src.http_client import HttpClient, get_default_client
+from src.library_index import get_library_index
+from src.near_duplicates import NearDuplicateIndex, collapse_near_duplicates
+from src.pipeline import DownloadTarget, ThemeBudget
+from src.resolution_cache import ResolutionCache
+from src.resolution_match import count_codes, evaluate_batch, evaluate_resolution_match
 from src.services.wallpaperswide_service import WallpapersWideService
 from src.services.wallhaven_service import WallhavenService
 from src.services.wallpaperbat_service import WallpaperBatService
-
-
-def evaluate_resolution_match(width, height, target_width, target_height):
-    """
-    Evaluate how well an image matches the desired resolution.
-    Returns a match code (0-3) for filtering and quality ranking.
-
-    Args:
-        width (int): Actual width of the image
-        height (int): Actual height of the image
-        target_width (int): Desired width
-        target_height (int): Desired height
-
-    Returns:
-        int: Match code indicating the quality of the resolution match:
-            3 - Exact match (perfect)
-            2 - Greater resolution with similar aspect ratio (good)
-            1 - Greater resolution with any aspect ratio (acceptable)
-            0 - Smaller resolution (unacceptable)
-    """
-    # Calculate aspect ratios (with a small epsilon to avoid division by zero)
-    epsilon = 0.0001
-    target_ratio = target_width / max(target_height, epsilon)
-    actual_ratio = width / max(height, epsilon)
-
-    # Check for exact match (allowing a small 5% tolerance)
-    width_match = 0.95 <= width / target_width <= 1.05
-    height_match = 0.95 <= height / target_height <= 1.05
-    if width_match and height_match:
-        return 3  # Exact match
-
-    # Check if greater resolution with similar aspect ratio
-    # Aspect ratio within 10% of target is considered similar
-    ratio_match = 0.9 <= (actual_ratio / target_ratio) <= 1.1
-    greater_res = width >= target_width and height >= target_height
-    if greater_res and ratio_match:
-        return 2  # Greater resolution with similar aspect ratio
-
-    # Check if any greater resolution
-    if width >= target_width and height >= target_height:
-        return 1  # Greater resolution but aspect ratio differs
-
-    # Smaller resolution
-    return 0  # Unacceptable
+from src.utils import DownloadTooLargeError, UndersizedImageError
 
 
 def check_image_resolution(filepath, min_width, min_height):
@@ -85,20 +54,85 @@ def check_image_resolution(filepath, min_width, min_height):
             - 1: Greater resolution with any aspect ratio
             - 0: Smaller resolution (unacceptable)
     """
-    try:
-        with Image.open(filepath) as img:
-            width, height = img.size
+    # Dimensions come from the library index; the file is only opened when it changed
+    size = get_library_index().dimensions(filepath)
+    if size is None:
+        logging.error(f"Error checking image resolution for {filepath}")
+        return (False, 0, 0, 0)
+    width, height = size
 
-            # Calculate how well the image matches our requirements
-            match_code = evaluate_resolution_match(
-                width, height, min_width, min_height)
+    # Calculate how well the image matches our requirements
+    match_code = evaluate_resolution_match(
+        width, height, min_width, min_height)
 
-            # Return whether it meets any of our acceptance criteria
-            meets_requirement = match_code > 0
-            return (meets_requirement, width, height, match_code)
-    except Exception as e:
-        logging.error(f"Error checking image resolution for {filepath}: {e}")
-        return (False, 0, 0, 0)
+    # Return whether it meets any of our acceptance criteria
+    meets_requirement = match_code > 0
+    return (meets_requirement, width, height, match_code)
+
+
+def check_existing_download(url, filepath, min_width, min_height, manifest=None, site=None):
+    """
+    Check the resolution of an already downloaded wallpaper.
+    With a manifest, an unchanged file is answered from its recorded dimensions
+    without opening it; otherwise the image is checked and the result recorded.
+
+    Args:
+        url (str): Source URL of the wallpaper
+        filepath (str): Local path the URL is saved to
+        min_width (int): Minimum required width in pixels
+        min_height (int): Minimum required height in pixels
+        manifest (DownloadManifest): Optional manifest of earlier downloads
+        site (str): Site the wallpaper was found on, recorded in the manifest
+
+    Returns:
+        tuple: Same as check_image_resolution(), or None if the file does not exist
+    """
+    entry = manifest.lookup(url) if manifest is not None else None
+    if entry is not None:
+        match_code = evaluate_resolution_match(entry.width, entry.height, min_width, min_height)
+        return (match_code > 0, entry.width, entry.height, match_code)
+    if not os.path.exists(filepath):
+        return None
+
+    result = check_image_resolution(filepath, min_width, min_height)
+    meets_req, width, height, match_code = result
+    if manifest is not None and width and height:
+        manifest.record(
+            url, filepath, width, height, match_code, f"{min_width}x{min_height}", site)
+    return result
+
+
+def header_size_check(min_width, min_height):
+    """
+    Return the accept_size callable for PartFileWriter that aborts undersized
+    images as soon as their header has been read.
+
+    Args:
+        min_width (int): Minimum required width in pixels
+        min_height (int): Minimum required height in pixels
+
+    Returns:
+        Callable(width, height) -> bool, or None when there is no minimum resolution
+    """
+    if min_width <= 0 or min_height <= 0:
+        return None
+    return lambda width, height: evaluate_resolution_match(width, height, min_width, min_height) > 0
+
+
+def record_download(
+        manifest, url, filepath, width, height, match_code, min_width, min_height,
+        site=None, sha256=None):
+    """
+    Record a finished download in the manifest, if there is one.
+    A download whose SHA-256 matches a file already in the folder is first
+    collapsed onto that file (hardlinked or dropped, see DUPLICATE_ACTION).
+    """
+    if manifest is None:
+        return
+    if sha256:
+        filepath = manifest.deduplicate(url, filepath, sha256)
+    manifest.record(
+        url, filepath, width, height, match_code, f"{min_width}x{min_height}", site, sha256)
 
 
 def download_image(
@@ -109,9 +143,18 @@ def download_image(
         delay,
         headers,
         min_width=0,
-        min_height=0):
+        min_height=0,
+        http_client=None,
+        max_bytes=None,
+        manifest=None,
+        site=None,
+        existing_checked=False):
     """
     Download a single image with retry logic, resolution check, and logging.
+    The body is streamed in chunks to a '.part' file that replaces the final
+    path only once it is complete; an image whose header shows it is too small
+    is aborted before anything is written, and a broken transfer is resumed
+    from where it stopped when the server supports ranges.
     Returns True if successful or already exists with correct resolution.
 
     Args:
@@ -123,22 +166,25 @@ def download_image(
         headers (dict): HTTP headers to use for the request
         min_width (int): Minimum required width in pixels
         min_height (int): Minimum required height in pixels
+        http_client (HttpClient): Optional shared client providing pooled sessions
+        max_bytes (int): Abort images larger than this (defaults to CONFIG['MAX_IMAGE_MB'], 0 = no limit)
+        manifest (DownloadManifest): Optional manifest used for the existing-file check and updated on success
+        site (str): Site the wallpaper was found on, recorded in the manifest
+        existing_checked (bool): The caller already found any existing file lacking
+            (existing_download_ok()), so it is replaced without being checked again
 
     Returns:
         bool: True if download was successful or file already exists with correct resolution, False otherwise
     """
-    # Extract filename from URL and sanitize it
-    filename = os.path.basename(url)
-    # Replace any potentially problematic characters
-    filename = filename.replace("?", "_").replace("&", "_")
-
-    filepath = os.path.join(output_folder, filename)
+    filepath = image_path_for_url(url, output_folder)
+    filename = os.path.basename(filepath)
+    http_client = http_client or get_default_client()
 
     # Check if file already exists and has the correct resolution
-    if os.path.exists(filepath):
+    if not existing_checked and os.path.exists(filepath):
         if min_width > 0 and min_height > 0:
-            meets_req, width, height, match_code = check_image_resolution(
-                filepath, min_width, min_height)
+            meets_req, width, height, match_code = check_existing_download(
+                url, filepath, min_width, min_height, manifest, site)
             if meets_req:
                 match_type = {
                     3: "exact match",
@@ -156,15 +202,27 @@ def download_image(
                 f"Skipping download of {filename} as it already exists (resolution not checked)")
             return True
 
+    # Abort undersized images as soon as their header has been read
+    accept_size = header_size_check(min_width, min_height)
+
     for attempt in range(1, retries + 1):
         try:
             logging.debug(f"Downloading {url} (attempt {attempt}/{retries})")
-            response = requests.get(url, timeout=timeout, headers=headers)
-
-            if response.status_code == 200:
-                # Save the file
-                with open(filepath, "wb") as f:
-                    f.write(response.content)
+            # A partial file from an earlier attempt is resumed with a Range request
+            writer = PartFileWriter(filepath, max_bytes, accept_size)
+            # Image downloads are not paced by the page-request rate limiter
+            response = http_client.get(
+                url, rate_limit=False, timeout=timeout,
+                headers={**(headers or {}), **writer.request_headers()}, stream=True)
+
+            if response.status_code in RESUMABLE_STATUSES:
+                # Stream the body to a .part file and move it into place once complete
+                with response, writer:
+                    writer.begin(response.status_code, response.headers)
+                    for chunk in response.iter_content(chunk_size=CONFIG.get("DOWNLOAD_CHUNK_SIZE", 65536)):
+                        if chunk:
+                            writer.write(chunk)
+                    writer.commit()
 
                 # Verify the downloaded image has the correct resolution
                 if min_width > 0 and min_height > 0:
@@ -177,6 +235,9 @@ def download_image(
                             1: "larger resolution"}
                         logging.debug(
                             f"Successfully downloaded {url} to {filepath} with resolution ({width}x{height}), {match_type.get(match_code, 'acceptable')} for target {min_width}x{min_height}")
+                        record_download(
+                            manifest, url, filepath, width, height, match_code, min_width, min_height,
+                            site, writer.sha256)
                         return True
                     else:
                         logging.warning(
@@ -195,9 +256,17 @@ def download_image(
                         f"Successfully downloaded {url} to {filepath}")
                     return True
             else:
+                response.close()
                 logging.debug(
                     f"Failed to download {url}: HTTP {response.status_code}")
 
+        except DownloadTooLargeError as e:
+            logging.warning(f"Skipping {url}: {e}")
+            return False
+        except UndersizedImageError as e:
+            logging.info(
+                f"Aborted {filename}: {e}, expected at least {min_width}x{min_height}")
+            return False
         except requests.exceptions.Timeout:
             logging.debug(f"Timeout downloading {url}")
         except requests.exceptions.ConnectionError:
@@ -217,13 +286,15 @@ def download_image(
 
 def main(
     themes: list[str],
-    resolution: str = None,
+    resolution: str | list[str] = None,
     sites: list[str] = None,
     max_downloads: int = None,
     output_dir: str = None,
     workers: int = None,
     timeout: int = None,
     dry_run: bool = False,
+    engine: str = None,
+    use_cache: bool = None,
     **kwargs
 ):
     """
@@ -232,13 +303,16 @@ def main(
     
     Args:
         themes: List of themes to search for
-        resolution: Target resolution (e.g., '5120x1440')
+        resolution: Target resolution (e.g., '5120x1440'), or several as a list or comma-separated
+            string; one crawl serves them all and each gets its own subfolder of the output directory
         sites: List of specific sites to scrape (defaults to all enabled)
         max_downloads: Maximum downloads per theme
         output_dir: Custom output directory
-        workers: Number of parallel workers
+        workers: Number of parallel workers (also sizes the per-host connection pools)
         timeout: Request timeout in seconds
         dry_run: If True, show what would be downloaded without downloading
+        engine: Execution engine, 'threads' (default) or 'async'
+        use_cache: Use the on-disk page and detail-page caches (defaults to CONFIG['HTTP_CACHE_ENABLED'])
     """
     # Import enhanced utilities
     from src.utils import validate_resolution
@@ -254,10 +328,15 @@ def main(
         workers = CONFIG.get("MAX_WORKERS", 4)
     if not timeout:
         timeout = CONFIG.get("REQUEST_TIMEOUT", 30)
+    if not engine:
+        engine = CONFIG.get("ENGINE", "threads")
+    if use_cache is None:
+        use_cache = CONFIG.get("HTTP_CACHE_ENABLED", True)
     
     # Validate resolution format
+    resolutions = split_resolutions(resolution)
     try:
-        min_width, min_height = validate_resolution(resolution)
+        sizes = [validate_resolution(res) for res in resolutions]
     except Exception as e:
         logging.error(f"Invalid resolution: {e}")
         return
@@ -267,10 +346,11 @@ def main(
         logging.error("No themes provided. Please specify at least one theme.")
         return
 
-    logging.info(f"Starting wallpaper scraper with resolution {resolution}")
+    logging.info(f"Starting wallpaper scraper with resolution {', '.join(resolutions)}")
     logging.info(f"Themes: {', '.join(themes)}")
     logging.info(f"Sites: {', '.join(sites)}")
     logging.info(f"Max downloads per theme: {max_downloads}")
+    logging.info(f"Engine: {engine}")
     if dry_run:
         logging.info("DRY RUN MODE: No files will be downloaded")
 
@@ -280,9 +360,11 @@ def main(
     else:
         output_folder = CONFIG["OUTPUT_FOLDER"]
     
+    targets = make_download_targets(resolutions, sizes, output_folder, max_downloads)
     if not dry_run:
-        os.makedirs(output_folder, exist_ok=True)
-        logging.info(f"Output directory: {output_folder}")
+        for target in targets:
+            os.makedirs(target.output_folder, exist_ok=True)
+            logging.info(f"Output directory for {target.resolution}: {target.output_folder}")
 
     temp_folder = CONFIG.get("TEMP_FOLDER", os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp"))
     if not dry_run:
@@ -309,112 +391,184 @@ def main(
     
     logging.info(f"Scraping from {len(available_sites)} sites: {', '.join(available_sites)}")
 
-    # Collect wallpaper URLs from all configured services in parallel, with progress bars
-    all_urls = []
-    scrape_futures = []
-    scrape_progress = {}
-    scrape_bars = {}
-    
-    # Prepare progress bars for each site
-    for site in available_sites:
-        if site in service_classes:
-            # Calculate total steps for each site based on their process:
-            if site == 'wallpaperbat.com':
-                # For each theme:
-                # 1. Start theme
-                # 2. Process theme search
-                # 3. Start ultrawide search (for 5120x1440)
-                # 4. Process ultrawide results (for 5120x1440)
-                # 5. Theme completion
-                steps_per_theme = 3  # base steps
-                if resolution == '5120x1440':
-                    steps_per_theme += 2  # extra steps for ultrawide search
-                total_steps = len(themes) * steps_per_theme
-            elif site == 'wallpaperswide.com':
-                # For each theme:
-                # 1. Start theme
-                # 2. Try first URL variant
-                # 3. Try second URL variant (if needed)
-                # 4. Theme completion
-                total_steps = len(themes) * 4
-            else:  # wallhaven.cc and others
-                # For each theme:
-                # 1. Start theme search
-                # 2. Process results
-                # 3. Theme completion
-                total_steps = len(themes) * 3
-            
-            scrape_bars[site] = tqdm(
-                total=total_steps, 
-                desc=f"Scraping {site}", 
-                position=len(scrape_bars), 
-                **PROGRESS_BAR_CONFIG
-            )
-            scrape_progress[site] = 0
-    def make_progress_callback(site):
-        def progress_cb():
-            scrape_bars[site].update(1)
-        return progress_cb
-    with ThreadPoolExecutor(max_workers=workers) as scrape_executor:
-        for site in available_sites:
-            if site in service_classes:
-                logging.info(f"Submitting scrape for site: {site}")
-                service_class = service_classes[site]
-                service = service_class(
-                    resolution=resolution,
-                    themes=themes
-                )
-                # Pass a progress callback to the service
-                scrape_futures.append(
-                    scrape_executor.submit(
-                        lambda svc=service, s=site: (s, svc.fetch_wallpapers(progress_callback=make_progress_callback(s)))
-                    )
-                )
-            else:
-                logging.warning(f"No service implemented for site: {site}")
-        for future in as_completed(scrape_futures):
-            try:
-                site, site_urls = future.result()
-                logging.info(f"Found {len(site_urls)} wallpapers from {site}")
-                all_urls.extend(site_urls)
-            except Exception as e:
-                logging.error(f"Error processing site in parallel: {e}")
-    # Close all progress bars
-    for bar in scrape_bars.values():
-        bar.close()
-
-    # Remove duplicate URLs while preserving order
-    unique_urls = []
-    seen = set()
-    for url in all_urls:
-        if url not in seen:
-            seen.add(url)
-            unique_urls.append(url)
-
-    logging.info(f"Found {len(all_urls)} total wallpapers, {len(unique_urls)} unique")
-    
-    # Limit URLs per theme if max_downloads is specified
-    if max_downloads and len(unique_urls) > max_downloads * len(themes):
-        limited_urls = unique_urls[:max_downloads * len(themes)]
-        logging.info(f"Limiting to {len(limited_urls)} wallpapers ({max_downloads} per theme)")
-        unique_urls = limited_urls
-
-    # Skip download if no wallpapers found
-    if not unique_urls:
-        logging.warning(
-            "No wallpapers found. Check your configuration or network connection.")
-        return
+    page_cache = open_page_cache() if use_cache else None
+    resolution_cache = open_resolution_cache() if use_cache else None
+    if not dry_run and CONFIG.get("DOWNLOAD_MANIFEST", True):
+        for target in targets:
+            target.manifest = open_download_manifest(target.output_folder)
+    if not dry_run and CONFIG.get("LIBRARY_SCAN_ON_START", True):
+        # Reconcile the library up front so existing-file checks are index lookups
+        scan_library(output_folder, workers)
+    try:
+        if engine == 'async':
+            # Discovery and downloads share a single event loop
+            from src.async_engine import run_async_engine
+            run_async_engine(
+                themes, targets, available_sites, service_classes,
+                timeout, headers, dry_run, page_cache, resolution_cache)
+            return
+
+        # One pooled session per host, shared by every service and the download pool;
+        # sized so that each service's detail-page workers get their own connection
+        pool_size = max(
+            workers, CONFIG.get("DETAIL_CONCURRENCY", 4), *CONFIG.get("SITE_CONCURRENCY", {}).values())
+        with HttpClient(pool_size=pool_size, cache=page_cache) as http_client:
+            _run_scrape_and_download(
+                themes, targets, available_sites, service_classes,
+                workers, timeout, retries, delay, headers, dry_run,
+                http_client, resolution_cache)
+    finally:
+        for cache in (page_cache, resolution_cache, *(target.manifest for target in targets)):
+            if cache is not None:
+                cache.log_stats()
+                cache.close()
+
+
+def open_page_cache():
+    """
+    Open the on-disk cache for search and detail pages.
 
-    # Dry run mode: just show what would be downloaded
-    if dry_run:
-        logging.info(f"DRY RUN: Would download {len(unique_urls)} wallpapers:")
-        for i, url in enumerate(unique_urls[:10], 1):  # Show first 10
-            logging.info(f"  {i}. {url}")
-        if len(unique_urls) > 10:
-            logging.info(f"  ... and {len(unique_urls) - 10} more")
-        return
+    Returns:
+        HttpCache: The cache, or None if it could not be opened (pages are then always fetched)
+    """
+    try:
+        page_cache = HttpCache()
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"HTTP cache disabled: {e}")
+        return None
+    logging.debug(f"HTTP cache: {page_cache.directory} (TTL {page_cache.ttl}s)")
+    return page_cache
+
+
+def open_resolution_cache():
+    """
+    Open the persistent cache of detail-page results (chosen URL or no suitable resolution).
+
+    Returns:
+        ResolutionCache: The cache, or None if it could not be opened (detail pages are then always fetched)
+    """
+    try:
+        resolution_cache = ResolutionCache()
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Detail page cache disabled: {e}")
+        return None
+    logging.debug(f"Detail page cache: {resolution_cache.path}")
+    return resolution_cache
+
+
+def scan_library(output_folder, workers=None):
+    """
+    Bring the library index up to date with the output folder and log the timing.
+
+    Args:
+        output_folder (str): Folder the wallpapers are saved to
+        workers (int): Threads used for walking the folder and reading new files
+
+    Returns:
+        ScanReport: Counts and timing of the scan
+    """
+    report = get_library_index().scan(output_folder, workers)
+    logging.info(
+        f"Scanned {report.files} wallpapers in {output_folder} in {report.seconds:.2f}s "
+        f"({report.files_per_second:.0f} files/s): {report.cached} unchanged, "
+        f"{report.read} read, {report.failed} unreadable")
+    return report
+
+
+def rescan_library(output_dir=None, workers=None):
+    """
+    Rescan the output folder and report how long the dimension index took to refresh.
+
+    Args:
+        output_dir: Custom output directory (defaults to CONFIG['OUTPUT_FOLDER'])
+        workers: Number of parallel workers (defaults to CONFIG['MAX_WORKERS'])
+
+    Returns:
+        ScanReport: Counts and timing of the scan, or None if the folder does not exist
+    """
+    output_folder = output_dir or CONFIG["OUTPUT_FOLDER"]
+    if not os.path.isdir(output_folder):
+        logging.error(f"Output directory not found: {output_folder}")
+        return None
+    return scan_library(output_folder, workers or CONFIG.get("MAX_WORKERS", 4))
+
+
+def evaluate_library(resolutions, output_dir=None, workers=None):
+    """
+    Score every wallpaper in the output folder against one or more resolutions,
+    e.g. to see what the library holds for a new monitor. Dimensions come from the
+    library index and all files are scored in a single batch.
+
+    Args:
+        resolutions (list): Target resolution strings (e.g., ['5120x1440', '3840x2160'])
+        output_dir: Custom output directory (defaults to CONFIG['OUTPUT_FOLDER'])
+        workers: Number of parallel workers for the index refresh (defaults to CONFIG['MAX_WORKERS'])
+
+    Returns:
+        dict: Resolution -> [code 0, code 1, code 2, code 3] file counts, or None
+            if the folder does not exist or no resolution could be parsed
+    """
+    output_folder = output_dir or CONFIG["OUTPUT_FOLDER"]
+    if not os.path.isdir(output_folder):
+        logging.error(f"Output directory not found: {output_folder}")
+        return None
+    targets = {}
+    for resolution in resolutions:
+        width, height = parse_resolution(resolution)
+        if width and height:
+            targets[f"{width}x{height}"] = (width, height)
+    if not targets:
+        return None
+
+    scan_library(output_folder, workers or CONFIG.get("MAX_WORKERS", 4))
+    paths, widths, heights = get_library_index().dimension_columns(output_folder)
+    start = time.perf_counter()
+    result = evaluate_batch(widths, heights, list(targets.values()))
+    counts = count_codes(result.codes)
+    elapsed = time.perf_counter() - start
+
+    summary = {}
+    for row, resolution in enumerate(targets):
+        summary[resolution] = counts[row]
+        exact, similar, larger, smaller = counts[row][3], counts[row][2], counts[row][1], counts[row][0]
+        logging.info(
+            f"{resolution}: {exact} exact, {similar} larger with similar aspect ratio, "
+            f"{larger} larger, {smaller} too small")
+        if paths and counts[row][0] < len(paths):
+            logging.info(f"  Best match: {os.path.basename(paths[result.ranking[row][0]])}")
+    logging.info(f"Evaluated {len(paths)} wallpapers against {len(targets)} resolutions in {elapsed * 1000:.1f} ms")
+    return summary
+
+
+def open_download_manifest(output_folder):
+    """
+    Open the manifest of wallpapers already downloaded to the output folder.
+
+    Args:
+        output_folder (str): Folder the wallpapers are saved to
+
+    Returns:
+        DownloadManifest: The manifest, or None if it could not be opened (existing files are then checked with PIL)
+    """
+    try:
+        manifest = DownloadManifest(output_folder)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Download manifest disabled: {e}")
+        return None
+    logging.debug(f"Download manifest: {manifest.path}")
+    return manifest
+
+
+def parse_resolution(resolution):
+    """
+    Parse a 'WIDTHxHEIGHT' string, falling back to (0, 0) so checks are skipped.
+
+    Args:
+        resolution (str): Resolution string (e.g., '5120x1440')
 
-    # Parse the desired resolution
+    Returns:
+        tuple: (width (int), height (int))
+    """
     try:
         min_width, min_height = map(
             int, resolution.lower().split("x"))
@@ -422,80 +576,371 @@ def main(
         logging.error(
             f"Failed to parse resolution '{resolution}': {e}")
         min_width = min_height = 0
+    return min_width, min_height
 
-    # Filter out wallpapers that already exist with the correct resolution
-    urls_to_download = []
-    already_downloaded = 0
-    for url in unique_urls:
-        # Extract filename from URL and sanitize it
-        filename = os.path.basename(url)
-        filename = filename.replace("?", "_").replace("&", "_")
-        filepath = os.path.join(output_folder, filename)
-
-        if os.path.exists(filepath):
-            # Check if the existing file has the correct resolution
-            meets_req, width, height, match_code = check_image_resolution(
-                filepath, min_width, min_height)
-            if meets_req:
-                already_downloaded += 1
-                match_type = {
-                    3: "exact match",
-                    2: "similar aspect ratio",
-                    1: "larger resolution"}
-                logging.debug(
-                    f"Skipping {filename} as it already exists with resolution ({width}x{height}), {match_type.get(match_code, 'acceptable')} for target {min_width}x{min_height}")
-            else:
-                logging.warning(
-                    f"File {filename} exists but has insufficient resolution ({width}x{height}), will re-download")
-                urls_to_download.append(url)
-        else:
-            urls_to_download.append(url)
 
-    if already_downloaded > 0:
-        logging.info(
-            f"Skipping {already_downloaded} wallpapers that have already been downloaded")
+def split_resolutions(resolution):
+    """
+    Turn a resolution argument into a list of distinct resolution strings.
 
-    if not urls_to_download:
-        logging.info(
-            "No new wallpapers to download. All wallpapers already exist.")
+    Args:
+        resolution: A resolution string (e.g., '5120x1440'), a comma-separated string of
+            several, or a list of them
+
+    Returns:
+        list: Lowercase resolution strings in their original order
+    """
+    if isinstance(resolution, str):
+        resolution = resolution.split(",")
+    resolutions = []
+    for res in resolution:
+        for part in res.split(","):
+            part = part.strip().lower()
+            if part and part not in resolutions:
+                resolutions.append(part)
+    return resolutions
+
+
+def make_download_targets(resolutions, sizes, output_folder, max_downloads):
+    """
+    Build one DownloadTarget per resolution. A single resolution is saved to the
+    output folder itself; several each get a subfolder named after the resolution.
+
+    Args:
+        resolutions (list): Resolution strings (e.g., ['5120x1440', '3840x2160'])
+        sizes (list): (width, height) of each resolution
+        output_folder (str): Folder the wallpapers are saved to
+        max_downloads (int): Maximum downloads per theme, for each resolution
+
+    Returns:
+        list: DownloadTarget per resolution, in the given order
+    """
+    return [
+        DownloadTarget(
+            resolution, width, height,
+            output_folder if len(resolutions) == 1 else os.path.join(output_folder, resolution),
+            max_downloads)
+        for resolution, (width, height) in zip(resolutions, sizes)]
+
+
+def image_path_for_url(url, output_folder):
+    """
+    Build the local file path an image URL is saved to.
+
+    Args:
+        url (str): URL of the image
+        output_folder (str): Folder the wallpapers are saved to
+
+    Returns:
+        str: Path of the local file for this URL
+    """
+    # Extract filename from URL and sanitize it
+    filename = os.path.basename(url)
+    filename = filename.replace("?", "_").replace("&", "_")
+    return os.path.join(output_folder, filename)
+
+
+def create_scrape_progress_bars(available_sites, themes, resolution):
+    """
+    Create one progress bar per site, sized to the steps its service reports.
+
+    Args:
+        available_sites: Sites that will be scraped
+        themes: List of themes to search for
+        resolution: Target resolution (e.g., '5120x1440')
+
+    Returns:
+        dict: Mapping of site name to its tqdm progress bar
+    """
+    scrape_bars = {}
+    for site in available_sites:
+        # Calculate total steps for each site based on their process:
+        if site == 'wallpaperbat.com':
+            # For each theme:
+            # 1. Start theme
+            # 2. Process theme search
+            # 3. Start ultrawide search (for 5120x1440)
+            # 4. Process ultrawide results (for 5120x1440)
+            # 5. Theme completion
+            steps_per_theme = 3  # base steps
+            if resolution == '5120x1440':
+                steps_per_theme += 2  # extra steps for ultrawide search
+            total_steps = len(themes) * steps_per_theme
+        elif site == 'wallpaperswide.com':
+            # For each theme:
+            # 1. Start theme
+            # 2. Try first URL variant
+            # 3. Try second URL variant (if needed)
+            # 4. Theme completion
+            total_steps = len(themes) * 4
+        else:  # wallhaven.cc and others
+            # For each theme:
+            # 1. Start theme search
+            # 2. Process results
+            # 3. Theme completion
+            total_steps = len(themes) * 3
+
+        scrape_bars[site] = tqdm(
+            total=total_steps,
+            desc=f"Scraping {site}",
+            position=len(scrape_bars),
+            **PROGRESS_BAR_CONFIG
+        )
+    return scrape_bars
+
+
+def log_dry_run(unique_urls):
+    """Show what would be downloaded in dry-run mode."""
+    logging.info(f"DRY RUN: Would download {len(unique_urls)} wallpapers:")
+    for i, url in enumerate(unique_urls[:10], 1):  # Show first 10
+        logging.info(f"  {i}. {url}")
+    if len(unique_urls) > 10:
+        logging.info(f"  ... and {len(unique_urls) - 10} more")
+
+
+def existing_download_ok(url, output_folder, min_width, min_height, manifest=None, site=None):
+    """
+    Check whether a wallpaper already exists with an acceptable resolution.
+
+    Args:
+        url: Candidate wallpaper URL
+        output_folder: Folder the wallpapers are saved to
+        min_width: Minimum required width in pixels
+        min_height: Minimum required height in pixels
+        manifest: Optional DownloadManifest answering unchanged files without opening them
+        site: Site the wallpaper was found on, recorded in the manifest
+
+    Returns:
+        bool: True if the file exists and meets the resolution, False if it must be downloaded
+    """
+    filepath = image_path_for_url(url, output_folder)
+    filename = os.path.basename(filepath)
+    result = check_existing_download(url, filepath, min_width, min_height, manifest, site)
+    if result is None:
+        return False
+
+    meets_req, width, height, match_code = result
+    if meets_req:
+        match_type = {
+            3: "exact match",
+            2: "similar aspect ratio",
+            1: "larger resolution"}
+        logging.debug(
+            f"Skipping {filename} as it already exists with resolution ({width}x{height}), {match_type.get(match_code, 'acceptable')} for target {min_width}x{min_height}")
+        return True
+    logging.warning(
+        f"File {filename} exists but has insufficient resolution ({width}x{height}), will re-download")
+    return False
+
+
+def remove_near_duplicates(downloaded, output_folder, min_width, min_height, workers=None, manifest=None):
+    """
+    Drop new downloads that are rescaled or re-encoded copies of other wallpapers,
+    keeping whichever version matches the target resolution best.
+
+    Args:
+        downloaded: Paths of the wallpapers downloaded in this run
+        output_folder: Folder the wallpapers are saved to
+        min_width: Target width in pixels
+        min_height: Target height in pixels
+        workers: Worker processes used for hashing
+        manifest: Optional DownloadManifest, updated so removed URLs are not downloaded again
+    """
+    if not downloaded or not CONFIG.get("NEAR_DUPLICATES", False):
+        return
+    try:
+        index = NearDuplicateIndex(output_folder)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Near-duplicate detection disabled: {e}")
         return
 
-    # Download images using thread pool for parallelism
-    logging.info(
-        f"Downloading {len(urls_to_download)} new wallpapers with {workers} parallel workers")
-    
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = []
-        for url in urls_to_download:
-            futures.append(
-                executor.submit(
-                    download_image,
-                    url,
-                    output_folder,
-                    timeout,
-                    retries,
-                    delay,
-                    headers,
-                    min_width,
-                    min_height))
-
-        successes = 0
-        for f in tqdm(
-                as_completed(futures),
-                total=len(futures),
-                desc="Downloading"):
-            if f.result():
-                successes += 1
-
-    # Summary of results
+    images = []
+    for path in downloaded:
+        size = get_library_index().dimensions(path) if os.path.exists(path) else None
+        if size is not None:
+            images.append((path, evaluate_resolution_match(*size, min_width, min_height), *size))
+    try:
+        report = collapse_near_duplicates(
+            index, images, workers=workers,
+            on_replaced=manifest.repoint if manifest is not None else None)
+    finally:
+        index.close()
+    if report.removed:
+        logging.info(
+            f"Removed {report.removed} near-duplicate wallpapers "
+            f"({report.bytes_freed / (1024 * 1024):.1f} MB freed)")
+
+
+def log_download_summary(successes, attempted, already_downloaded, total_wallpapers, output_folder):
+    """
+    Log the summary of a download run.
+
+    Args:
+        successes: Number of new images downloaded
+        attempted: Number of images a download was attempted for
+        already_downloaded: Number of images that already existed
+        total_wallpapers: Number of unique wallpapers found
+        output_folder: Folder the wallpapers are saved to
+    """
     total_downloaded = successes + already_downloaded
-    total_wallpapers = len(unique_urls)
-    success_rate = (successes / len(urls_to_download)) * \
-        100 if urls_to_download else 100
+    success_rate = (successes / attempted) * \
+        100 if attempted else 100
     overall_success_rate = (
         total_downloaded / total_wallpapers) * 100 if total_wallpapers else 0
 
     logging.info(
-        f"Downloaded {successes}/{len(urls_to_download)} new images ({success_rate:.1f}%)")
+        f"Downloaded {successes}/{attempted} new images ({success_rate:.1f}%)")
     logging.info(
         f"Total: {total_downloaded}/{total_wallpapers} images ({overall_success_rate:.1f}%) available in {output_folder}")
+
+
+def finish_download_target(target, dry_run, workers=None, multiple=False):
+    """
+    Wrap up one target resolution once discovery and downloads are over: list what
+    a dry run would fetch, otherwise drop near-duplicates and log the summary.
+
+    Args:
+        target (DownloadTarget): The target resolution and its counters
+        dry_run (bool): If True, only show what would be downloaded
+        workers (int): Worker processes used for near-duplicate hashing
+        multiple (bool): Whether the run had several targets, so the logs name the resolution
+    """
+    if multiple:
+        logging.info(f"Resolution {target.resolution} ({target.output_folder}):")
+    selector, stats = target.selector, target.stats
+    selector.log_summary()
+    if not selector.admitted:
+        return
+
+    # Dry run mode: just show what would be downloaded
+    if dry_run:
+        log_dry_run(selector.admitted)
+        return
+
+    if stats.already_downloaded > 0:
+        logging.info(
+            f"Skipped {stats.already_downloaded} wallpapers that have already been downloaded")
+    remove_near_duplicates(
+        stats.downloaded, target.output_folder, target.min_width, target.min_height,
+        workers, target.manifest)
+    log_download_summary(
+        stats.successes, stats.attempted, stats.already_downloaded, selector.unique,
+        target.output_folder)
+
+
+def _run_scrape_and_download(
+        themes, targets, available_sites, service_classes,
+        workers, timeout, retries, delay, headers, dry_run,
+        http_client, resolution_cache=None):
+    """
+    Run the threaded scrape and download phases over a shared HttpClient.
+    Services hand each URL to a bounded queue as soon as it is found, and the
+    download workers consume it right away while discovery continues. Every
+    service matches each detail page against all targets in one visit.
+
+    Args:
+        themes: List of themes to search for
+        targets: DownloadTarget per resolution; each has its own folder, per-theme limit and manifest
+        available_sites: Sites to scrape, already validated against service_classes
+        service_classes: Mapping of site name to service class
+        workers: Number of parallel workers
+        timeout: Request timeout in seconds
+        retries: Number of download retry attempts
+        delay: Base delay between download retries
+        headers: HTTP headers used for image downloads
+        dry_run: If True, show what would be downloaded without downloading
+        http_client: Shared HttpClient injected into services and downloads
+        resolution_cache: Optional ResolutionCache shared by the services
+    """
+    targets_by_resolution = {target.resolution: target for target in targets}
+    download_queue = queue.Queue(maxsize=max(1, CONFIG.get("PIPELINE_QUEUE_SIZE", 50)))
+    # Services walk result pages until every target has enough wallpapers of a theme
+    budget = ThemeBudget(target.selector for target in targets)
+
+    def on_wallpaper(candidate):
+        # Dedup and the per-theme limit apply as candidates stream in; a full queue
+        # holds discovery back until the download workers catch up. Listed
+        # dimensions that cannot meet the target are dropped without a request.
+        target = targets_by_resolution.get(candidate.resolution)
+        if target is None or not candidate.may_fit(target.min_width, target.min_height):
+            return
+        if target.selector.admit(candidate.theme, candidate.download_url) and not dry_run:
+            download_queue.put((candidate, target))
+
+    scrape_bars = create_scrape_progress_bars(available_sites, themes, targets[0].resolution)
+    download_bar = None
+    if not dry_run:
+        download_bar = tqdm(desc="Downloading", position=len(scrape_bars))
+        logging.info(f"Downloading wallpapers as they are found with {workers} parallel workers")
+
+    def download_worker():
+        while True:
+            item = download_queue.get()
+            if item is None:
+                return
+            candidate, target = item
+            url, site = candidate.download_url, candidate.site
+            try:
+                if existing_download_ok(
+                        url, target.output_folder, target.min_width, target.min_height,
+                        target.manifest, site):
+                    target.stats.record(already_downloaded=True)
+                else:
+                    target.stats.record(
+                        success=download_image(
+                            url, target.output_folder, timeout, retries, delay, headers,
+                            target.min_width, target.min_height, http_client,
+                            manifest=target.manifest, site=site, existing_checked=True),
+                        path=image_path_for_url(url, target.output_folder))
+            except Exception as e:
+                logging.error(f"Error downloading {url}: {e}")
+                target.stats.record(success=False)
+            download_bar.update(1)
+
+    def make_progress_callback(site):
+        def progress_cb():
+            scrape_bars[site].update(1)
+        return progress_cb
+
+    with ThreadPoolExecutor(max_workers=workers) as download_executor:
+        download_futures = [] if dry_run else [
+            download_executor.submit(download_worker) for _ in range(workers)]
+        try:
+            # Collect wallpaper URLs from all configured services in parallel, with progress bars
+            scrape_futures = []
+            with ThreadPoolExecutor(max_workers=workers) as scrape_executor:
+                for site in available_sites:
+                    logging.info(f"Submitting scrape for site: {site}")
+                    service_class = service_classes[site]
+                    service = service_class(
+                        resolution=[target.resolution for target in targets],
+                        themes=themes,
+                        http_client=http_client,
+                        resolution_cache=resolution_cache,
+                        wallpaper_callback=on_wallpaper,
+                        budget=budget
+                    )
+                    # Pass a progress callback to the service
+                    scrape_futures.append(
+                        scrape_executor.submit(
+                            lambda svc=service, s=site: (s, svc.fetch_wallpapers(progress_callback=make_progress_callback(s)))
+                        )
+                    )
+                for future in as_completed(scrape_futures):
+                    try:
+                        site, site_urls = future.result()
+                        logging.info(f"Found {len(site_urls)} wallpapers from {site}")
+                    except Exception as e:
+                        logging.error(f"Error processing site in parallel: {e}")
+            # Close all progress bars
+            for bar in scrape_bars.values():
+                bar.close()
+        finally:
+            # Discovery is over: let each worker finish the queue and stop
+            for _ in download_futures:
+                download_queue.put(None)
+    if download_bar is not None:
+        download_bar.close()
+
+    for target in targets:
+        finish_download_target(target, dry_run, workers, multiple=len(targets) > 1)
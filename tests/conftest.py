@@ -0,0 +1,16 @@
+"""
+Shared fixtures: keep caches, indexes, logs and downloads out of the source tree.
+"""
+import pytest
+
+from src.config import CONFIG
+
+
+@pytest.fixture(autouse=True)
+def temp_folder(tmp_path, monkeypatch):
+    """Point TEMP_FOLDER (and, for CLI subprocesses, the download folder) at tmp_path."""
+    folder = tmp_path / 'temp'
+    monkeypatch.setitem(CONFIG, 'TEMP_FOLDER', str(folder))
+    monkeypatch.setenv('TEMP_FOLDER', str(folder))
+    monkeypatch.setenv('DEFAULT_DOWNLOAD_DIR', str(tmp_path / 'data'))
+    return folder
@@ -0,0 +1,234 @@
+"""
+Test the asyncio scraping and download engine.
+"""
+import asyncio
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("aiohttp")
+
+from src.async_engine import AsyncHttpClient, download_image_async
+from src.services.wallhaven_service import WallhavenService
+from src.services.wallpaperbat_service import WallpaperBatService
+from src.services.wallpaperswide_service import WallpapersWideService
+
+
+def _png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+ROUTES = {
+    "/page.html": (200, "text/html", b"<html>hello</html>"),
+    "/big.png": (200, "image/png", _png_bytes(64, 32)),
+    "/small.png": (200, "image/png", _png_bytes(16, 8)),
+    "/limited.html": (429, "text/plain", b"slow down"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, content_type, body = ROUTES.get(self.path, (404, "text/plain", b"missing"))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0.3")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    from src.config import CONFIG
+    monkeypatch.setitem(CONFIG, "MAX_RETRIES", 1)
+    monkeypatch.setitem(CONFIG, "RETRY_DELAY", 0)
+
+
+class FakeAsyncClient:
+    """Serves canned HTML by URL and counts requests."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    async def fetch_text(self, url, headers=None, cache_key=None):
+        self.requested.append(url)
+        await asyncio.sleep(0)
+        return self.pages.get(url)
+
+    async def head(self, url, headers=None):
+        return None
+
+    async def stream_page(self, url, new_reader, headers=None):
+        html = await self.fetch_text(url, headers)
+        if html is None:
+            return None
+        reader = new_reader()
+        reader.feed(html)
+        reader.close()
+        return reader
+
+
+class TestAsyncHttpClient:
+    """Test the semaphore-bounded aiohttp client."""
+
+    def test_fetch_text_and_bytes(self, server_url, fast_retries):
+        """Test fetching text and binary bodies from a local server."""
+        async def run():
+            async with AsyncHttpClient(per_host_limit=2) as client:
+                text = await client.fetch_text(f"{server_url}/page.html")
+                data = await client.fetch_bytes(f"{server_url}/big.png")
+                missing = await client.fetch_text(f"{server_url}/nope")
+                return text, data, missing
+
+        text, data, missing = asyncio.run(run())
+        assert text == "<html>hello</html>"
+        assert data.startswith(b"\x89PNG")
+        assert missing is None
+
+    def test_429_waits_when_host_is_unlimited(self, server_url, fast_retries, monkeypatch):
+        """Test that a 429 from a host that cannot be paused waits for Retry-After before retrying."""
+        from src.config import CONFIG
+        from src.rate_limiter import HostRateLimiter
+        monkeypatch.setitem(CONFIG, "MAX_RETRIES", 2)
+
+        async def run():
+            async with AsyncHttpClient(rate_limiter=HostRateLimiter(rate=0)) as client:
+                loop = asyncio.get_running_loop()
+                started = loop.time()
+                assert await client.fetch_text(f"{server_url}/limited.html") is None
+                return loop.time() - started
+
+        assert asyncio.run(run()) >= 0.25
+
+    def test_fetch_text_uses_page_cache(self, server_url, fast_retries, tmp_path):
+        """Test that pages are stored in the cache and fresh entries skip the network."""
+        from src.http_cache import HttpCache
+        cache = HttpCache(directory=str(tmp_path), ttl=60)
+        cache.store(f"{server_url}/nope", b"<html>cached</html>", "utf-8")
+
+        async def run():
+            async with AsyncHttpClient(cache=cache) as client:
+                fetched = await client.fetch_text(f"{server_url}/page.html")
+                cached = await client.fetch_text(f"{server_url}/nope")
+                return fetched, cached
+
+        fetched, cached = asyncio.run(run())
+        assert fetched == "<html>hello</html>"
+        assert cached == "<html>cached</html>"
+        assert cache.lookup(f"{server_url}/page.html").text == "<html>hello</html>"
+
+    def test_one_semaphore_per_host(self):
+        """Test that each host gets its own bounded semaphore."""
+        async def run():
+            async with AsyncHttpClient(per_host_limit=3) as client:
+                a = client._semaphore_for("https://wallhaven.cc/search")
+                b = client._semaphore_for("https://wallhaven.cc/w/1")
+                c = client._semaphore_for("https://wallpaperbat.com/")
+                return a, b, c
+
+        a, b, c = asyncio.run(run())
+        assert a is b
+        assert a is not c
+        assert a._value == 3
+
+
+class TestDownloadImageAsync:
+    """Test async image downloads with resolution verification."""
+
+    def test_downloads_acceptable_image(self, server_url, fast_retries, tmp_path):
+        """Test that an image meeting the resolution is kept."""
+        async def run():
+            async with AsyncHttpClient() as client:
+                return await download_image_async(
+                    f"{server_url}/big.png", str(tmp_path), client, {}, 64, 32)
+
+        assert asyncio.run(run()) is True
+        assert (tmp_path / "big.png").exists()
+
+    def test_removes_undersized_image(self, server_url, fast_retries, tmp_path):
+        """Test that an undersized image is removed after download."""
+        async def run():
+            async with AsyncHttpClient() as client:
+                return await download_image_async(
+                    f"{server_url}/small.png", str(tmp_path), client, {}, 64, 32)
+
+        assert asyncio.run(run()) is False
+        assert not (tmp_path / "small.png").exists()
+
+    def test_oversized_image_is_skipped(self, server_url, fast_retries, tmp_path, monkeypatch):
+        """Test that MAX_IMAGE_MB aborts the streamed download and leaves no .part file."""
+        from src.config import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_IMAGE_MB", 1)
+        status, content_type, body = ROUTES["/big.png"]
+        monkeypatch.setitem(ROUTES, "/huge.png", (status, content_type, body + b"\0" * (1024 * 1024)))
+
+        async def run():
+            async with AsyncHttpClient() as client:
+                return await download_image_async(
+                    f"{server_url}/huge.png", str(tmp_path), client, {}, 64, 32)
+
+        assert asyncio.run(run()) is False
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestServicesAsync:
+    """Test the async fetch_wallpapers paths against canned pages."""
+
+    def test_wallhaven_fetch_wallpapers_async(self):
+        """Test that wallhaven detail pages are resolved concurrently."""
+        svc = WallhavenService(resolution="5120x1440", themes=["nature"])
+        search_url = svc._search_url("nature")
+        detail = '<img id="wallpaper" src="https://w.wallhaven.cc/full/ab/wallhaven-{0}.jpg" data-wallpaper-width="5120" data-wallpaper-height="1440">'
+        client = FakeAsyncClient({
+            search_url: '<figure class="thumb"><a class="preview" href="https://wallhaven.cc/w/abc"></a></figure>'
+                        '<figure class="thumb"><a class="preview" href="https://wallhaven.cc/w/def"></a></figure>',
+            "https://wallhaven.cc/w/abc": detail.format("abc"),
+            "https://wallhaven.cc/w/def": detail.format("def"),
+        })
+
+        urls = asyncio.run(svc.fetch_wallpapers_async(client))
+        assert urls == [
+            "https://w.wallhaven.cc/full/ab/wallhaven-abc.jpg",
+            "https://w.wallhaven.cc/full/ab/wallhaven-def.jpg",
+        ]
+
+    def test_wallpaperswide_falls_back_to_second_theme_url(self):
+        """Test that the resolution-specific theme URL is tried when the first is empty."""
+        svc = WallpapersWideService(resolution="5120x1440", themes=["nature"])
+        first, second = svc._theme_urls("nature")
+        client = FakeAsyncClient({
+            first: "<html></html>",
+            second: '<div class="wallpaper"><a href="/lake-wallpapers.html">x</a></div>',
+            "https://wallpaperswide.com/lake-wallpapers.html":
+                '<a href="/download/lake-wallpaper-5120x1440.jpg">5120x1440</a>',
+        })
+
+        urls = asyncio.run(svc.fetch_wallpapers_async(client))
+        assert urls == ["https://wallpaperswide.com/download/lake-wallpaper-5120x1440.jpg"]
+        assert client.requested[:2] == [first, second]
+
+    def test_wallpaperbat_progress_steps_match_bar_total(self):
+        """Test that the async path reports the same progress steps as the sync path."""
+        svc = WallpaperBatService(resolution="5120x1440", themes=["nature", "space"])
+        steps = []
+        asyncio.run(svc.fetch_wallpapers_async(FakeAsyncClient({}), progress_callback=lambda: steps.append(1)))
+        assert len(steps) == 2 * 5
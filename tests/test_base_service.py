@@ -0,0 +1,230 @@
+"""
+Test the detail-page fan-out shared by the services.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.pipeline import Candidate, CandidateSelector, ThemeBudget
+from src.services.wallhaven_service import WallhavenService
+from src.services.wallpaperbat_service import WallpaperBatService
+from src.services.wallpaperswide_service import WallpapersWideService
+
+
+class ConcurrencyProbe:
+    """Stand-in for _process_detail_page that records peak concurrency."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {"5120x1440": Candidate(f"{url}.jpg")}
+
+
+@pytest.fixture
+def concurrency(monkeypatch):
+    from src.services.base_service import CONFIG
+    monkeypatch.setitem(CONFIG, "DETAIL_CONCURRENCY", 3)
+    monkeypatch.setitem(CONFIG, "SITE_CONCURRENCY", {"wallpaperbat.com": 1})
+
+
+class TestDetailFanOut:
+    """Test bounded concurrent processing of detail pages."""
+
+    def test_bounded_and_ordered(self, concurrency):
+        """Test that detail pages run concurrently up to the limit and keep listing order."""
+        svc = WallhavenService(themes=["nature"])
+        probe = ConcurrencyProbe()
+        svc._process_detail_page = probe
+        urls = [f"https://wallhaven.cc/w/{i}" for i in range(9)]
+        progress = []
+
+        result = svc._process_detail_pages(urls, progress_callback=lambda: progress.append(1))
+
+        assert result == [f"{url}.jpg" for url in urls]
+        assert 1 < probe.peak <= 3
+        assert len(progress) == 9
+
+    def test_site_override(self, concurrency):
+        """Test that SITE_CONCURRENCY overrides the default for one site."""
+        assert WallhavenService().detail_concurrency == 3
+        svc = WallpaperBatService()
+        assert svc.detail_concurrency == 1
+
+        probe = ConcurrencyProbe(delay=0)
+        svc._process_detail_page = probe
+        svc._process_detail_pages([f"https://wallpaperbat.com/w/{i}" for i in range(4)])
+        assert probe.peak == 1
+
+    def test_failing_page_does_not_stop_others(self, concurrency):
+        """Test that one failing detail page only drops its own results."""
+        svc = WallhavenService()
+
+        def process(url):
+            if url.endswith("1"):
+                raise ValueError("broken page")
+            return {"5120x1440": Candidate(url)}
+        svc._process_detail_page = process
+
+        assert svc._process_detail_pages(["a0", "a1", "a2"]) == ["a0", "a2"]
+
+    def test_async_fan_out_is_bounded(self, concurrency):
+        """Test that the asyncio path honours the same limit."""
+        svc = WallhavenService()
+        state = {"active": 0, "peak": 0}
+
+        async def process(client, url):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return {"5120x1440": Candidate(url)}
+        svc._process_detail_page_async = process
+
+        urls = [f"u{i}" for i in range(8)]
+        assert asyncio.run(svc._process_detail_pages_async(None, urls)) == urls
+        assert state["peak"] == 3
+
+
+class TestMultiTarget:
+    """Test matching one detail page against several target resolutions."""
+
+    PAGE = "".join(
+        f'<a href="/download/lake-wallpaper-{size}.jpg">{size}</a>'
+        for size in ("3440x1440", "3840x2160", "5120x1440", "7680x2160"))
+
+    def test_one_parse_serves_every_target(self):
+        """Test that each target gets its own best option from a single page."""
+        svc = WallpapersWideService(resolution="5120x1440, 3440x1440,2560x1600")
+        assert svc.resolutions == ["5120x1440", "3440x1440", "2560x1600"]
+        assert (svc.min_width, svc.min_height) == (5120, 1440)
+
+        chosen = svc._parse_detail_page(self.PAGE, "https://wallpaperswide.com/lake.html")
+
+        assert {res: (c.download_url, c.width, c.height) for res, c in chosen.items()} == {
+            "5120x1440": ("https://wallpaperswide.com/download/lake-wallpaper-5120x1440.jpg", 5120, 1440),
+            "3440x1440": ("https://wallpaperswide.com/download/lake-wallpaper-3440x1440.jpg", 3440, 1440),
+            "2560x1600": ("https://wallpaperswide.com/download/lake-wallpaper-3840x2160.jpg", 3840, 2160)}
+        assert chosen["5120x1440"].detail_url == "https://wallpaperswide.com/lake.html"
+        assert chosen["5120x1440"].site == "wallpaperswide.com"
+
+    def test_emitted_with_resolution(self):
+        """Test that the callback learns which target each URL was chosen for."""
+        found = []
+        svc = WallpapersWideService(
+            resolution=["5120x1440", "3440x1440"], wallpaper_callback=found.append)
+        svc._process_detail_page = lambda url: svc._parse_detail_page(self.PAGE, url)
+
+        urls = svc._process_detail_pages(["https://wallpaperswide.com/lake.html"], theme="nature")
+
+        assert len(urls) == 2
+        assert sorted(c.resolution for c in found) == ["3440x1440", "5120x1440"]
+        assert {(c.theme, c.site, c.width) for c in found} == {
+            ("nature", "wallpaperswide.com", 5120), ("nature", "wallpaperswide.com", 3440)}
+
+
+class TestListingWalk:
+    """Test walking result pages until a theme's download budget is met."""
+
+    def make_service(self, selector, per_page):
+        svc = WallhavenService(themes=["nature"], wallpaper_callback=lambda c: selector.admit(c.theme, c.download_url),
+                               budget=ThemeBudget([selector]))
+        svc.listing_requests, svc.visited = [], []
+
+        def listing_links(url, page, parse, limit=None):
+            svc.listing_requests.append((url.rpartition("&page=")[2] if "&page=" in url else "1", limit))
+            number = svc.listing_requests[-1][0]
+            return [f"https://wallhaven.cc/w/{number}-{i}" for i in range(per_page)][:limit]
+
+        def detail_page(url):
+            svc.visited.append(url)
+            return {"5120x1440": Candidate(f"{url}.jpg")}
+
+        svc._listing_links = listing_links
+        svc._process_detail_page = detail_page
+        return svc
+
+    def test_stops_at_budget(self, concurrency):
+        """Test that only the budget's detail pages are visited and no further page is requested."""
+        selector = CandidateSelector(max_per_theme=3)
+        svc = self.make_service(selector, per_page=4)
+
+        urls = svc._walk_listing("https://wallhaven.cc/search?q=nature", "search", None, theme="nature")
+
+        assert len(urls) == 3 and len(svc.visited) == 3
+        assert svc.listing_requests == [("1", None)]
+        assert selector.remaining("nature") == 0
+
+    def test_rejected_details_drain_page_first(self, concurrency):
+        """Test that when detail pages are rejected, the rest of page 1 is used before page 2 is requested."""
+        selector = CandidateSelector(max_per_theme=2)
+        svc = self.make_service(selector, per_page=6)
+        detail_page = svc._process_detail_page
+        # The first two results are rejected (no suitable resolution)
+        svc._process_detail_page = lambda url: {} if url.endswith(("1-0", "1-1")) else detail_page(url)
+
+        urls = svc._walk_listing("https://wallhaven.cc/search?q=nature", "search", None, theme="nature")
+
+        assert urls == ["https://wallhaven.cc/w/1-2.jpg", "https://wallhaven.cc/w/1-3.jpg"]
+        assert [number for number, _ in svc.listing_requests] == ["1"]
+
+    def test_no_budget_cuts_page_at_limit(self, concurrency, monkeypatch):
+        """Test that without a budget a page is only read as far as MAX_ITEMS_PER_THEME."""
+        from src.services.base_service import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_ITEMS_PER_THEME", 3)
+        svc = self.make_service(CandidateSelector(max_per_theme=3), per_page=6)
+        svc.budget = None
+
+        assert len(svc._walk_listing("https://wallhaven.cc/search?q=nature", "search", None, theme="nature")) == 3
+        assert svc.listing_requests == [("1", 3)]
+
+    def test_walks_later_pages_for_budget(self, concurrency):
+        """Test that later pages are walked until the budget is met, without extra detail pages."""
+        selector = CandidateSelector(max_per_theme=5)
+        svc = self.make_service(selector, per_page=2)
+
+        urls = svc._walk_listing("https://wallhaven.cc/search?q=nature", "search", None, theme="nature")
+
+        assert len(urls) == 5 and len(svc.visited) == 5
+        assert [number for number, _ in svc.listing_requests] == ["1", "2", "3"]
+
+    def test_page_cap(self, concurrency, monkeypatch):
+        """Test that MAX_PAGES_PER_THEME ends the walk when the budget cannot be met."""
+        from src.services.base_service import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_PAGES_PER_THEME", 2)
+        selector = CandidateSelector(max_per_theme=50)
+        svc = self.make_service(selector, per_page=2)
+
+        urls = svc._walk_listing("https://wallhaven.cc/search?q=nature", "search", None, theme="nature")
+
+        assert len(urls) == 4
+        assert [number for number, _ in svc.listing_requests] == ["1", "2"]
+
+    def test_async_stops_at_budget(self, concurrency):
+        """Test that the async walk also stops once the theme's budget is met."""
+        selector = CandidateSelector(max_per_theme=3)
+        svc = self.make_service(selector, per_page=2)
+
+        async def listing_links_async(client, url, page, parse, limit=None):
+            return svc._listing_links(url, page, parse, limit)
+
+        async def detail_page_async(client, url):
+            return svc._process_detail_page(url)
+
+        svc._listing_links_async = listing_links_async
+        svc._process_detail_page_async = detail_page_async
+
+        urls = asyncio.run(svc._walk_listing_async(None, "https://wallhaven.cc/search?q=nature", "search", None, "nature"))
+
+        assert len(urls) == 3 and len(svc.visited) == 3
+        assert [number for number, _ in svc.listing_requests] == ["1", "2"]
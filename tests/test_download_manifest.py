@@ -0,0 +1,123 @@
+"""
+Test the SQLite manifest of downloaded wallpapers.
+"""
+import hashlib
+import os
+
+import pytest
+from PIL import Image
+
+from src import wallpaper_scraper
+from src.config import CONFIG
+from src.download_manifest import DownloadManifest
+from src.wallpaper_scraper import existing_download_ok
+
+URL = "https://w.wallhaven.cc/full/ab/wallhaven-abc.png"
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = DownloadManifest(str(tmp_path))
+    yield manifest
+    manifest.close()
+
+
+@pytest.fixture
+def wallpaper(tmp_path):
+    path = tmp_path / "wallhaven-abc.png"
+    Image.new("RGB", (64, 32)).save(path)
+    return path
+
+
+class TestDownloadManifest:
+    """Test recording and revalidating downloaded files."""
+
+    def test_lookup_unchanged_file(self, manifest, wallpaper):
+        """Test that a recorded file is returned while its size and mtime are unchanged."""
+        manifest.record(URL, str(wallpaper), 64, 32, 3, "64x32", "wallhaven.cc")
+
+        entry = manifest.lookup(URL)
+        assert (entry.width, entry.height, entry.match_code, entry.site) == (64, 32, 3, "wallhaven.cc")
+        assert manifest.hits == 1
+        assert len(manifest) == 1
+
+    def test_changed_file_is_revalidated(self, manifest, wallpaper):
+        """Test that a new mtime or a missing file invalidates the entry."""
+        manifest.record(URL, str(wallpaper), 64, 32, 3, "64x32")
+        stat = wallpaper.stat()
+        os.utime(wallpaper, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert manifest.lookup(URL) is None
+        assert manifest.revalidated == 1
+
+        wallpaper.unlink()
+        assert manifest.lookup(URL) is None
+
+    def test_unknown_url(self, manifest, wallpaper):
+        """Test that a URL that was never recorded is not found."""
+        assert manifest.lookup(URL) is None
+
+
+class TestExistingDownloadCheck:
+    """Test the pre-download skip decision backed by the manifest."""
+
+    def test_second_check_skips_pil(self, manifest, wallpaper, tmp_path, monkeypatch):
+        """Test that only the first check opens the image; later ones use the manifest."""
+        assert existing_download_ok(URL, str(tmp_path), 64, 32, manifest, "wallhaven.cc")
+
+        def fail(*args):
+            raise AssertionError("image opened despite manifest entry")
+
+        monkeypatch.setattr(wallpaper_scraper, "check_image_resolution", fail)
+        assert existing_download_ok(URL, str(tmp_path), 64, 32, manifest)
+        # A different target is evaluated from the recorded dimensions
+        assert not existing_download_ok(URL, str(tmp_path), 128, 64, manifest)
+
+    def test_missing_file(self, manifest, tmp_path):
+        """Test that a URL without a local file must be downloaded."""
+        assert not existing_download_ok(URL, str(tmp_path), 64, 32, manifest)
+
+
+class TestContentDedup:
+    """Test collapsing downloads with the same SHA-256 onto one file."""
+
+    @pytest.fixture
+    def mirrored(self, manifest, wallpaper, tmp_path):
+        digest = hashlib.sha256(wallpaper.read_bytes()).hexdigest()
+        manifest.record(URL, str(wallpaper), 64, 32, 3, "64x32", "wallhaven.cc", digest)
+        copy = tmp_path / "mirror.png"
+        copy.write_bytes(wallpaper.read_bytes())
+        return copy, digest
+
+    def test_hardlink(self, manifest, wallpaper, mirrored, monkeypatch):
+        """Test that a duplicate becomes a hardlink to the existing file."""
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "hardlink")
+        copy, digest = mirrored
+        assert manifest.deduplicate("https://mirror/mirror.png", str(copy), digest) == str(copy)
+        assert os.path.samefile(copy, wallpaper)
+        assert manifest.duplicates == 1
+        assert manifest.bytes_saved == wallpaper.stat().st_size
+
+    def test_skip(self, manifest, wallpaper, mirrored, monkeypatch):
+        """Test that a skipped duplicate is removed and points at the existing file."""
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "skip")
+        copy, digest = mirrored
+        assert manifest.deduplicate("https://mirror/mirror.png", str(copy), digest) == str(wallpaper)
+        assert not copy.exists()
+
+    def test_keep_and_unknown_content(self, manifest, mirrored, monkeypatch):
+        """Test that 'keep' and new content leave the file alone."""
+        copy, digest = mirrored
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "keep")
+        assert manifest.deduplicate("https://mirror/mirror.png", str(copy), digest) == str(copy)
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "hardlink")
+        assert manifest.deduplicate("https://mirror/mirror.png", str(copy), "0" * 64) == str(copy)
+        assert copy.stat().st_nlink == 1
+        assert manifest.duplicates == 0
+
+    def test_skipped_duplicate_is_not_downloaded_again(self, manifest, wallpaper, mirrored, tmp_path, monkeypatch):
+        """Test that the existing-file check follows a skipped duplicate to the kept file."""
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "skip")
+        copy, digest = mirrored
+        wallpaper_scraper.record_download(
+            manifest, "https://mirror/mirror.png", str(copy), 64, 32, 3, 64, 32, "mirror", digest)
+        assert existing_download_ok("https://mirror/mirror.png", str(tmp_path), 64, 32, manifest)
@@ -0,0 +1,326 @@
+"""
+Test streamed image downloads written through a '.part' file.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from src.download_writer import PartFileWriter
+from src.http_client import HttpClient
+from src.utils import DownloadTooLargeError, NetworkError, UndersizedImageError
+from src import wallpaper_scraper
+from src.wallpaper_scraper import download_image
+
+
+def _png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+ROUTES = {
+    "/big.png": _png_bytes(64, 32),
+    "/small.png": _png_bytes(16, 8),
+}
+ROUTES["/mirror.png"] = ROUTES["/big.png"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = ROUTES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Serves one large image with ETag and Range support, dropping the first response halfway."""
+
+    protocol_version = "HTTP/1.1"
+    body = _png_bytes(64, 32) + b"\0" * 200000
+    etag = '"v1"'
+    drop_first = True
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == self.etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.body) - 1}/{len(self.body)}")
+        else:
+            self.send_response(200)
+        payload = self.body[start:]
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        if type(self).drop_first:
+            type(self).drop_first = False
+            self.wfile.write(payload[:len(payload) // 2])
+            self.wfile.flush()
+            # Let the client read what arrived before the connection breaks
+            time.sleep(0.2)
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = _serve(_Handler)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def range_server(monkeypatch):
+    from src.config import CONFIG
+    monkeypatch.setitem(CONFIG, "DOWNLOAD_CHUNK_SIZE", 4096)
+    _RangeHandler.drop_first = True
+    _RangeHandler.requests = []
+    server = _serve(_RangeHandler)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class TestPartFileWriter:
+    """Test the crash-safe '.part' writer."""
+
+    def test_commit_moves_part_into_place(self, tmp_path):
+        """Test that the final file only appears once committed."""
+        target = tmp_path / "image.png"
+        with PartFileWriter(str(target), max_bytes=0) as writer:
+            writer.write(b"abc")
+            writer.write(b"def")
+            assert not target.exists()
+            assert (tmp_path / "image.png.part").exists()
+            writer.commit()
+
+        assert target.read_bytes() == b"abcdef"
+        assert not (tmp_path / "image.png.part").exists()
+
+    def test_failure_leaves_existing_file_untouched(self, tmp_path):
+        """Test that an interrupted download discards the .part and keeps the old file."""
+        target = tmp_path / "image.png"
+        target.write_bytes(b"old")
+
+        with pytest.raises(ConnectionError):
+            with PartFileWriter(str(target), max_bytes=0) as writer:
+                writer.write(b"partial")
+                raise ConnectionError("connection dropped")
+
+        assert target.read_bytes() == b"old"
+        assert not (tmp_path / "image.png.part").exists()
+
+    def test_size_cap(self, tmp_path):
+        """Test that both the announced and the streamed size are checked against the cap."""
+        writer = PartFileWriter(str(tmp_path / "image.png"), max_bytes=4)
+        with pytest.raises(DownloadTooLargeError):
+            writer.check_length("5")
+        writer.check_length("4")
+        writer.check_length(None)
+
+        with pytest.raises(DownloadTooLargeError):
+            with writer:
+                writer.write(b"abc")
+                writer.write(b"de")
+        assert not (tmp_path / "image.png.part").exists()
+
+    def test_undersized_header_aborts_before_writing(self, tmp_path):
+        """Test that an image rejected by its header never creates a .part file."""
+        data = ROUTES["/small.png"]
+        writer = PartFileWriter(str(tmp_path / "small.png"), max_bytes=0,
+                                accept_size=lambda w, h: w >= 64)
+        with pytest.raises(UndersizedImageError, match="16x8"):
+            with writer:
+                writer.write(data[:8])
+                assert not (tmp_path / "small.png.part").exists()
+                writer.write(data[8:])
+        assert writer.size == (16, 8)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_accepted_header_writes_held_chunks(self, tmp_path):
+        """Test that chunks held for the header check are written once it passes."""
+        data = ROUTES["/big.png"]
+        target = tmp_path / "big.png"
+        with PartFileWriter(str(target), max_bytes=0, accept_size=lambda w, h: w >= 64) as writer:
+            for i in range(0, len(data), 7):
+                writer.write(data[i:i + 7])
+            writer.commit()
+        assert target.read_bytes() == data
+
+
+class TestDownloadImage:
+    """Test the threaded engine's streamed download_image."""
+
+    def test_streams_acceptable_image(self, server_url, tmp_path):
+        """Test that an image meeting the resolution is written to its final path."""
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{server_url}/big.png", str(tmp_path), 5, 1, 0, {}, 64, 32, client) is True
+        assert (tmp_path / "big.png").read_bytes() == ROUTES["/big.png"]
+        assert not (tmp_path / "big.png.part").exists()
+
+    def test_existing_file_not_checked_twice(self, server_url, tmp_path, monkeypatch):
+        """Test that a file the worker already found lacking is replaced without opening it again."""
+        Image.new("RGB", (16, 8)).save(tmp_path / "big.png")
+
+        def fail(*args):
+            raise AssertionError("existing file checked again")
+
+        monkeypatch.setattr(wallpaper_scraper, "check_existing_download", fail)
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{server_url}/big.png", str(tmp_path), 5, 1, 0, {}, 64, 32, client,
+                existing_checked=True) is True
+        assert (tmp_path / "big.png").read_bytes() == ROUTES["/big.png"]
+
+    def test_records_download_in_manifest(self, server_url, tmp_path):
+        """Test that a verified download is recorded with its dimensions and site."""
+        from src.download_manifest import DownloadManifest
+        manifest = DownloadManifest(str(tmp_path))
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{server_url}/big.png", str(tmp_path), 5, 1, 0, {}, 64, 32, client,
+                manifest=manifest, site="example") is True
+        entry = manifest.lookup(f"{server_url}/big.png")
+        manifest.close()
+        assert (entry.width, entry.height, entry.site) == (64, 32, "example")
+
+    def test_cross_site_duplicate_is_hardlinked(self, server_url, tmp_path, monkeypatch):
+        """Test that the same bytes from a second URL end up as a hardlink to the first."""
+        from src.config import CONFIG
+        from src.download_manifest import DownloadManifest
+        monkeypatch.setitem(CONFIG, "DUPLICATE_ACTION", "hardlink")
+        manifest = DownloadManifest(str(tmp_path))
+        with HttpClient(pool_size=1) as client:
+            for name in ("big.png", "mirror.png"):
+                assert download_image(
+                    f"{server_url}/{name}", str(tmp_path), 5, 1, 0, {}, 64, 32, client,
+                    manifest=manifest) is True
+        entry = manifest.lookup(f"{server_url}/mirror.png")
+        saved = manifest.bytes_saved
+        manifest.close()
+        assert entry.sha256 == hashlib.sha256(ROUTES["/big.png"]).hexdigest()
+        assert (tmp_path / "big.png").samefile(tmp_path / "mirror.png")
+        assert saved == len(ROUTES["/big.png"])
+
+    def test_aborts_undersized_image(self, server_url, tmp_path):
+        """Test that an undersized image is aborted without leaving any file."""
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{server_url}/small.png", str(tmp_path), 5, 1, 0, {}, 64, 32, client) is False
+        assert list(tmp_path.iterdir()) == []
+
+    def test_oversized_image_is_skipped(self, server_url, tmp_path):
+        """Test that max_bytes aborts the download without retrying or leaving files."""
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{server_url}/big.png", str(tmp_path), 5, 3, 0, {}, http_client=client,
+                max_bytes=10) is False
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestResume:
+    """Test resuming broken downloads with Range requests."""
+
+    def test_partial_file_is_resumed(self, range_server, tmp_path):
+        """Test that the retry after a dropped connection only fetches the missing bytes."""
+        with HttpClient(pool_size=1) as client:
+            assert download_image(
+                f"{range_server}/wide.png", str(tmp_path), 5, 2, 0, {}, 64, 32, client) is True
+
+        assert (tmp_path / "wide.png").read_bytes() == _RangeHandler.body
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["wide.png"]
+        first, second = _RangeHandler.requests
+        assert "Range" not in first
+        offset = int(second["Range"].split("=")[1].rstrip("-"))
+        assert offset >= len(_RangeHandler.body) // 4
+        assert second["If-Range"] == '"v1"'
+
+    def test_async_partial_file_is_resumed(self, range_server, tmp_path, monkeypatch):
+        """Test that the async engine resumes from the .part file as well."""
+        pytest.importorskip("aiohttp")
+        from src.async_engine import AsyncHttpClient, download_image_async
+        from src.config import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_RETRIES", 2)
+        monkeypatch.setitem(CONFIG, "RETRY_DELAY", 0)
+
+        async def run():
+            async with AsyncHttpClient() as client:
+                return await download_image_async(
+                    f"{range_server}/wide.png", str(tmp_path), client, {}, 64, 32)
+
+        assert asyncio.run(run()) is True
+        assert (tmp_path / "wide.png").read_bytes() == _RangeHandler.body
+        assert "Range" in _RangeHandler.requests[1]
+
+    def test_partial_survives_for_next_run(self, tmp_path):
+        """Test that a broken transfer keeps the .part file and its validators."""
+        target = tmp_path / "wide.png"
+        with pytest.raises(ConnectionError):
+            with PartFileWriter(str(target), max_bytes=0) as writer:
+                writer.begin(200, {"Content-Length": "10", "Accept-Ranges": "bytes", "ETag": '"v1"'})
+                writer.write(b"abcd")
+                raise ConnectionError("connection dropped")
+
+        assert json.loads((tmp_path / "wide.png.part.json").read_text())["etag"] == '"v1"'
+        writer = PartFileWriter(str(target), max_bytes=0)
+        assert writer.request_headers() == {"Range": "bytes=4-", "If-Range": '"v1"'}
+
+        with writer:
+            writer.begin(206, {"Content-Range": "bytes 4-9/10", "ETag": '"v1"'})
+            writer.write(b"efghij")
+            writer.commit()
+        assert target.read_bytes() == b"abcdefghij"
+        assert writer.sha256 == hashlib.sha256(b"abcdefghij").hexdigest()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["wide.png"]
+
+    def test_changed_resource_restarts(self, tmp_path):
+        """Test that a 206 for a different ETag or offset discards the partial data."""
+        (tmp_path / "wide.png.part").write_bytes(b"abcd")
+        (tmp_path / "wide.png.part.json").write_text(json.dumps({"etag": '"v1"', "length": 10}))
+
+        writer = PartFileWriter(str(tmp_path / "wide.png"), max_bytes=0)
+        with pytest.raises(NetworkError, match="rejected the resume"):
+            writer.begin(206, {"Content-Range": "bytes 4-9/10", "ETag": '"v2"'})
+        assert list(tmp_path.iterdir()) == []
+
+    def test_no_resume_without_range_support(self, tmp_path):
+        """Test that a broken transfer is removed when the server does not accept ranges."""
+        with pytest.raises(ConnectionError):
+            with PartFileWriter(str(tmp_path / "wide.png"), max_bytes=0) as writer:
+                writer.begin(200, {"Content-Length": "10", "ETag": '"v1"'})
+                writer.write(b"abcd")
+                raise ConnectionError("connection dropped")
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,76 @@
+"""
+Test the HTML parsing backend and the services' strained page parsing.
+"""
+import pytest
+
+from src import html_parser
+from src.config import CONFIG
+from src.html_parser import compile_selector, parse_html, parser_name, strainer
+from src.services.wallhaven_service import WallhavenService
+from src.services.wallpaperbat_service import WallpaperBatService
+from src.services.wallpaperswide_service import WallpapersWideService
+
+NOISE = '<header><nav><a href="/about">About</a><div class="menu"><img src="/logo.png"></div></nav></header>'
+
+PAGES = [
+    (WallhavenService, '_parse_search_page',
+     '<figure class="thumb thumb-1 thumb-sfw"><a class="preview" href="/w/1"></a></figure>'
+     '<figure class="thumb"><a class="preview" href="https://wallhaven.cc/w/2"></a></figure>'
+     '<figure class="other"><a class="preview" href="/w/3"></a></figure>'),
+    (WallhavenService, '_detail_options',
+     '<img src="/thumb.jpg"><img id="wallpaper" src="/full/1.jpg" data-wallpaper-width="5120" '
+     'data-wallpaper-height="1440">'),
+    (WallpaperBatService, '_parse_search_page',
+     '<div class="wallpapers grid"><a href="/wallpaper/1"><img src="/t/1.jpg"></a></div>'),
+    (WallpaperBatService, '_parse_search_page',
+     '<div class="list"><a href="/wallpaper/2"><img src="/t/2.jpg"></a><a href="/about">text only</a></div>'),
+    (WallpaperBatService, '_detail_options',
+     '<img class="img-wallpaper" src="/img/1.jpg" width="5120" height="1440">'
+     '<a class="btn btn-download" href="/dl/1.jpg">Download 7680 x 2160</a>'),
+    (WallpapersWideService, '_parse_theme_page',
+     '<div class="item thumb"><a href="/a-wallpapers.html"><img src="/a.jpg"></a></div>'),
+    (WallpapersWideService, '_detail_options',
+     '<a href="/download/a-wallpaper-5120x1440.jpg">5120x1440</a><a href="/download/a-wallpaper-1920x1080.jpg">'
+     '1920x1080</a><a href="/page.html">5120x1440</a>'),
+]
+
+
+class TestBackend:
+    """Test parser selection, strainers and compiled selectors."""
+
+    def test_parser_name(self, monkeypatch):
+        """Test that auto picks lxml only when it is installed and unknown values fall back to auto."""
+        monkeypatch.setitem(CONFIG, 'HTML_PARSER', 'html.parser')
+        assert parser_name() == 'html.parser'
+        monkeypatch.setattr(html_parser, 'lxml', None)
+        html_parser._resolve_parser.cache_clear()
+        for choice in ('auto', 'lxml', 'bogus'):
+            monkeypatch.setitem(CONFIG, 'HTML_PARSER', choice)
+            assert parser_name() == 'html.parser'
+        html_parser._resolve_parser.cache_clear()
+
+    def test_strainer_matches_one_of_several_classes(self):
+        """Test that a class strainer keeps elements carrying the class among others, and nothing else."""
+        html = '<div class="a thumb b"><p>x</p></div><div class="thumbnail"></div><span class="thumb"></span>'
+        soup = parse_html(html, strainer('div', ('thumb', 'item')))
+        assert [str(tag) for tag in soup.find_all('div')] == ['<div class="a thumb b"><p>x</p></div>']
+
+    def test_compile_selector_is_cached(self):
+        """Test that a selector is compiled once and selects like Tag.select."""
+        assert compile_selector('a.preview') is compile_selector('a.preview')
+        soup = parse_html('<a class="preview" href="/1"></a><a href="/2"></a>')
+        assert compile_selector('a.preview').select(soup) == soup.select('a.preview')
+
+
+class TestStrainedPages:
+    """Test that strained parsing finds what a full parse of the page finds."""
+
+    @pytest.mark.parametrize('service_class, method, body', PAGES)
+    def test_same_result_as_full_parse(self, service_class, method, body):
+        """Test that every page type gives the same result with and without its strainer."""
+        html = f'<html><body>{NOISE}<main>{body}</main>{NOISE}</body></html>'
+        service = service_class('5120x1440', ['nature'], http_client=object())
+        strained = getattr(service, method)(html)
+        service.PAGE_STRAINERS = {}
+        assert strained
+        assert strained == getattr(service, method)(html)
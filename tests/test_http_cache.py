@@ -0,0 +1,119 @@
+"""
+Test the on-disk conditional HTTP page cache.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+import pytest
+
+from src.http_cache import HttpCache
+from src.http_client import HttpClient
+
+PAGE = "<html>café wallpapers</html>".encode("utf-8")
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _Handler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def unlimited():
+    return Mock()
+
+
+class TestHttpCache:
+    """Test cache storage, freshness and eviction."""
+
+    def test_store_and_lookup(self, tmp_path):
+        """Test that a stored page round-trips with its validators."""
+        cache = HttpCache(directory=str(tmp_path), ttl=60)
+        cache.store("https://example.com/a", PAGE, "utf-8", ETAG, "Mon, 01 Jan 2024 00:00:00 GMT")
+
+        entry = cache.lookup("https://example.com/a")
+        assert entry.text == PAGE.decode("utf-8")
+        assert cache.is_fresh(entry)
+        assert cache.conditional_headers(entry) == {
+            "If-None-Match": ETAG, "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        assert cache.lookup("https://example.com/missing") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that entries survive reopening the cache (repeat runs)."""
+        HttpCache(directory=str(tmp_path)).store("https://example.com/a", PAGE, "utf-8")
+        assert HttpCache(directory=str(tmp_path)).lookup("https://example.com/a").body == PAGE
+
+    def test_lru_eviction(self, tmp_path, monkeypatch):
+        """Test that the least recently used page is evicted once over the size limit."""
+        clock = iter(range(1000, 2000))
+        monkeypatch.setattr("src.http_cache.time.time", lambda: next(clock))
+        cache = HttpCache(directory=str(tmp_path), max_bytes=25)
+        cache.store("https://example.com/a", b"a" * 10)
+        cache.store("https://example.com/b", b"b" * 10)
+        cache.lookup("https://example.com/a")  # a is now more recent than b
+
+        cache.store("https://example.com/c", b"c" * 10)
+        assert cache.lookup("https://example.com/b") is None
+        assert cache.lookup("https://example.com/a") is not None
+        assert cache.lookup("https://example.com/c") is not None
+
+
+class TestHttpClientCaching:
+    """Test cache hits and revalidation through HttpClient.get()."""
+
+    def test_fresh_hit_skips_network(self, tmp_path, server_url, unlimited):
+        """Test that a fresh entry is served without a request."""
+        client = HttpClient(rate_limiter=unlimited, cache=HttpCache(directory=str(tmp_path), ttl=60))
+        first = client.get(f"{server_url}/page", cache=True, timeout=5)
+        second = client.get(f"{server_url}/page", cache=True, timeout=5)
+
+        assert first.text == second.text == PAGE.decode("utf-8")
+        assert len(_Handler.requests_seen) == 1
+        assert client.cache.hits == 1
+
+    def test_stale_entry_revalidates_with_etag(self, tmp_path, server_url, unlimited):
+        """Test that a stale entry sends If-None-Match and reuses the body on 304."""
+        client = HttpClient(rate_limiter=unlimited, cache=HttpCache(directory=str(tmp_path), ttl=0))
+        client.get(f"{server_url}/page", cache=True, timeout=5)
+        response = client.get(f"{server_url}/page", cache=True, timeout=5)
+
+        assert response.status_code == 200
+        assert response.text == PAGE.decode("utf-8")
+        assert _Handler.requests_seen[1].get("If-None-Match") == ETAG
+        assert client.cache.revalidated == 1
+
+    def test_uncached_requests_bypass_cache(self, tmp_path, server_url, unlimited):
+        """Test that requests without cache=True never touch the cache."""
+        client = HttpClient(rate_limiter=unlimited, cache=HttpCache(directory=str(tmp_path), ttl=60))
+        client.get(f"{server_url}/page", timeout=5)
+        client.get(f"{server_url}/page", timeout=5)
+
+        assert len(_Handler.requests_seen) == 2
+        assert client.cache.lookup(f"{server_url}/page") is None
@@ -0,0 +1,67 @@
+"""
+Test the shared pooled HTTP transport layer.
+"""
+import pytest
+from unittest.mock import Mock
+
+from src.http_client import HttpClient, get_default_client
+from src.services.wallhaven_service import WallhavenService
+from src.services.wallpaperbat_service import WallpaperBatService
+from src.services.wallpaperswide_service import WallpapersWideService
+
+
+class TestHttpClient:
+    """Test per-host session pooling."""
+
+    def test_same_host_reuses_session(self):
+        """Test that URLs on one host share a single session."""
+        with HttpClient(pool_size=2) as client:
+            first = client.session_for("https://wallhaven.cc/search?q=nature")
+            second = client.session_for("https://WALLHAVEN.cc/w/abc123")
+            assert first is second
+
+    def test_different_hosts_get_separate_sessions(self):
+        """Test that each host gets its own session."""
+        with HttpClient(pool_size=2) as client:
+            a = client.session_for("https://wallhaven.cc/")
+            b = client.session_for("https://wallpaperbat.com/")
+            assert a is not b
+
+    def test_pool_size_follows_workers(self):
+        """Test that the adapter connection pool is sized from pool_size."""
+        with HttpClient(pool_size=7) as client:
+            session = client.session_for("https://wallhaven.cc/")
+            adapter = session.get_adapter("https://wallhaven.cc/")
+            assert adapter._pool_maxsize == 7
+
+    def test_get_routes_through_host_session(self):
+        """Test that get() uses the pooled session for the URL's host."""
+        client = HttpClient(pool_size=1)
+        session = client.session_for("https://example.com/")
+        response = Mock(status_code=200)
+        session.get = Mock(return_value=response)
+
+        assert client.get("https://example.com/page", timeout=5) is response
+        session.get.assert_called_once_with("https://example.com/page", timeout=5)
+
+    def test_close_drops_sessions(self):
+        """Test that close() releases all pooled sessions."""
+        client = HttpClient(pool_size=1)
+        session = client.session_for("https://example.com/")
+        client.close()
+        assert client.session_for("https://example.com/") is not session
+
+    def test_default_client_is_shared(self):
+        """Test that the default client is a process-wide singleton."""
+        assert get_default_client() is get_default_client()
+
+
+@pytest.mark.parametrize("svc_cls", [WallhavenService, WallpaperBatService, WallpapersWideService])
+def test_services_use_injected_client(svc_cls):
+    """Test that services fetch through the injected client."""
+    client = Mock()
+    client.get.return_value = Mock(status_code=200, text="<html></html>")
+    svc = svc_cls(resolution="5120x1440", themes=["nature"], http_client=client)
+
+    assert svc.http is client
+    assert svc._fetch_with_retry("https://example.com/") is client.get.return_value
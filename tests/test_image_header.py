@@ -0,0 +1,94 @@
+"""
+Test header-only image dimension reading.
+"""
+import io
+
+import pytest
+from PIL import Image
+
+from src.image_header import ImageSizeProbe, read_file_size, read_image_size
+
+
+def _image_bytes(width, height, fmt, **save_kwargs):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+class TestReadImageSize:
+    """Test parsing dimensions from the first bytes of a file."""
+
+    @pytest.mark.parametrize("fmt, save_kwargs", [
+        ("PNG", {}),
+        ("JPEG", {}),
+        ("JPEG", {"progressive": True}),
+        ("GIF", {}),
+        ("WEBP", {}),
+        ("WEBP", {"lossless": True}),
+    ])
+    def test_formats(self, fmt, save_kwargs):
+        """Test that each supported format reports PIL's dimensions."""
+        data = _image_bytes(321, 123, fmt, **save_kwargs)
+        assert read_image_size(data) == (321, 123)
+
+    def test_jpeg_with_large_metadata_segment(self):
+        """Test that JPEG segments before the frame header are skipped by length."""
+        data = _image_bytes(640, 200, "JPEG", icc_profile=b"\0" * 5000)
+        assert read_image_size(data[:100]) is None
+        assert read_image_size(data) == (640, 200)
+
+    def test_truncated_and_unknown(self):
+        """Test that incomplete headers and unknown formats return None."""
+        assert read_image_size(_image_bytes(10, 10, "PNG")[:20]) is None
+        assert read_image_size(b"<html>not an image</html>") is None
+
+
+class TestImageSizeProbe:
+    """Test the incremental probe fed with download chunks."""
+
+    def test_size_known_after_enough_chunks(self):
+        """Test that the probe reports the size once the header is complete."""
+        data = _image_bytes(500, 40, "PNG")
+        probe = ImageSizeProbe()
+        assert probe.feed(data[:10]) is None
+        assert not probe.done
+        assert probe.feed(data[10:30]) == (500, 40)
+        assert probe.done
+
+    def test_gives_up_on_unknown_format(self):
+        """Test that an unsupported signature ends probing immediately."""
+        probe = ImageSizeProbe()
+        assert probe.feed(b"BM" + b"\0" * 40) is None
+        assert probe.done
+
+    def test_gives_up_after_max_bytes(self):
+        """Test that a header that never completes stops after max_bytes."""
+        probe = ImageSizeProbe(max_bytes=64)
+        probe.feed(b"\xff\xd8\xff\xe1\xff\xff")
+        assert not probe.done
+        probe.feed(b"\0" * 64)
+        assert probe.done and probe.size is None
+
+
+class TestReadFileSize:
+    """Test reading dimensions from files through a memory map."""
+
+    @pytest.mark.parametrize("fmt", ["PNG", "JPEG", "WEBP"])
+    def test_formats(self, tmp_path, fmt):
+        """Test that files report the same dimensions as PIL."""
+        path = tmp_path / f"image.{fmt.lower()}"
+        path.write_bytes(_image_bytes(5120, 1440, fmt))
+        assert read_file_size(str(path)) == (5120, 1440)
+
+    def test_jpeg_header_past_probe_limit(self, tmp_path):
+        """Test that a JPEG frame header behind large metadata is still found."""
+        path = tmp_path / "exif.jpg"
+        path.write_bytes(_image_bytes(640, 200, "JPEG", icc_profile=b"\0" * 300000))
+        assert read_file_size(str(path)) == (640, 200)
+
+    def test_empty_and_unsupported(self, tmp_path):
+        """Test that empty files and other formats return None for the PIL fallback."""
+        (tmp_path / "empty.png").write_bytes(b"")
+        (tmp_path / "image.bmp").write_bytes(_image_bytes(10, 10, "BMP"))
+        assert read_file_size(str(tmp_path / "empty.png")) is None
+        assert read_file_size(str(tmp_path / "image.bmp")) is None
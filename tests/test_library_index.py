@@ -0,0 +1,101 @@
+"""
+Test the cached image dimensions index and the parallel library scan.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+from src import library_index
+from src.library_index import LibraryIndex, is_library_image
+
+CLI_PATH = os.path.join(os.path.dirname(__file__), '..', 'main.py')
+
+
+@pytest.fixture
+def index():
+    index = LibraryIndex()
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def library(tmp_path):
+    Image.new("RGB", (64, 32)).save(tmp_path / "a.png")
+    Image.new("RGB", (40, 20)).save(tmp_path / "b.jpg")
+    (tmp_path / "nested").mkdir()
+    Image.new("RGB", (80, 40)).save(tmp_path / "nested" / "c.png")
+    (tmp_path / "d.png.part").write_bytes(b"partial")
+    (tmp_path / "d.png.part.json").write_text("{}")
+    (tmp_path / "notes.txt").write_text("not an image")
+    return tmp_path
+
+
+class TestLibraryIndex:
+    """Test dimension lookups keyed by path, size and mtime."""
+
+    def test_dimensions_cached_until_file_changes(self, index, library, monkeypatch):
+        """Test that a file is read once and again only after it changes."""
+        reads = []
+        real_read = library_index.read_dimensions
+        monkeypatch.setattr(library_index, "read_dimensions", lambda p: reads.append(p) or real_read(p))
+        path = str(library / "a.png")
+
+        assert index.dimensions(path) == (64, 32)
+        assert index.dimensions(path) == (64, 32)
+        assert len(reads) == 1
+
+        Image.new("RGB", (128, 64)).save(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert index.dimensions(path) == (128, 64)
+        assert len(reads) == 2
+
+    def test_pil_fallback(self, tmp_path):
+        """Test that formats without a header parser are read with PIL."""
+        Image.new("RGB", (30, 10)).save(tmp_path / "image.png", format="BMP")
+        assert library_index.read_dimensions(str(tmp_path / "image.png")) == (30, 10)
+
+    def test_unreadable_file(self, index, library):
+        """Test that a non-image returns None."""
+        assert index.dimensions(str(library / "notes.txt")) is None
+
+    def test_part_files_are_not_library_images(self):
+        """Test that in-progress downloads and their sidecars are ignored."""
+        assert is_library_image("wall.PNG")
+        assert not is_library_image("wall.png.part")
+        assert not is_library_image("wall.png.part.json")
+
+
+class TestLibraryScan:
+    """Test the parallel folder scan."""
+
+    def test_scan_reads_new_files_once(self, index, library):
+        """Test that the first scan reads every image and the second only stats them."""
+        report = index.scan(str(library), workers=3)
+        assert (report.files, report.cached, report.read, report.failed) == (3, 0, 3, 0)
+        assert index.dimensions(str(library / "nested" / "c.png")) == (80, 40)
+
+        report = index.scan(str(library), workers=3)
+        assert (report.files, report.cached, report.read) == (3, 3, 0)
+        assert report.files_per_second > 0
+
+    def test_scan_drops_removed_files(self, index, library):
+        """Test that files deleted since the last scan leave the index."""
+        index.scan(str(library))
+        (library / "b.jpg").unlink()
+        report = index.scan(str(library))
+        assert report.files == 2
+        assert index.get(str(library / "b.jpg"), 0, 0) is None
+        assert index._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 2
+
+    def test_rescan_library_cli(self, library):
+        """Test that --rescan-library reports the scan."""
+        result = subprocess.run(
+            [sys.executable, CLI_PATH, '--rescan-library', '--output', str(library), '--dry-run'],
+            capture_output=True, text=True, timeout=60,
+            env={**os.environ, "LIBRARY_INDEX_ENABLED": "false"})
+        assert result.returncode == 0
+        assert "Scanned 3 wallpapers" in result.stdout + result.stderr
@@ -0,0 +1,249 @@
+"""
+Test streamed extraction of detail links from listing pages.
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.config import CONFIG
+from src.http_cache import HttpCache
+from src.http_client import HttpClient
+from src.listing_extractor import ListingExtractor
+from src.rate_limiter import HostRateLimiter
+from src.services.wallhaven_service import WallhavenService
+from src.services.wallpaperbat_service import WallpaperBatService
+from src.services.wallpaperswide_service import WallpapersWideService
+
+CHROME = '<nav><a href="/about">About</a><div class="menu"><a href="/top">Top</a></div></nav>'
+BIG_LISTING = ('<html><body>' + ''.join(
+    f'<figure class="thumb thumb-sfw"><img src="/t/{i}.jpg"><a class="preview" href="/w/{i}"></a>'
+    f'<div class="thumb-info">{"x" * 200}</div></figure>' for i in range(2000)) + '</body></html>').encode()
+
+PAGES = [
+    (WallhavenService, 'search', '_parse_search_page',
+     '<figure class="thumb thumb-1"><a href="/tag/1">tag</a><a class="preview" href="/w/1"></a>'
+     '<a class="preview" href="/w/1b"></a></figure><figure class="thumb"><a class="preview"></a></figure>'
+     '<figure class="thumb"><a class="preview" href="https://wallhaven.cc/w/2"></a></figure>'),
+    (WallpaperBatService, 'search', '_parse_search_page',
+     '<div class="wallpapers grid"><div class="card"><a href="/wallpaper/1"><img src="/1.jpg"></a></div>'
+     '<a href="/wallpaper/2">two</a></div><a href="/outside">x</a>'),
+    (WallpapersWideService, 'theme', '_parse_theme_page',
+     '<div class="wallpaper"><div class="thumb"><a href="/a-wallpapers.html"><img src="/a.jpg"></a></div>'
+     '<a href="/a-other.html">x</a></div><div class="wallpaper"><span>no link</span></div>'
+     '<div class="wallpaper"><a href="/b-wallpapers.html">b</a></div>'),
+]
+
+
+def _feed_in_chunks(extractor, html, size):
+    found = []
+    for start in range(0, len(html), size):
+        found.extend(extractor.feed(html[start:start + size]))
+    found.extend(extractor.close())
+    return found
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = BIG_LISTING if self.path == '/big' else b'<figure class="thumb"><a class="preview" href="/w/x"></a></figure>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass  # The client hung up once it had enough links
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def _wallhaven_extractor(limit=10):
+    return ListingExtractor(WallhavenService.LISTING_RULES['search'], WallhavenService.BASE_URL, limit)
+
+
+class TestListingExtractor:
+    """Test the incremental parser against the full-page parsers."""
+
+    @pytest.mark.parametrize('service_class, page, method, body', PAGES)
+    @pytest.mark.parametrize('chunk', [1, 7, 4096])
+    def test_same_links_as_full_parse(self, service_class, page, method, body, chunk):
+        """Test that streamed links equal the BeautifulSoup parse, however the page is split."""
+        html = f'<html><body>{CHROME}{body}{CHROME}</body></html>'
+        service = service_class('5120x1440', ['nature'], http_client=object())
+        extractor = ListingExtractor(service.LISTING_RULES[page], service.BASE_URL, limit=10)
+        assert _feed_in_chunks(extractor, html, chunk) == getattr(service, method)(html)
+        assert extractor.links and extractor.text is None
+
+    def test_stops_at_limit(self):
+        """Test that the extractor is done after the limit and ignores the rest of the page."""
+        extractor = _wallhaven_extractor(limit=3)
+        html = BIG_LISTING.decode()
+        found = extractor.feed(html[:5000])
+        assert found == [f'https://wallhaven.cc/w/{i}' for i in range(3)]
+        assert extractor.done
+        assert extractor.feed(html[5000:]) == [] and extractor.chars_fed == 5000
+
+    @pytest.mark.parametrize('chunk', [1, 7, 4096])
+    def test_link_titles(self, chunk):
+        """Test that each link's title comes from its title attribute, image alt text or text."""
+        rule = WallpaperBatService.LISTING_RULES['search']
+        extractor = ListingExtractor(rule, WallpaperBatService.BASE_URL, limit=10)
+        html = ('<div class="wallpapers"><a href="/w/1" title="Misty Lake"><img alt="ignored"></a>'
+                '<a href="/w/2"><img src="/2.jpg" alt=" Ocean Sunset "></a>'
+                '<a href="/w/3"> City\n  Night </a><a href="/w/4"><img src="/4.jpg"></a></div>')
+        _feed_in_chunks(extractor, html, chunk)
+        assert extractor.titles == {
+            'https://wallpaperbat.com/w/1': 'Misty Lake',
+            'https://wallpaperbat.com/w/2': 'Ocean Sunset',
+            'https://wallpaperbat.com/w/3': 'City Night',
+        }
+
+    def test_keeps_text_when_nothing_matches(self):
+        """Test that the text of a page with another layout is kept for a full parse."""
+        extractor = _wallhaven_extractor()
+        html = f'<html><body>{CHROME}<div class="list"><a href="/w/1">1</a></div></body></html>'
+        assert _feed_in_chunks(extractor, html, 16) == []
+        assert extractor.text == html
+
+
+class TestStreamPage:
+    """Test streaming listing pages through the HTTP clients."""
+
+    def test_closes_connection_once_enough_links(self, server_url, tmp_path):
+        """Test that a large listing is cut off after the limit and not cached."""
+        cache = HttpCache(directory=str(tmp_path), ttl=60)
+        client = HttpClient(pool_size=1, rate_limiter=HostRateLimiter(rate=1000, burst=10), cache=cache)
+        extractor = _wallhaven_extractor()
+
+        response = client.stream_page(f'{server_url}/big', extractor, cache=True, chunk_size=4096)
+
+        assert response.status_code == 200
+        assert len(extractor.links) == 10
+        assert extractor.chars_fed < len(BIG_LISTING) // 100
+        assert cache.lookup(f'{server_url}/big') is None
+        cache.close()
+
+    def test_page_read_to_end_is_cached(self, server_url, tmp_path):
+        """Test that a page read completely is cached and then served without a request."""
+        cache = HttpCache(directory=str(tmp_path), ttl=60)
+        client = HttpClient(pool_size=1, rate_limiter=HostRateLimiter(rate=1000, burst=10), cache=cache)
+        url = f'{server_url}/small'
+
+        client.stream_page(url, _wallhaven_extractor(), cache=True)
+        client.session_for(url).get = None  # Any further request would fail
+        extractor = _wallhaven_extractor()
+        client.stream_page(url, extractor, cache=True)
+
+        assert extractor.links == ['https://wallhaven.cc/w/x']
+        cache.close()
+
+    def test_service_falls_back_to_full_parse(self, monkeypatch):
+        """Test that a page the rule misses is parsed in full without a second request."""
+        service = WallpaperBatService('5120x1440', ['nature'], http_client=object())
+        html = '<div class="item"><a href="/wallpaper/9">x</a></div>'
+
+        class Client:
+            calls = 0
+
+            def stream_page(self, url, reader, **kwargs):
+                Client.calls += 1
+                reader.feed(html)
+                reader.close()
+                return type('Response', (), {'status_code': 200})()
+
+        service.http = Client()
+        links = service._listing_links('https://wallpaperbat.com/search?q=x', 'search', service._parse_search_page)
+        assert links == ['https://wallpaperbat.com/wallpaper/9']
+        assert Client.calls == 1
+
+        monkeypatch.setitem(CONFIG, 'STREAM_LISTINGS', False)
+        assert service._listing_extractor('search') is None
+
+    def test_async_stream_page(self, server_url):
+        """Test that the async client stops reading once the extractor is done."""
+        pytest.importorskip('aiohttp')
+        from src.async_engine import AsyncHttpClient
+
+        async def run():
+            async with AsyncHttpClient(rate_limiter=HostRateLimiter(rate=1000, burst=10)) as client:
+                return await client.stream_page(f'{server_url}/big', _wallhaven_extractor)
+
+        extractor = asyncio.run(run())
+        assert len(extractor.links) == 10
+        assert extractor.chars_fed < len(BIG_LISTING) // 10
+
+
+THUMBS = (
+    '<figure class="thumb thumb-abc123" data-wallpaper-id="abc123"><img data-src="/small/ab/abc123.jpg">'
+    '<a class="preview" href="https://wallhaven.cc/w/abc123"></a><div class="thumb-info">'
+    '<span class="wall-res">5120 x 1440</span><span class="png"><span>PNG</span></span></div></figure>'
+    '<figure class="thumb thumb-de45"><a class="preview" href="https://wallhaven.cc/w/de45"></a>'
+    '<div class="thumb-info"><span class="wall-res">5120\n x 1440</span></div></figure>'
+    '<figure class="thumb thumb-ff99"><a class="preview" href="https://wallhaven.cc/w/ff99"></a></figure>')
+
+
+class TestListingFields:
+    """Test the per-result fields of a listing and wallhaven.cc's detail-free results."""
+
+    @pytest.mark.parametrize('chunk', [1, 7, 4096])
+    def test_fields_per_link(self, chunk):
+        """Test that field texts are collected per link, whitespace-normalized, however the page is split."""
+        extractor = _wallhaven_extractor()
+        _feed_in_chunks(extractor, f'<html><body>{CHROME}{THUMBS}</body></html>', chunk)
+        assert extractor.fields == {
+            'https://wallhaven.cc/w/abc123': {'wall-res': '5120 x 1440', 'png': 'PNG'},
+            'https://wallhaven.cc/w/de45': {'wall-res': '5120 x 1440'},
+            'https://wallhaven.cc/w/ff99': {},
+        }
+
+    def test_result_read_to_end_before_done(self):
+        """Test that the last result's fields are read before the extractor stops."""
+        extractor = _wallhaven_extractor(limit=1)
+        extractor.feed(THUMBS)
+        assert extractor.done and extractor.links == ['https://wallhaven.cc/w/abc123']
+        assert extractor.fields['https://wallhaven.cc/w/abc123']['wall-res'] == '5120 x 1440'
+
+    @pytest.mark.parametrize('stream', [True, False])
+    def test_detail_page_only_when_ambiguous(self, stream, monkeypatch):
+        """Test that results listing their resolution skip the detail page, streamed or parsed in full."""
+        monkeypatch.setitem(CONFIG, 'STREAM_LISTINGS', stream)
+        monkeypatch.setitem(CONFIG, 'WALLHAVEN_USE_API', False)
+        requested = []
+        detail = ('<img id="wallpaper" src="https://w.wallhaven.cc/full/ff/wallhaven-ff99.webp" '
+                  'data-wallpaper-width="5120" data-wallpaper-height="1440">')
+
+        class Client:
+            def stream_page(self, url, reader, **kwargs):
+                requested.append(url)
+                reader.feed(THUMBS if 'page=' not in url else '')
+                reader.close()
+                return type('Response', (), {'status_code': 200})()
+
+            def get(self, url, **kwargs):
+                requested.append(url)
+                text = detail if url.endswith('/w/ff99') else (THUMBS if 'page=' not in url else '')
+                return type('Response', (), {'status_code': 200, 'text': text})()
+
+        found = []
+        svc = WallhavenService('5120x1440', ['nature'], http_client=Client(), wallpaper_callback=found.append)
+        urls = svc.fetch_wallpapers()
+
+        assert urls == [
+            'https://w.wallhaven.cc/full/ab/wallhaven-abc123.png',
+            'https://w.wallhaven.cc/full/de/wallhaven-de45.jpg',
+            'https://w.wallhaven.cc/full/ff/wallhaven-ff99.webp',
+        ]
+        assert [url for url in requested if '/w/' in url] == ['https://wallhaven.cc/w/ff99']
+        assert (found[0].width, found[0].height, found[0].detail_url) == (5120, 1440, 'https://wallhaven.cc/w/abc123')
@@ -0,0 +1,143 @@
+"""
+Test perceptual-hash near-duplicate detection.
+"""
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src import near_duplicates
+from src.download_manifest import DownloadManifest
+from src.near_duplicates import (
+    NearDuplicateIndex, collapse_near_duplicates, dhash, hamming)
+from src.wallpaper_scraper import CONFIG, remove_near_duplicates
+
+
+def _wallpaper(path, size, seed=1, fmt=None, **save_kwargs):
+    """Draw a deterministic picture so rescaled copies keep the same structure."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (512, 144), "black")
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(512), rng.randrange(144)
+        draw.rectangle([x, y, x + rng.randrange(20, 200), y + rng.randrange(10, 80)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    img.resize(size).save(path, format=fmt, **save_kwargs)
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    yield index
+    index.close()
+
+
+class TestDHash:
+    """Test the difference hash."""
+
+    def test_rescaled_copy_is_close(self, tmp_path):
+        """Test that a smaller JPEG copy hashes within a few bits of the original."""
+        original = _wallpaper(tmp_path / "a.png", (1024, 288))
+        copy = _wallpaper(tmp_path / "b.jpg", (512, 144), quality=70)
+        other = _wallpaper(tmp_path / "c.png", (1024, 288), seed=2)
+
+        assert hamming(dhash(original), dhash(copy)) <= 4
+        assert hamming(dhash(original), dhash(other)) > 10
+
+    def test_numpy_and_python_paths_agree(self, tmp_path, monkeypatch):
+        """Test that the vectorized hash matches the pure-Python fallback."""
+        pytest.importorskip("numpy")
+        path = _wallpaper(tmp_path / "a.png", (1024, 288))
+        vectorized = dhash(path)
+        monkeypatch.setattr(near_duplicates, "np", None)
+        assert dhash(path) == vectorized
+
+
+class TestBKTree:
+    """Test radius queries on the persistent BK-tree."""
+
+    def test_query_matches_brute_force(self, index):
+        """Test that the tree returns exactly the hashes a linear scan finds."""
+        rng = random.Random(7)
+        base = rng.getrandbits(64)
+        values = [base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for _ in range(100)]
+        values += [rng.getrandbits(64) for _ in range(300)]
+        for i, value in enumerate(values):
+            index.add(f"/img/{i}.png", value, 1, 100)
+
+        found = sorted(record.path for _, record in index.query(base, 3))
+        expected = sorted(f"/img/{i}.png" for i, value in enumerate(values) if hamming(base, value) <= 3)
+        assert found == expected
+
+    def test_persisted_and_tombstoned(self, tmp_path):
+        """Test that the tree survives reopening and removed images are not returned."""
+        index = NearDuplicateIndex(str(tmp_path))
+        keep = index.add("/img/keep.png", (1 << 63) | 5, 2, 100)
+        gone = index.add("/img/gone.png", (1 << 63) | 7, 2, 100)
+        index.remove(gone)
+        index.close()
+
+        index = NearDuplicateIndex(str(tmp_path))
+        assert [record.path for _, record in index.query(keep.hash, 2)] == ["/img/keep.png"]
+        assert len(index) == 1
+        index.close()
+
+
+class TestCollapse:
+    """Test keeping only the best version of a near-duplicate."""
+
+    def test_better_resolution_replaces_earlier(self, index, tmp_path):
+        """Test that a later, larger copy replaces the earlier one and repoints the manifest."""
+        small = _wallpaper(tmp_path / "small.jpg", (512, 144))
+        large = _wallpaper(tmp_path / "large.png", (1024, 288))
+        manifest = DownloadManifest(str(tmp_path))
+        manifest.record("https://a/small.jpg", small, 512, 144, 0, "1024x288")
+        manifest.record("https://b/large.png", large, 1024, 288, 3, "1024x288")
+
+        collapse_near_duplicates(index, [(small, 0, 512, 144)], workers=1)
+        report = collapse_near_duplicates(
+            index, [(large, 3, 1024, 288)], workers=1, on_replaced=manifest.repoint)
+
+        assert report.removed == 1
+        assert not (tmp_path / "small.jpg").exists()
+        assert manifest.lookup("https://a/small.jpg").path == large
+        manifest.close()
+
+    def test_worse_copy_is_dropped(self, tmp_path, monkeypatch):
+        """Test that a smaller copy downloaded later is removed, hashed on the process pool."""
+        monkeypatch.setitem(CONFIG, "NEAR_DUPLICATES", True)
+        large = _wallpaper(tmp_path / "large.png", (1024, 288))
+        small = _wallpaper(tmp_path / "small.jpg", (512, 144))
+        other = _wallpaper(tmp_path / "other.png", (1024, 288), seed=3)
+
+        remove_near_duplicates([large, other], str(tmp_path), 1024, 288, workers=2)
+        remove_near_duplicates([small], str(tmp_path), 1024, 288, workers=2)
+
+        assert sorted(p.name for p in tmp_path.glob("*.*g")) == ["large.png", "other.png"]
+
+    def test_off_by_default(self, tmp_path):
+        """Test that no file is deleted unless NEAR_DUPLICATES is turned on."""
+        large = _wallpaper(tmp_path / "large.png", (1024, 288))
+        small = _wallpaper(tmp_path / "small.jpg", (512, 144))
+
+        remove_near_duplicates([large], str(tmp_path), 1024, 288, workers=1)
+        remove_near_duplicates([small], str(tmp_path), 1024, 288, workers=1)
+
+        assert sorted(p.name for p in tmp_path.glob("*.*g")) == ["large.png", "small.jpg"]
+
+    def test_failed_delete_stays_indexed(self, index, tmp_path, monkeypatch):
+        """Test that an earlier copy which cannot be deleted is still compared with later downloads."""
+        small = _wallpaper(tmp_path / "small.jpg", (512, 144))
+        large = _wallpaper(tmp_path / "large.png", (1024, 288))
+        collapse_near_duplicates(index, [(small, 0, 512, 144)], workers=1)
+
+        def refuse(path):
+            raise PermissionError(path)
+
+        monkeypatch.setattr(near_duplicates.os, "remove", refuse)
+        report = collapse_near_duplicates(index, [(large, 3, 1024, 288)], workers=1)
+
+        assert report.removed == 0
+        assert (tmp_path / "small.jpg").exists()
+        assert sorted(record.path for _, record in index.query(dhash(small), 4)) == sorted([small, large])
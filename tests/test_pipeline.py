@@ -0,0 +1,218 @@
+"""
+Test the streaming hand-off from discovery to downloads.
+"""
+import asyncio
+import threading
+
+from src import wallpaper_scraper
+from src.pipeline import (
+    Candidate, CandidateSelector, DownloadStats, DownloadTarget, ThemeBudget, choose_candidate)
+from src.services.base_service import BaseWallpaperService
+from src.services.wallhaven_service import WallhavenService
+
+
+class TestCandidateSelector:
+    """Test streaming dedup and per-theme limits."""
+
+    def test_dedup_and_limit(self):
+        """Test that duplicates are dropped and each theme stops at its limit."""
+        selector = CandidateSelector(max_per_theme=2)
+        assert selector.admit("nature", "a.jpg")
+        assert not selector.admit("space", "a.jpg")
+        assert selector.admit("nature", "b.jpg")
+        assert not selector.admit("nature", "c.jpg")
+        assert selector.admit("space", "c.jpg")
+
+        assert selector.admitted == ["a.jpg", "b.jpg", "c.jpg"]
+        assert selector.found == 5
+        assert selector.unique == 3
+
+    def test_unlimited(self):
+        """Test that no limit admits every unique URL."""
+        selector = CandidateSelector()
+        assert all(selector.admit("nature", f"{i}.jpg") for i in range(50))
+
+    def test_remaining(self):
+        """Test that the free slots of a theme shrink as its URLs are admitted."""
+        selector = CandidateSelector(max_per_theme=2)
+        selector.admit("nature", "a.jpg")
+        assert selector.remaining("nature") == 1
+        assert selector.remaining("space") == 2
+        selector.admit("nature", "b.jpg")
+        selector.admit("nature", "c.jpg")
+        assert selector.remaining("nature") == 0
+        assert CandidateSelector().remaining("nature") is None
+
+    def test_theme_budget(self):
+        """Test that a theme stays open while any target has room and is unlimited if one has no limit."""
+        full, open_ = CandidateSelector(max_per_theme=1), CandidateSelector(max_per_theme=3)
+        full.admit("nature", "a.jpg")
+        open_.admit("nature", "a.jpg")
+        assert ThemeBudget([full, open_]).remaining("nature") == 2
+        assert ThemeBudget([full]).remaining("nature") == 0
+        assert ThemeBudget([full, CandidateSelector()]).remaining("nature") is None
+
+    def test_download_stats(self):
+        """Test that existing files are counted apart from attempted downloads."""
+        stats = DownloadStats()
+        stats.record(already_downloaded=True)
+        stats.record(success=True)
+        stats.record(success=False)
+        assert (stats.already_downloaded, stats.attempted, stats.successes) == (1, 2, 1)
+
+
+class TestCandidate:
+    """Test the compact candidate model and the shared selection rule."""
+
+    OPTIONS = [Candidate("a.jpg", 7680, 2160), Candidate("b.jpg", 5120, 1440), Candidate("c.jpg", 5200, 1600)]
+
+    def test_slots(self):
+        """Test that candidates carry no per-instance dict."""
+        candidate = Candidate("a.jpg", 5120, 1440, site="wallhaven.cc")
+        assert not hasattr(candidate, "__dict__")
+        assert candidate.replace(theme="nature") == Candidate("a.jpg", 5120, 1440, site="wallhaven.cc", theme="nature")
+
+    def test_exact_then_smallest_larger(self):
+        """Test that an exact match wins, otherwise the smallest option above the target."""
+        assert choose_candidate(self.OPTIONS, 5120, 1440).download_url == "b.jpg"
+        assert choose_candidate(self.OPTIONS, 5000, 1400).download_url == "b.jpg"
+        assert choose_candidate(self.OPTIONS, 5200, 1500).download_url == "c.jpg"
+        assert choose_candidate(self.OPTIONS, 10240, 2880) is None
+        assert choose_candidate(self.OPTIONS, 10240, 2880, fallback_to_largest=True).download_url == "a.jpg"
+
+    def test_unknown_size_assumed_to_fit(self):
+        """Test that an option without dimensions is taken but never counted as exact."""
+        options = [Candidate("unknown.jpg"), Candidate("exact.jpg", 3840, 2160)]
+        assert choose_candidate(options, 3840, 2160).download_url == "exact.jpg"
+        assert choose_candidate(options[:1], 3840, 2160).download_url == "unknown.jpg"
+        assert options[0].may_fit(3840, 2160)
+        assert not Candidate("small.jpg", 1920, 1080).may_fit(3840, 2160)
+
+
+class TestServiceEmission:
+    """Test that services hand URLs to the callback as soon as they are found."""
+
+    def test_detail_pages_emit(self):
+        """Test that each detail page's URLs reach the callback with their theme."""
+        found = []
+        svc = WallhavenService(themes=["nature"], wallpaper_callback=lambda c: found.append((c.theme, c.download_url)))
+        svc._process_detail_page = lambda url: {"5120x1440": Candidate(f"{url}.jpg")}
+
+        svc._process_detail_pages(["https://wallhaven.cc/w/1", "https://wallhaven.cc/w/2"], theme="nature")
+
+        assert sorted(found) == [
+            ("nature", "https://wallhaven.cc/w/1.jpg"), ("nature", "https://wallhaven.cc/w/2.jpg")]
+
+    def test_no_theme_no_emission(self):
+        """Test that pages not attributable to a theme are not emitted."""
+        found = []
+        svc = WallhavenService(wallpaper_callback=found.append)
+        svc._process_detail_page = lambda url: {"5120x1440": Candidate(f"{url}.jpg")}
+        svc._process_detail_pages(["https://wallhaven.cc/w/1"])
+        assert found == []
+
+    def test_async_callback_is_awaited(self):
+        """Test that a coroutine callback is awaited by the async detail fan-out."""
+        found = []
+
+        async def on_wallpaper(candidate):
+            found.append(candidate.download_url)
+
+        svc = WallhavenService(wallpaper_callback=on_wallpaper)
+
+        async def detail(client, url):
+            return {"5120x1440": Candidate(f"{url}.jpg")}
+
+        svc._process_detail_page_async = detail
+        asyncio.run(svc._process_detail_pages_async(None, ["u1", "u2"], theme="nature"))
+        assert sorted(found) == ["u1.jpg", "u2.jpg"]
+
+
+class _SlowService(BaseWallpaperService):
+    """Emits two URLs per theme, then waits until a download has started."""
+
+    SITE_NAME = "slow.example"
+    download_started = threading.Event()
+
+    def fetch_wallpapers(self, progress_callback=None):
+        urls = []
+        for theme in self.themes:
+            theme_urls = [f"https://slow.example/{theme}/{i}.jpg" for i in range(3)]
+            self._emit(theme, theme_urls)
+            urls.extend(theme_urls)
+        # Discovery is still running here: downloads must not wait for it
+        assert type(self).download_started.wait(5)
+        return urls
+
+
+class TestThreadedPipeline:
+    """Test that the threaded engine downloads while discovery runs."""
+
+    def test_downloads_start_before_discovery_ends(self, tmp_path, monkeypatch):
+        """Test that admitted URLs are downloaded during discovery, limited per theme."""
+        downloaded = []
+
+        def fake_download(url, *args, **kwargs):
+            downloaded.append(url)
+            _SlowService.download_started.set()
+            return True
+
+        _SlowService.download_started.clear()
+        monkeypatch.setattr(wallpaper_scraper, "download_image", fake_download)
+        monkeypatch.setitem(wallpaper_scraper.CONFIG, "PIPELINE_QUEUE_SIZE", 1)
+
+        targets = [DownloadTarget("64x32", 64, 32, str(tmp_path), max_per_theme=2)]
+        wallpaper_scraper._run_scrape_and_download(
+            ["nature", "space"], targets, ["slow.example"], {"slow.example": _SlowService},
+            2, 5, 1, 0, {}, False, http_client=None)
+
+        assert sorted(downloaded) == [
+            "https://slow.example/nature/0.jpg", "https://slow.example/nature/1.jpg",
+            "https://slow.example/space/0.jpg", "https://slow.example/space/1.jpg"]
+
+    def test_listed_too_small_is_not_downloaded(self, tmp_path, monkeypatch):
+        """Test that a candidate whose listed size misses the target never reaches a worker."""
+        downloaded = []
+
+        class _ListedService(BaseWallpaperService):
+            SITE_NAME = "listed.example"
+
+            def fetch_wallpapers(self, progress_callback=None):
+                self._emit("nature", [Candidate("https://listed.example/small.jpg", 1920, 1080),
+                                      Candidate("https://listed.example/large.jpg", 5120, 1440)])
+                return []
+
+        monkeypatch.setattr(wallpaper_scraper, "download_image", lambda url, *args, **kwargs: downloaded.append(url))
+        targets = [DownloadTarget("5120x1440", 5120, 1440, str(tmp_path))]
+        wallpaper_scraper._run_scrape_and_download(
+            ["nature"], targets, ["listed.example"], {"listed.example": _ListedService},
+            1, 5, 1, 0, {}, False, http_client=None)
+
+        assert downloaded == ["https://listed.example/large.jpg"]
+        assert targets[0].selector.admitted == ["https://listed.example/large.jpg"]
+
+    def test_targets_fill_their_own_folders(self, tmp_path, monkeypatch):
+        """Test that one crawl feeds every target resolution, each into its own subfolder."""
+        downloaded = []
+
+        class _MultiService(BaseWallpaperService):
+            SITE_NAME = "multi.example"
+
+            def fetch_wallpapers(self, progress_callback=None):
+                for i in range(2):
+                    self._emit("nature", {res: Candidate(f"https://multi.example/{i}-{res}.jpg") for res in self.resolutions})
+                return []
+
+        monkeypatch.setattr(
+            wallpaper_scraper, "download_image", lambda url, folder, *args, **kwargs: downloaded.append((url, folder)))
+        resolutions = wallpaper_scraper.split_resolutions(["5120x1440,3440x1440", "5120x1440"])
+        targets = wallpaper_scraper.make_download_targets(
+            resolutions, [(5120, 1440), (3440, 1440)], str(tmp_path), 1)
+
+        wallpaper_scraper._run_scrape_and_download(
+            ["nature"], targets, ["multi.example"], {"multi.example": _MultiService},
+            2, 5, 1, 0, {}, False, http_client=None)
+
+        assert sorted(downloaded) == [
+            ("https://multi.example/0-3440x1440.jpg", str(tmp_path / "3440x1440")),
+            ("https://multi.example/0-5120x1440.jpg", str(tmp_path / "5120x1440"))]
@@ -0,0 +1,147 @@
+"""
+Test the per-host token-bucket rate limiter.
+"""
+import email.utils
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.http_client import HttpClient
+from src.rate_limiter import HostRateLimiter, TokenBucket, parse_retry_after
+from src.services.wallhaven_service import WallhavenService
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test token reservation and pausing."""
+
+    def test_burst_then_paced(self):
+        """Test that a full bucket allows a burst, then spaces requests at 1/rate."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_refills_over_time(self):
+        """Test that tokens accumulate again while idle, up to the burst size."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, burst=2, clock=clock)
+        bucket.reserve()
+        bucket.reserve()
+
+        clock.now += 10
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_pause_delays_next_request(self):
+        """Test that a pause (Retry-After) holds requests until it ends."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, burst=5, clock=clock)
+
+        bucket.pause(30)
+        assert bucket.reserve() == pytest.approx(30)
+        assert bucket.reserve() == pytest.approx(31)
+
+    def test_unlimited_when_rate_disabled(self):
+        """Test that a zero or missing rate never waits."""
+        bucket = TokenBucket(rate=0, burst=1)
+        assert all(bucket.reserve() == 0 for _ in range(100))
+
+
+class TestHostRateLimiter:
+    """Test per-host bucket registry."""
+
+    def test_hosts_have_independent_buckets(self):
+        """Test that one busy host does not slow down another."""
+        limiter = HostRateLimiter(rate=1.0, burst=1, host_limits={})
+        assert limiter.bucket_for("https://wallhaven.cc/a") is limiter.bucket_for("https://wallhaven.cc/b")
+        assert limiter.bucket_for("https://wallhaven.cc/") is not limiter.bucket_for("https://wallpaperbat.com/")
+
+    def test_host_overrides(self):
+        """Test that per-host (rate, burst) overrides are applied."""
+        limiter = HostRateLimiter(rate=1.0, burst=1, host_limits={"wallhaven.cc": (4.0, 3)})
+        bucket = limiter.bucket_for("https://wallhaven.cc/")
+        assert (bucket.rate, bucket.burst) == (4.0, 3)
+
+    def test_default_rate_follows_request_delay(self, monkeypatch):
+        """Test that RATE_LIMIT=0 derives the rate from REQUEST_DELAY."""
+        from src.rate_limiter import CONFIG
+        monkeypatch.setitem(CONFIG, "RATE_LIMIT", 0.0)
+        monkeypatch.setitem(CONFIG, "REQUEST_DELAY", 4.0)
+        assert HostRateLimiter().rate == pytest.approx(0.25)
+
+
+class TestRetryAfter:
+    """Test Retry-After parsing and handling."""
+
+    def test_parse_seconds(self):
+        assert parse_retry_after("120") == 120
+        assert parse_retry_after(" 1.5 ") == 1.5
+
+    def test_parse_http_date(self):
+        future = email.utils.formatdate(time.time() + 60, usegmt=True)
+        assert 55 <= parse_retry_after(future) <= 61
+
+    def test_parse_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+
+    def test_http_client_pauses_host_on_429(self):
+        """Test that a 429 pauses the host for the Retry-After duration."""
+        limiter = Mock()
+        client = HttpClient(pool_size=1, rate_limiter=limiter)
+        session = client.session_for("https://wallhaven.cc/")
+        session.get = Mock(return_value=Mock(status_code=429, headers={"Retry-After": "7"}))
+
+        client.get("https://wallhaven.cc/search")
+        limiter.acquire.assert_called_once_with("https://wallhaven.cc/search")
+        limiter.penalize.assert_called_once_with("https://wallhaven.cc/search", 7.0)
+
+    def test_fetch_with_retry_does_not_sleep_after_429(self, monkeypatch):
+        """Test that services leave 429 waits to the rate limiter instead of sleeping."""
+        from src.config import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_RETRIES", 2)
+        sleep = Mock()
+        monkeypatch.setattr("src.services.base_service.time.sleep", sleep)
+
+        client = Mock()
+        client.get.side_effect = [Mock(status_code=429, headers={}), Mock(status_code=200)]
+        svc = WallhavenService(themes=["nature"], http_client=client)
+
+        assert svc._fetch_with_retry("https://wallhaven.cc/search").status_code == 200
+        sleep.assert_not_called()
+
+    @pytest.mark.parametrize("headers, expected", [({"Retry-After": "7"}, 7.0), ({}, 1.5)])
+    def test_fetch_with_retry_sleeps_after_429_when_unlimited(self, monkeypatch, headers, expected):
+        """Test that a 429 from a host without a rate limit waits for Retry-After (or the backoff) itself."""
+        from src.services.base_service import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_RETRIES", 2)
+        monkeypatch.setitem(CONFIG, "RETRY_DELAY", 1.5)
+        sleep = Mock()
+        monkeypatch.setattr("src.services.base_service.time.sleep", sleep)
+
+        client = Mock(rate_limiter=HostRateLimiter(rate=0))
+        client.get.side_effect = [Mock(status_code=429, headers=headers), Mock(status_code=200)]
+        svc = WallhavenService(themes=["nature"], http_client=client)
+
+        assert svc._fetch_with_retry("https://wallhaven.cc/search").status_code == 200
+        sleep.assert_called_once_with(expected)
+
+    def test_pauses(self):
+        """Test that only hosts with a rate can be paused by a 429."""
+        assert not HostRateLimiter(rate=0, host_limits={}).pauses("https://wallhaven.cc/")
+        assert HostRateLimiter(rate=1, host_limits={}).pauses("https://wallhaven.cc/")
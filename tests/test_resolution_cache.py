@@ -0,0 +1,126 @@
+"""
+Test the persistent detail-page resolution cache.
+"""
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from src.resolution_cache import ResolutionCache
+from src.services.wallhaven_service import WallhavenService
+
+DETAIL_URL = "https://wallhaven.cc/w/abc123"
+GOOD_PAGE = (
+    '<img id="wallpaper" src="https://w.wallhaven.cc/full/ab/wallhaven-abc123.jpg"'
+    ' data-wallpaper-width="5120" data-wallpaper-height="1440">')
+SMALL_PAGE = (
+    '<img id="wallpaper" src="https://w.wallhaven.cc/full/ab/wallhaven-abc123.jpg"'
+    ' data-wallpaper-width="1920" data-wallpaper-height="1080">')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResolutionCache(path=str(tmp_path / "detail_pages.sqlite3"))
+
+
+def _service(cache, html, resolution="5120x1440"):
+    client = Mock()
+    client.get.return_value = Mock(status_code=200, text=html)
+    return WallhavenService(
+        resolution=resolution, themes=["nature"], http_client=client, resolution_cache=cache), client
+
+
+class TestResolutionCache:
+    """Test positive and negative entries."""
+
+    def test_positive_entry(self, cache):
+        """Test that a chosen download URL and its dimensions round-trip."""
+        cache.put(DETAIL_URL, "5120x1440", "https://example.com/a.jpg", 5120, 1440)
+        result = cache.get(DETAIL_URL, "5120X1440")
+        assert (result.download_url, result.width, result.height) == ("https://example.com/a.jpg", 5120, 1440)
+        assert not result.is_negative
+
+    def test_keyed_by_resolution(self, cache):
+        """Test that the same page is cached separately per target resolution."""
+        cache.put(DETAIL_URL, "5120x1440", None)
+        assert cache.get(DETAIL_URL, "3440x1440") is None
+
+    def test_negative_entry_expires(self, tmp_path):
+        """Test that negative entries are trusted only for the negative TTL."""
+        cache = ResolutionCache(path=str(tmp_path / "c.sqlite3"), negative_ttl=0)
+        cache.put(DETAIL_URL, "5120x1440", None)
+        assert cache.get(DETAIL_URL, "5120x1440") is None
+
+        cache = ResolutionCache(path=str(tmp_path / "c.sqlite3"), negative_ttl=60)
+        assert cache.get(DETAIL_URL, "5120x1440").is_negative
+
+    def test_positive_entry_expires(self, tmp_path):
+        """Test that a cached download URL is trusted only for the positive TTL."""
+        cache = ResolutionCache(path=str(tmp_path / "c.sqlite3"), positive_ttl=0)
+        cache.put(DETAIL_URL, "5120x1440", "https://example.com/a.jpg", 5120, 1440)
+        assert cache.get(DETAIL_URL, "5120x1440") is None
+
+        cache = ResolutionCache(path=str(tmp_path / "c.sqlite3"), positive_ttl=60)
+        assert cache.get(DETAIL_URL, "5120x1440").download_url == "https://example.com/a.jpg"
+
+
+class TestServiceDetailCache:
+    """Test that services skip detail pages they already know."""
+
+    def test_positive_result_skips_request(self, cache):
+        """Test that a second run answers the detail page from the cache."""
+        svc, client = _service(cache, GOOD_PAGE)
+        first = svc._process_detail_page(DETAIL_URL)
+        second = svc._process_detail_page(DETAIL_URL)
+
+        assert first == second
+        assert first["5120x1440"].download_url == "https://w.wallhaven.cc/full/ab/wallhaven-abc123.jpg"
+        assert (second["5120x1440"].width, second["5120x1440"].detail_url) == (5120, DETAIL_URL)
+        assert client.get.call_count == 1
+        assert cache.get(DETAIL_URL, "5120x1440").width == 5120
+
+    def test_negative_result_skips_request(self, cache):
+        """Test that a page without a suitable resolution is not fetched again."""
+        svc, client = _service(cache, SMALL_PAGE)
+        assert svc._process_detail_page(DETAIL_URL) == {}
+        assert svc._process_detail_page(DETAIL_URL) == {}
+        assert client.get.call_count == 1
+        assert cache.get(DETAIL_URL, "5120x1440").is_negative
+
+    def test_every_target_cached_from_one_fetch(self, cache):
+        """Test that a multi-target service records each target and is only a hit when all are known."""
+        svc, client = _service(cache, GOOD_PAGE, ["5120x1440", "3840x2160"])
+        assert list(svc._process_detail_page(DETAIL_URL)) == ["5120x1440"]
+        assert list(svc._process_detail_page(DETAIL_URL)) == ["5120x1440"]
+        assert client.get.call_count == 1
+        assert cache.get(DETAIL_URL, "3840x2160").is_negative
+
+        svc, client = _service(cache, GOOD_PAGE, ["5120x1440", "3440x1440"])
+        svc._process_detail_page(DETAIL_URL)
+        assert client.get.call_count == 1
+
+    def test_failed_fetch_is_not_cached(self, cache, monkeypatch):
+        """Test that transport failures are retried on the next run, not recorded as negative."""
+        from src.services.base_service import CONFIG
+        monkeypatch.setitem(CONFIG, "MAX_RETRIES", 1)
+        svc, client = _service(cache, GOOD_PAGE)
+        client.get.return_value = Mock(status_code=500)
+
+        assert svc._process_detail_page(DETAIL_URL) == {}
+        assert cache.get(DETAIL_URL, "5120x1440") is None
+
+    def test_async_path_uses_cache(self, cache):
+        """Test that the asyncio path reads and writes the same cache."""
+        svc, _ = _service(cache, GOOD_PAGE)
+        client = Mock()
+
+        async def fetch_text(url, headers=None):
+            return GOOD_PAGE
+        client.fetch_text = Mock(side_effect=fetch_text)
+
+        async def run():
+            await svc._process_detail_page_async(client, DETAIL_URL)
+            return await svc._process_detail_page_async(client, DETAIL_URL)
+
+        assert asyncio.run(run())["5120x1440"].download_url == "https://w.wallhaven.cc/full/ab/wallhaven-abc123.jpg"
+        assert client.fetch_text.call_count == 1
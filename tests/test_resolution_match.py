@@ -0,0 +1,77 @@
+"""
+Test scalar and batch resolution matching.
+"""
+import random
+
+import pytest
+from PIL import Image
+
+from src import resolution_match, wallpaper_scraper
+from src.library_index import LibraryIndex
+from src.resolution_match import count_codes, evaluate_batch, evaluate_resolution_match, match_codes
+
+TARGETS = [(5120, 1440), (3840, 2160), (1920, 1080)]
+
+
+def _candidates(count=500, seed=3):
+    rng = random.Random(seed)
+    sizes = [(5120, 1440), (5000, 1400), (7680, 2160), (3840, 2160), (1920, 1080), (0, 0)]
+    sizes += [(rng.randrange(1, 9000), rng.randrange(1, 5000)) for _ in range(count)]
+    return [w for w, _ in sizes], [h for _, h in sizes]
+
+
+def _tolist(value):
+    return value.tolist() if hasattr(value, "tolist") else value
+
+
+class TestBatchMatch:
+    """Test the vectorized batch against the scalar match codes."""
+
+    def test_codes_match_scalar(self):
+        """Test that every batch code equals evaluate_resolution_match for the same pair."""
+        widths, heights = _candidates()
+        codes = _tolist(match_codes(widths, heights, TARGETS))
+        for row, (tw, th) in enumerate(TARGETS):
+            assert codes[row] == [evaluate_resolution_match(w, h, tw, th) for w, h in zip(widths, heights)]
+
+    def test_ranking_prefers_code_then_smaller_size(self):
+        """Test that candidates are ranked by match code, then by the closest larger size."""
+        widths, heights = [3840, 7680, 5120, 5200, 1920], [2160, 2160, 1440, 1460, 1080]
+        result = evaluate_batch(widths, heights, [(5120, 1440)])
+        assert _tolist(result.ranking)[0] == [2, 3, 1, 4, 0]
+        assert count_codes(result.codes) == [[2, 0, 1, 2]]
+
+    def test_fallback_without_numpy(self, monkeypatch):
+        """Test that the pure-Python fallback returns the same codes and ranking as NumPy."""
+        pytest.importorskip("numpy")
+        widths, heights = _candidates()
+        vectorized = evaluate_batch(widths, heights, TARGETS)
+        counts = count_codes(vectorized.codes)
+        monkeypatch.setattr(resolution_match, "np", None)
+        fallback = evaluate_batch(widths, heights, TARGETS)
+        assert fallback.codes == vectorized.codes.tolist()
+        assert fallback.ranking == vectorized.ranking.tolist()
+        assert count_codes(fallback.codes) == counts
+
+    def test_invalid_targets(self):
+        """Test that a zero target or mismatched columns are rejected."""
+        with pytest.raises(ValueError):
+            match_codes([100], [100], [(0, 1080)])
+        with pytest.raises(ValueError):
+            match_codes([100, 200], [100], TARGETS)
+
+
+class TestEvaluateLibrary:
+    """Test scoring an output folder for new target resolutions."""
+
+    def test_counts_per_resolution(self, tmp_path, monkeypatch):
+        """Test that the library is scored from the index for every requested resolution."""
+        for name, size in [("a.png", (64, 18)), ("b.png", (96, 54)), ("c.png", (32, 18))]:
+            Image.new("RGB", size).save(tmp_path / name)
+        index = LibraryIndex()
+        monkeypatch.setattr(wallpaper_scraper, "get_library_index", lambda: index)
+
+        summary = wallpaper_scraper.evaluate_library(["64x18", "32x18", "bad"], output_dir=str(tmp_path), workers=2)
+
+        assert summary == {"64x18": [1, 1, 0, 1], "32x18": [0, 1, 1, 1]}
+        index.close()
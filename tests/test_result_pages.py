@@ -0,0 +1,117 @@
+"""
+Test the lazy walk over paginated result listings.
+"""
+import asyncio
+import threading
+
+from src.result_pages import AsyncResultPages, ResultPages
+
+
+class Listing:
+    """Fake listing of numbered pages with a fixed number of links each."""
+
+    def __init__(self, pages=3, per_page=4, duplicate_last=False):
+        self.pages = pages
+        self.per_page = per_page
+        self.duplicate_last = duplicate_last
+        self.requests = []  # (page number, limit)
+        self.lock = threading.Lock()
+
+    def links(self, number, limit):
+        with self.lock:
+            self.requests.append((number, limit))
+        if number > self.pages:
+            return None if not self.duplicate_last else self.links(self.pages, limit)
+        links = [f"/w/{number}-{i}" for i in range(self.per_page)]
+        return links[:limit] if limit else links
+
+    async def links_async(self, number, limit):
+        await asyncio.sleep(0)
+        return self.links(number, limit)
+
+
+class TestResultPages:
+    """Test on-demand page fetching, prefetching and the end of a listing."""
+
+    def test_nothing_fetched_before_take(self):
+        """Test that creating the walk requests no page."""
+        listing = Listing()
+        ResultPages(listing.links).close()
+        assert listing.requests == []
+
+    def test_pages_fetched_on_demand(self):
+        """Test that a later page is only requested once the earlier ones are handed out."""
+        listing = Listing(per_page=4)
+        pages = ResultPages(listing.links)
+        assert pages.take(3, want=6) == ["/w/1-0", "/w/1-1", "/w/1-2"]
+        assert listing.requests == [(1, 6)]
+        assert pages.take(3, want=3) == ["/w/1-3", "/w/2-0", "/w/2-1"]
+        assert [number for number, _ in listing.requests] == [1, 2]
+        pages.close()
+
+    def test_prefetch_after_page_handed_out(self):
+        """Test that the next page is fetched ahead once a page is used up and more is wanted."""
+        listing = Listing(per_page=2)
+        pages = ResultPages(listing.links)
+        assert pages.take(2, want=5) == ["/w/1-0", "/w/1-1"]
+        assert pages.pages_fetched == 2
+        assert pages.take(2) == ["/w/2-0", "/w/2-1"]
+        assert listing.requests[:2] == [(1, 5), (2, 3)]
+        pages.close()
+
+    def test_no_prefetch_when_nothing_more_wanted(self):
+        """Test that a walk whose caller has enough does not request another page."""
+        listing = Listing(per_page=2)
+        pages = ResultPages(listing.links)
+        assert pages.take(2, want=2) == ["/w/1-0", "/w/1-1"]
+        pages.close()
+        assert listing.requests == [(1, 2)]
+
+    def test_ends_with_listing(self):
+        """Test that a missing page ends the walk and later takes request nothing."""
+        listing = Listing(pages=2, per_page=2)
+        pages = ResultPages(listing.links)
+        assert len(pages.take(10)) == 4
+        assert pages.take(10) == []
+        assert [number for number, _ in listing.requests] == [1, 2, 3]
+        pages.close()
+
+    def test_repeated_page_ends_walk(self):
+        """Test that a page with no new links (a site repeating its last page) ends the walk."""
+        listing = Listing(pages=1, per_page=2, duplicate_last=True)
+        pages = ResultPages(listing.links)
+        assert pages.take(10) == ["/w/1-0", "/w/1-1"]
+        assert pages.take(10) == []
+
+    def test_max_pages(self):
+        """Test that the walk stops at max_pages even if the listing goes on."""
+        listing = Listing(pages=10, per_page=1)
+        pages = ResultPages(listing.links, max_pages=3)
+        assert pages.take(10) == ["/w/1-0", "/w/2-0", "/w/3-0"]
+        assert pages.pages_fetched == 3
+
+    def test_uncut_pages_keep_their_links(self):
+        """Test that without cut_pages a page is fetched whole and drained before the next one."""
+        listing = Listing(per_page=5)
+        pages = ResultPages(listing.links, cut_pages=False)
+        assert pages.take(2, want=2) == ["/w/1-0", "/w/1-1"]
+        assert pages.take(2, want=2) == ["/w/1-2", "/w/1-3"]
+        assert listing.requests == [(1, None)]
+        pages.close()
+
+    def test_async_walk(self):
+        """Test that the async walk fetches and prefetches like the threaded one."""
+        listing = Listing(pages=2, per_page=2)
+
+        async def run():
+            pages = AsyncResultPages(listing.links_async)
+            first = await pages.take(2, want=4)
+            second = await pages.take(2)
+            rest = await pages.take(2)
+            pages.close()
+            return first, second, rest
+
+        first, second, rest = asyncio.run(run())
+        assert first + second == ["/w/1-0", "/w/1-1", "/w/2-0", "/w/2-1"]
+        assert rest == []
+        assert listing.requests[:2] == [(1, 4), (2, 2)]
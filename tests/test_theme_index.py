@@ -0,0 +1,46 @@
+"""
+Test the word index used to match themes against a shared listing.
+"""
+from src.theme_index import ThemeIndex, tokenize
+
+
+def _index():
+    index = ThemeIndex()
+    index.add('a', 'https://wallpaperbat.com/wallpaper/misty-mountains-lake', 'Misty Mountains')
+    index.add('b', 'https://wallpaperbat.com/wallpaper/12345', 'Ocean Sunset 5120x1440')
+    index.add('c', 'https://wallpaperbat.com/wallpaper/city_night', '')
+    index.add('d', 'https://wallpaperbat.com/wallpaper/night-sky-mountain')
+    return index
+
+
+class TestThemeIndex:
+    """Test tokenizing and matching themes against indexed items."""
+
+    def test_tokenize(self):
+        """Test that URLs, titles and themes split into the same lower-case words."""
+        assert tokenize('https://x.com/wallpaper/Night-Sky_2?page=2') == [
+            'https', 'x', 'com', 'wallpaper', 'night', 'sky', '2', 'page', '2']
+        assert tokenize('') == [] and tokenize(None) == []
+
+    def test_every_word_must_match(self):
+        """Test that a theme of several words needs all of them, in any order."""
+        index = _index()
+        assert index.match('night city') == ['c']
+        assert index.match('mountain night') == ['d']
+        assert index.match('mountain desert') == []
+
+    def test_prefix_match(self):
+        """Test that a theme word matches the words it starts, as a substring filter would."""
+        index = _index()
+        assert index.match('Mountain') == ['a', 'd']
+        assert index.match('sun') == ['b']
+        assert index.match('5120x1440') == ['b']
+
+    def test_order_and_iteration(self):
+        """Test that matches and iteration follow insertion order and empty queries match nothing."""
+        index = _index()
+        assert index.match('wallpaper') == ['a', 'b', 'c', 'd']
+        assert list(index) == ['a', 'b', 'c', 'd'] and len(index) == 4
+        assert index.match(' - ') == []
+        index.add('e', 'mountain')
+        assert index.match('mountain') == ['a', 'd', 'e']
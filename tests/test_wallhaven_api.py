@@ -0,0 +1,183 @@
+"""
+Test wallhaven.cc discovery through the JSON search API against a local stub server.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.config import CONFIG
+from src.http_cache import HttpCache
+from src.http_client import HttpClient
+from src.pipeline import CandidateSelector, ThemeBudget
+from src.rate_limiter import HostRateLimiter
+from src.services.wallhaven_service import WallhavenService
+
+PER_PAGE = 2
+LAST_PAGE = 3
+
+
+def api_page(number):
+    data = [{
+        'id': f'{number}{i}',
+        'url': f'https://wallhaven.cc/w/{number}{i}',
+        'path': f'https://w.wallhaven.cc/full/{number}{i}/wallhaven-{number}{i}.jpg',
+        'resolution': '5120x1440',
+        'dimension_x': 5120,
+        'dimension_y': 1440,
+        'file_size': 3 * 1024 * 1024 if i else 9 * 1024 * 1024,
+    } for i in range(PER_PAGE)]
+    return {'data': data, 'meta': {'current_page': number, 'last_page': LAST_PAGE, 'per_page': PER_PAGE}}
+
+
+class Stub:
+    """What the stub server serves and what it was asked for."""
+    api_status = 200
+    requests = []  # (path, query, X-API-Key header)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        Stub.requests.append((parsed.path, query, self.headers.get('X-API-Key')))
+        if parsed.path == '/api/v1/search' and Stub.api_status == 200:
+            status, content_type = 200, 'application/json'
+            body = json.dumps(api_page(int(query.get('page', ['1'])[0]))).encode()
+        elif parsed.path == '/api/v1/search':
+            status, content_type, body = Stub.api_status, 'application/json', b'{"error": "Unauthorized"}'
+        elif parsed.path == '/search':
+            status, content_type = 200, 'text/html'
+            body = b'<figure class="thumb"><a class="preview" href="/w/html1"></a></figure>'
+        elif parsed.path == '/w/html1':
+            status, content_type = 200, 'text/html'
+            body = (b'<img id="wallpaper" src="https://w.wallhaven.cc/full/ht/wallhaven-html1.jpg" '
+                    b'data-wallpaper-width="5120" data-wallpaper-height="1440">')
+        else:
+            status, content_type, body = 404, 'text/html', b''
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def stub(server_url, monkeypatch):
+    monkeypatch.setattr(Stub, 'requests', [])
+    monkeypatch.setattr(Stub, 'api_status', 200)
+    monkeypatch.setitem(CONFIG, 'MAX_RETRIES', 1)
+    monkeypatch.setitem(CONFIG, 'RETRY_DELAY', 0)
+    monkeypatch.setitem(CONFIG, 'WALLHAVEN_USE_API', True)
+    monkeypatch.setitem(CONFIG, 'WALLHAVEN_API_KEY', 'secret')
+    return server_url
+
+
+def make_service(server_url, **kwargs):
+    client = HttpClient(pool_size=1, rate_limiter=HostRateLimiter(rate=1000, burst=10))
+    svc = WallhavenService(resolution='5120x1440', themes=['nature'], http_client=client, **kwargs)
+    svc.API_URL = f'{server_url}/api/v1'
+    svc.BASE_URL = server_url
+    return svc
+
+
+class TestWallhavenApi:
+    """Test the API-backed discovery mode of WallhavenService."""
+
+    def test_no_detail_requests(self, stub):
+        """Test that wallpapers come straight from the JSON with one request per result page."""
+        found = []
+        svc = make_service(stub, wallpaper_callback=found.append)
+
+        urls = svc.fetch_wallpapers()
+
+        assert len(urls) == PER_PAGE * LAST_PAGE
+        assert [path for path, _, _ in Stub.requests] == ['/api/v1/search'] * LAST_PAGE
+        path, query, api_key = Stub.requests[0]
+        assert query['q'] == ['nature'] and query['resolutions'] == ['5120x1440']
+        assert api_key == 'secret'
+        assert {(c.width, c.height, c.theme) for c in found} == {(5120, 1440, 'nature')}
+        assert found[0].detail_url == 'https://wallhaven.cc/w/10'
+
+    def test_stops_at_budget(self, stub):
+        """Test that later API pages are requested only until the theme's budget is met."""
+        selector = CandidateSelector(max_per_theme=3)
+        svc = make_service(
+            stub, wallpaper_callback=lambda c: selector.admit(c.theme, c.download_url),
+            budget=ThemeBudget([selector]))
+
+        assert len(svc.fetch_wallpapers()) == 3
+        assert [query.get('page', ['1']) for _, query, _ in Stub.requests] == [['1'], ['2']]
+
+    def test_file_size_limit(self, stub, monkeypatch):
+        """Test that results over MAX_IMAGE_MB are left out using the listed file size."""
+        monkeypatch.setitem(CONFIG, 'MAX_IMAGE_MB', 5)
+        urls = make_service(stub).fetch_wallpapers()
+        assert urls and all(url.endswith('1.jpg') for url in urls)
+
+    def test_falls_back_to_search_pages(self, stub):
+        """Test that the HTML search is used when the API refuses the request."""
+        Stub.api_status = 401
+        urls = make_service(stub).fetch_wallpapers()
+        assert urls == ['https://w.wallhaven.cc/full/ht/wallhaven-html1.jpg']
+        paths = [path for path, _, _ in Stub.requests]
+        assert paths[:2] == ['/api/v1/search', '/search'] and paths.count('/api/v1/search') == 1
+
+    def test_async(self, stub):
+        """Test that the async engine reads the same API pages."""
+        pytest.importorskip('aiohttp')
+        from src.async_engine import AsyncHttpClient
+
+        svc = make_service(stub)
+
+        async def run():
+            async with AsyncHttpClient(rate_limiter=HostRateLimiter(rate=1000, burst=10)) as client:
+                return await svc.fetch_wallpapers_async(client)
+
+        assert len(asyncio.run(run())) == PER_PAGE * LAST_PAGE
+        assert {path for path, _, _ in Stub.requests} == {'/api/v1/search'}
+        assert {api_key for _, _, api_key in Stub.requests} == {'secret'}
+
+    def test_key_only_sent_to_api(self, stub):
+        """Test that X-API-Key goes with API searches but not with HTML pages."""
+        Stub.api_status = 401
+        svc = make_service(stub)
+        assert 'X-API-Key' not in svc.headers
+        svc.fetch_wallpapers()
+        assert {path: api_key for path, _, api_key in Stub.requests} == {
+            '/api/v1/search': 'secret', '/search': None, '/w/html1': None}
+
+    def test_api_cached_apart_from_pages(self, stub, tmp_path, monkeypatch):
+        """Test that API results are cached under their own key, which changes with the API key."""
+        cache = HttpCache(directory=str(tmp_path), ttl=60)
+        client = HttpClient(pool_size=1, rate_limiter=HostRateLimiter(rate=1000, burst=10), cache=cache)
+        svc = WallhavenService(resolution='5120x1440', themes=['nature'], http_client=client)
+        svc.API_URL = f'{stub}/api/v1'
+        url = svc._api_search_url('nature')
+
+        svc.fetch_wallpapers()
+        requests_made = len(Stub.requests)
+        assert cache.lookup(url) is None and cache.lookup(svc._api_cache_key(url)) is not None
+        assert 'secret' not in svc._api_cache_key(url)
+
+        svc.fetch_wallpapers()
+        assert len(Stub.requests) == requests_made
+        monkeypatch.setitem(CONFIG, 'WALLHAVEN_API_KEY', 'other')
+        other = WallhavenService(resolution='5120x1440', themes=['nature'], http_client=client)
+        assert other._api_cache_key(url) != svc._api_cache_key(url)
+        cache.close()
@@ -0,0 +1,165 @@
+"""
+Test wallpaperbat.com's ultrawide listing, fetched once per run and shared by all themes.
+"""
+import asyncio
+
+import pytest
+
+from src.config import CONFIG
+from src.services.wallpaperbat_service import WallpaperBatService
+
+BASE = 'https://wallpaperbat.com'
+ULTRAWIDE = f'{BASE}/5120x1440-super-ultrawide-wallpapers'
+LISTING = (
+    '<div class="wallpapers grid">'
+    '<a href="/wallpaper/misty-mountain-lake" title="Misty Mountains"><img src="/t/1.jpg"></a>'
+    '<a href="/wallpaper/123"><img src="/t/2.jpg" alt="Ocean Sunset"></a>'
+    '<a href="/wallpaper/city-night"><img src="/t/3.jpg"></a></div>')
+THEMES = ['mountain', 'sunset', 'night city', 'desert', 'ultrawide']
+EXPECTED = {
+    'mountain': [f'{BASE}/img/misty-mountain-lake-5120x1440.jpg'],
+    'sunset': [f'{BASE}/img/123-5120x1440.jpg'],
+    'night city': [f'{BASE}/img/city-night-5120x1440.jpg'],
+    'ultrawide': [f'{BASE}/img/{slug}-5120x1440.jpg' for slug in ('misty-mountain-lake', '123', 'city-night')],
+}
+
+
+def page(url):
+    """Markup the fake site serves for a URL, or None for a missing page."""
+    if url == ULTRAWIDE:
+        return LISTING
+    if url.startswith(f'{BASE}/wallpaper/'):
+        slug = url.rsplit('/', 1)[1]
+        return (f'<img class="img-wallpaper" src="/img/{slug}-5120x1440.jpg">'
+                f'<a class="download-button" href="/img/{slug}-3440x1440.jpg">3440 x 1440</a>')
+    if url.startswith(f'{BASE}/search'):
+        return '<html><body>No results</body></html>'
+    return None
+
+
+class Client:
+    """Fake HttpClient serving page() and recording every request."""
+
+    def __init__(self):
+        self.requested = []
+
+    def _response(self, url):
+        self.requested.append(url)
+        text = page(url)
+        return type('Response', (), {'status_code': 404 if text is None else 200, 'text': text or ''})()
+
+    def get(self, url, **kwargs):
+        return self._response(url)
+
+    def stream_page(self, url, reader, **kwargs):
+        response = self._response(url)
+        if response.status_code == 200:
+            reader.feed(response.text)
+            reader.close()
+        return response
+
+
+class AsyncClient:
+    """Async counterpart of Client."""
+
+    def __init__(self):
+        self.requested = []
+
+    async def fetch_text(self, url, headers=None, cache_key=None):
+        self.requested.append(url)
+        await asyncio.sleep(0)
+        return page(url)
+
+    async def stream_page(self, url, new_reader, headers=None):
+        html = await self.fetch_text(url, headers)
+        if html is None:
+            return None
+        reader = new_reader()
+        reader.feed(html)
+        reader.close()
+        return reader
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setitem(CONFIG, 'MAX_RETRIES', 1)
+    monkeypatch.setitem(CONFIG, 'RETRY_DELAY', 0)
+
+
+def _by_theme(found):
+    themes = {}
+    for candidate in found:
+        themes.setdefault(candidate.theme, []).append(candidate.download_url)
+    return themes
+
+
+class TestUltrawideListing:
+    """Test the shared ultrawide listing of WallpaperBatService."""
+
+    def test_fetched_once_for_all_themes(self):
+        """Test that the listing and its detail pages are requested once however many themes match it."""
+        client, found = Client(), []
+        svc = WallpaperBatService('5120x1440', THEMES, http_client=client, wallpaper_callback=found.append)
+
+        urls = svc.fetch_wallpapers()
+
+        assert _by_theme(found) == EXPECTED
+        assert sorted(urls) == sorted(EXPECTED['ultrawide'])
+        ultrawide_requests = [url for url in client.requested if not url.startswith(f'{BASE}/search')]
+        assert sorted(ultrawide_requests) == sorted(
+            [ULTRAWIDE, f'{ULTRAWIDE}?page=2'] + [f'{BASE}/wallpaper/{slug}' for slug in (
+                'misty-mountain-lake', '123', 'city-night')])
+
+    def test_titles_from_full_parse(self, monkeypatch):
+        """Test that titles are matched when the listing is parsed in full instead of streamed."""
+        monkeypatch.setitem(CONFIG, 'STREAM_LISTINGS', False)
+        found = []
+        svc = WallpaperBatService('5120x1440', ['sunset'], http_client=Client(), wallpaper_callback=found.append)
+        svc.fetch_wallpapers()
+        assert _by_theme(found) == {'sunset': EXPECTED['sunset']}
+
+    def test_each_target_gets_its_own_choice(self):
+        """Test that with several targets every one receives the image chosen for it, with its size."""
+        found = []
+        svc = WallpaperBatService(
+            ['5120x1440', '3440x1440'], ['sunset'], http_client=Client(), wallpaper_callback=found.append)
+
+        svc.fetch_wallpapers()
+
+        assert sorted((c.resolution, c.download_url, c.width, c.height) for c in found) == [
+            ('3440x1440', f'{BASE}/img/123-3440x1440.jpg', 3440, 1440),
+            ('5120x1440', f'{BASE}/img/123-5120x1440.jpg', 5120, 1440),
+        ]
+
+    def test_other_resolution_skips_listing(self):
+        """Test that the ultrawide listing is only walked for the 5120x1440 target."""
+        client = Client()
+        WallpaperBatService('3840x2160', THEMES, http_client=client).fetch_wallpapers()
+        assert all(url.startswith(f'{BASE}/search') for url in client.requested)
+
+    def test_async(self):
+        """Test that the async engine shares one walk of the listing among all themes."""
+        client, found = AsyncClient(), []
+        svc = WallpaperBatService('5120x1440', THEMES, http_client=object(), wallpaper_callback=found.append)
+
+        urls = asyncio.run(svc.fetch_wallpapers_async(client))
+
+        assert _by_theme(found) == EXPECTED
+        assert sorted(urls) == sorted(EXPECTED['ultrawide'])
+        assert client.requested.count(ULTRAWIDE) == 1
+        assert client.requested.count(f'{BASE}/wallpaper/123') == 1
+
+    def test_async_each_target_gets_its_own_choice(self):
+        """Test that the async engine also hands every target the image chosen for it."""
+        found = []
+        svc = WallpaperBatService(
+            ['5120x1440', '3440x1440'], ['ultrawide'], http_client=object(), wallpaper_callback=found.append)
+
+        asyncio.run(svc.fetch_wallpapers_async(AsyncClient()))
+
+        by_target = {}
+        for candidate in found:
+            by_target.setdefault(candidate.resolution, []).append((candidate.download_url, candidate.width))
+        assert by_target == {
+            res: [(url.replace('5120x1440', res), width) for url in EXPECTED['ultrawide']]
+            for res, width in (('5120x1440', 5120), ('3440x1440', 3440))}
@@ -0,0 +1,143 @@
+"""
+Test wallpaperswide.com download URLs derived from detail page slugs and checked with HEAD.
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.config import CONFIG
+from src.http_client import HttpClient
+from src.rate_limiter import HostRateLimiter
+from src.resolution_cache import ResolutionCache
+from src.services.wallpaperswide_service import WallpapersWideService
+
+# Images the stub serves; anything else under /download/ redirects to an HTML page
+IMAGES = {'/download/lake-wallpaper-5120x1440.jpg', '/download/lake-wallpaper-3440x1440.jpg'}
+DETAIL = ('<a href="/download/hill-wallpaper-3840x2160.jpg">3840x2160</a>'
+          '<a href="/download/hill-wallpaper-5120x1440.png">5120x1440</a>')
+
+
+class Stub:
+    """Requests the stub server has seen, as (method, path)."""
+    requests = []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _answer(self, send_body):
+        Stub.requests.append((self.command, self.path))
+        if self.path in IMAGES:
+            status, content_type, body = 200, 'image/jpeg', b'\xff\xd8' + b'\0' * 64
+        elif self.path.startswith('/download/'):
+            self.send_response(302)
+            self.send_header('Location', '/not-found.html')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        elif self.path == '/hill-wallpapers.html':
+            status, content_type, body = 200, 'text/html', DETAIL.encode()
+        else:
+            status, content_type, body = 200, 'text/html', b'<html>not here</html>'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer(True)
+
+    def do_HEAD(self):
+        self._answer(False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def stub(server_url, monkeypatch):
+    monkeypatch.setattr(Stub, 'requests', [])
+    monkeypatch.setitem(CONFIG, 'MAX_RETRIES', 1)
+    monkeypatch.setitem(CONFIG, 'RETRY_DELAY', 0)
+    monkeypatch.setitem(CONFIG, 'WALLPAPERSWIDE_PROBE_DOWNLOADS', True)
+    return server_url
+
+
+def make_service(server_url, resolution='5120x1440', **kwargs):
+    client = HttpClient(pool_size=1, rate_limiter=HostRateLimiter(rate=1000, burst=10))
+    svc = WallpapersWideService(resolution=resolution, themes=['nature'], http_client=client, **kwargs)
+    svc.BASE_URL = server_url
+    return svc
+
+
+class TestDownloadProbe:
+    """Test HEAD-checked download URLs in place of detail pages."""
+
+    def test_head_instead_of_detail_page(self, stub):
+        """Test that an available derived URL costs one HEAD per target and no page fetch."""
+        svc = make_service(stub, resolution='5120x1440,3440x1440')
+
+        found = svc._process_detail_page(f'{stub}/lake-wallpapers.html')
+
+        assert {res: (c.download_url, c.width) for res, c in found.items()} == {
+            '5120x1440': (f'{stub}/download/lake-wallpaper-5120x1440.jpg', 5120),
+            '3440x1440': (f'{stub}/download/lake-wallpaper-3440x1440.jpg', 3440)}
+        assert found['5120x1440'].detail_url == f'{stub}/lake-wallpapers.html'
+        assert [method for method, _ in Stub.requests] == ['HEAD', 'HEAD']
+
+    def test_detail_page_when_head_fails(self, stub):
+        """Test that a derived URL redirecting to an HTML page falls back to the detail page."""
+        svc = make_service(stub)
+
+        found = svc._process_detail_page(f'{stub}/hill-wallpapers.html')
+
+        assert found['5120x1440'].download_url == f'{stub}/download/hill-wallpaper-5120x1440.png'
+        assert Stub.requests[0] == ('HEAD', '/download/hill-wallpaper-5120x1440.jpg')
+        assert ('GET', '/hill-wallpapers.html') in Stub.requests
+
+    def test_result_is_cached(self, stub, tmp_path):
+        """Test that a checked URL is remembered, so the next run sends no request at all."""
+        cache = ResolutionCache(str(tmp_path / 'details.sqlite3'))
+        make_service(stub, resolution_cache=cache)._process_detail_page(f'{stub}/lake-wallpapers.html')
+        Stub.requests.clear()
+
+        found = make_service(stub, resolution_cache=cache)._process_detail_page(f'{stub}/lake-wallpapers.html')
+
+        assert found['5120x1440'].download_url == f'{stub}/download/lake-wallpaper-5120x1440.jpg'
+        assert Stub.requests == []
+        cache.close()
+
+    def test_disabled_or_unusual_url(self, stub, monkeypatch):
+        """Test that URLs outside the slug scheme, or a disabled probe, go straight to the page."""
+        svc = make_service(stub)
+        assert svc._synthesized_downloads(f'{stub}/lake.html') is None
+        monkeypatch.setitem(CONFIG, 'WALLPAPERSWIDE_PROBE_DOWNLOADS', False)
+        assert svc._synthesized_downloads(f'{stub}/lake-wallpapers.html') is None
+
+    def test_async(self, stub):
+        """Test that the async engine probes with HEAD and falls back the same way."""
+        pytest.importorskip('aiohttp')
+        from src.async_engine import AsyncHttpClient
+
+        svc = make_service(stub)
+
+        async def run():
+            async with AsyncHttpClient(rate_limiter=HostRateLimiter(rate=1000, burst=10)) as client:
+                return await svc._process_detail_pages_async(
+                    client, [f'{stub}/lake-wallpapers.html', f'{stub}/hill-wallpapers.html'])
+
+        assert asyncio.run(run()) == [
+            f'{stub}/download/lake-wallpaper-5120x1440.jpg', f'{stub}/download/hill-wallpaper-5120x1440.png']
+        assert ('GET', '/lake-wallpapers.html') not in Stub.requests
+        assert ('GET', '/hill-wallpapers.html') in Stub.requests